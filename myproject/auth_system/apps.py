@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuthSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auth_system'
+
+    def ready(self):
+        # Подключаем обработчики сигналов для сброса кеша прав
+        from . import signals  # noqa: F401
@@ -0,0 +1,144 @@
+"""
+Асинхронные версии горячих view для работы под ASGI.
+Используются вместо views.py при AUTH_ASYNC_VIEWS = True.
+"""
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+from rest_framework import status
+
+from . import audit
+from .conditional import profile_etag
+from .hashers import PasswordHasherBusy
+from .http import json_response, read_json
+from .metrics import LOGINS
+from .models import TOKEN_LIFETIME, User, Session
+from .policy import apermission_claims
+from .ratelimit import acheck_rate_limit
+from .serializers import UserSerializer, LoginSerializer, user_data
+from .tokens import decode_token, revoke_user_tokens
+# Остальные view не находятся на горячем пути и остаются синхронными
+from .views import register, logout, delete_account, role_list, audit_log  # noqa: F401
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def login(request):
+    """
+    Аутентификация пользователя.
+
+    POST /api/login/
+    Body: {email, password}
+    Returns: JsonResponse: JWT токен и данные пользователя или ошибка аутентификации
+    """
+
+    data = read_json(request)
+    if data is None:
+        return json_response({'error': 'Некорректный JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Ограничение частоты проверяется до обращения к БД и bcrypt
+    retry_after = await acheck_rate_limit('login', request, email=data.get('email'))
+    if retry_after:
+        LOGINS.inc(result='rate_limited')
+        return json_response(
+            {'error': 'Слишком много попыток, повторите попытку позже'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': str(retry_after)}
+        )
+
+    serializer = LoginSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    email = serializer.validated_data['email']
+    password = serializer.validated_data['password']
+
+    try:
+        user = await User.objects.aget(email=email, is_active=True)
+    except User.DoesNotExist:
+        LOGINS.inc(result='failure')
+        audit.record('login_failed', request=request, reason='unknown_user', email=email)
+        return json_response({'error': 'Пользователь не найден'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        password_ok = await user.acheck_password(password)
+    except PasswordHasherBusy:
+        LOGINS.inc(result='busy')
+        return json_response(
+            {'error': 'Сервис перегружен, повторите попытку позже'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': '1'}
+        )
+    if not password_ok:
+        LOGINS.inc(result='failure')
+        audit.record('login_failed', user, request, reason='password')
+        return json_response({'error': 'Неверный пароль'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    # Пересчитываем хеш, если изменилась стоимость bcrypt
+    if user.password_needs_rehash():
+        try:
+            await user.aset_password(password)
+            await user.asave(update_fields=['password'])
+        except PasswordHasherBusy:
+            # Пересчет не обязателен, выполним его при следующем входе
+            pass
+
+    token = user.generate_token(await apermission_claims(user))
+    expires_at = timezone.now() + TOKEN_LIFETIME
+
+    # Деактивируем предыдущие сессии пользователя
+    await Session.objects.filter(user=user, is_active=True).aupdate(is_active=False)
+    payload = decode_token(token)
+    revoke_user_tokens(user.id, issued_before=payload['iat'], keep_jti=payload['jti'])
+
+    # Создаем новую сессию
+    await Session.objects.acreate(
+        user=user,
+        token_hash=Session.hash_token(token),
+        expires_at=expires_at
+    )
+
+    LOGINS.inc(result='success')
+    audit.record('login', user, request)
+    return json_response({
+        'token': token,
+        'user': user_data(user)
+    })
+
+
+def _update_profile(user, data):
+    # Валидация email обращается к БД, поэтому выполняется синхронно в потоке
+    serializer = UserSerializer(user, data=data, partial=True)
+    if serializer.is_valid():
+        serializer.save()
+        return serializer.data, status.HTTP_200_OK
+    return serializer.errors, status.HTTP_400_BAD_REQUEST
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'PUT'])
+@condition(etag_func=profile_etag)
+async def profile(request):
+    """
+    Получение и обновление профиля пользователя.
+    GET отдает ETag и отвечает 304 на If-None-Match с актуальным ETag.
+
+    GET /api/profile/ - получение профиля
+    PUT /api/profile/ - обновление профиля, в ответе новый ETag
+    Headers: Authorization: Bearer {token}, If-None-Match (необязательно)
+
+    Returns: JsonResponse: Данные пользователя или ошибки
+    """
+    if not request.user or not request.user.is_authenticated:
+        return json_response({'error': 'Не авторизован'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    if request.method == 'GET':
+        return json_response(user_data(request.user))
+
+    data = read_json(request)
+    if data is None:
+        return json_response({'error': 'Некорректный JSON'}, status=status.HTTP_400_BAD_REQUEST)
+    body, response_status = await sync_to_async(_update_profile)(request.user, data)
+    headers = {'ETag': profile_etag(request)} if response_status == status.HTTP_200_OK else None
+    return json_response(body, status=response_status, headers=headers)
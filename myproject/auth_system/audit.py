@@ -0,0 +1,248 @@
+"""
+Журнал аудита аутентификации и авторизации.
+
+События не записываются в БД на пути обработки запроса: record() кладет их
+в ограниченный кольцевой буфер процесса, а фоновый поток вставляет их пачками
+через bulk_create, когда накопилось AUTH_AUDIT_BATCH_SIZE событий или прошло
+AUTH_AUDIT_FLUSH_INTERVAL секунд. При переполнении буфера (БД недоступна или
+не успевает) действует политика AUTH_AUDIT_OVERFLOW:
+    drop  - вытесняется самое старое событие, запрос не ждет;
+    block - запрос ждет освобождения места до AUTH_AUDIT_BLOCK_TIMEOUT секунд,
+            затем событие отбрасывается.
+Отброшенные события учитываются метрикой auth_audit_dropped_total.
+При штатном завершении процесса буфер записывается полностью.
+"""
+import atexit
+import ipaddress
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .metrics import AUDIT_DROPPED
+from .models import AuditEvent
+from .ratelimit import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop', 'block')
+
+# Поля записи журнала в выборках read_events()
+EVENT_FIELDS = ('id', 'created_at', 'event', 'user_id', 'ip', 'element', 'action', 'details')
+
+
+class AuditBuffer:
+    """
+    Кольцевой буфер событий с фоновой записью в БД пачками.
+    """
+
+    def __init__(self, capacity=10000, batch_size=500, interval=1.0, overflow='drop', block_timeout=0.5):
+        """
+        Args:
+            capacity (int): Максимальное количество событий в буфере
+            batch_size (int): Размер пачки bulk_create; после стольких событий запись начинается досрочно
+            interval (float): Период записи буфера в секундах
+            overflow (str): Политика переполнения: drop или block
+            block_timeout (float): Максимальное ожидание места в буфере при политике block, с
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Неизвестная политика переполнения: {overflow}')
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # Вызывается под _lock. После fork поток родителя не наследуется, а события
+        # родителя остаются в его буфере и записываются им самим
+        if self._thread is None or self._pid != os.getpid():
+            if self._pid is not None:
+                self._events.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def put(self, event):
+        """
+        Добавляет событие в буфер.
+
+        Args: event (AuditEvent): Несохраненная запись журнала
+        Returns: bool: False если событие отброшено
+        """
+        with self._lock:
+            self._ensure_thread()
+            if len(self._events) >= self.capacity:
+                self._wakeup.set()
+                if self.overflow == 'drop':
+                    self._events.popleft()
+                    AUDIT_DROPPED.inc(reason='overflow')
+                elif not self._not_full.wait_for(lambda: len(self._events) < self.capacity, self.block_timeout):
+                    AUDIT_DROPPED.inc(reason='timeout')
+                    return False
+            self._events.append(event)
+            if len(self._events) >= self.batch_size:
+                self._wakeup.set()
+        return True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+    def flush(self):
+        """
+        Записывает все накопленные события в БД пачками по batch_size.
+
+        Returns: int: Количество записанных событий
+        """
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+                self._not_full.notify_all()
+            if not batch:
+                return written
+            try:
+                AuditEvent.objects.bulk_create(batch)
+            except Exception:
+                AUDIT_DROPPED.inc(len(batch), reason='error')
+                raise
+            written += len(batch)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать журнал аудита')
+            finally:
+                # Соединение потока не должно держаться открытым между сбросами
+                connection.close()
+
+
+_buffer = AuditBuffer(
+    capacity=getattr(settings, 'AUTH_AUDIT_BUFFER_SIZE', 10000),
+    batch_size=getattr(settings, 'AUTH_AUDIT_BATCH_SIZE', 500),
+    interval=getattr(settings, 'AUTH_AUDIT_FLUSH_INTERVAL', 1.0),
+    overflow=getattr(settings, 'AUTH_AUDIT_OVERFLOW', 'drop'),
+    block_timeout=getattr(settings, 'AUTH_AUDIT_BLOCK_TIMEOUT', 0.5),
+)
+
+
+def _client_ip(request):
+    # IP из заголовка прокси (AUTH_RATELIMIT_IP_HEADER) задает клиент: значение, не являющееся
+    # адресом, не должно попасть в GenericIPAddressField и сорвать вставку всей пачки
+    if request is None:
+        return None
+    try:
+        return str(ipaddress.ip_address(get_client_ip(request)))
+    except ValueError:
+        return None
+
+
+def record(event, user=None, request=None, element='', action='', **details):
+    """
+    Ставит событие в очередь записи в журнал аудита.
+
+    Args:
+        event (str): Тип события из AuditEvent.EVENT_CHOICES
+        user (User): Пользователь события, если известен
+        request: HTTP запрос, из которого берется IP клиента
+        element (str): Бизнес-элемент (для отказов в доступе)
+        action (str): Действие (для отказов в доступе)
+        **details: Дополнительные сведения, сохраняются в поле details
+    Returns: bool: False если журнал выключен или событие отброшено
+    """
+    if not getattr(settings, 'AUTH_AUDIT_ENABLED', True):
+        return False
+    return _buffer.put(AuditEvent(
+        created_at=timezone.now(),
+        event=event,
+        user_id=getattr(user, 'pk', None),
+        ip=_client_ip(request),
+        element=element,
+        action=action,
+        details=details,
+    ))
+
+
+def record_denied(user, element_name, actions, request=None):
+    """
+    Записывает отказ в доступе.
+
+    Args:
+        user (User): Пользователь
+        element_name (str): Название бизнес-элемента
+        actions (list): Проверенные действия, ни одно из которых не разрешено
+        request: HTTP запрос (необязательно)
+    """
+    details = {'path': request.path} if request is not None else {}
+    record('permission_denied', user, request, element=element_name, action='|'.join(actions), **details)
+
+
+def read_events(since, until=None, event=None, user_id=None, chunk_size=2000):
+    """
+    Выборка журнала за интервал времени в порядке записи. Читается серверным курсором
+    по индексу created_at, поэтому подходит для выгрузки больших интервалов.
+
+    Args:
+        since (datetime): Начало интервала (включительно)
+        until (datetime): Конец интервала (не включая); None - до текущего момента
+        event (str): Тип события
+        user_id (int): ID пользователя
+        chunk_size (int): Количество строк, читаемых из курсора за раз
+    Returns: iterator: Словари с полями EVENT_FIELDS
+    """
+    return _events_queryset(since, until, event, user_id).iterator(chunk_size=chunk_size)
+
+
+def aread_events(since, until=None, event=None, user_id=None, chunk_size=2000):
+    """
+    Асинхронная версия read_events().
+
+    Returns: async iterator: Словари с полями EVENT_FIELDS
+    """
+    return _events_queryset(since, until, event, user_id).aiterator(chunk_size=chunk_size)
+
+
+def _events_queryset(since, until, event, user_id):
+    events = AuditEvent.objects.filter(created_at__gte=since)
+    if until is not None:
+        events = events.filter(created_at__lt=until)
+    if event:
+        events = events.filter(event=event)
+    if user_id is not None:
+        events = events.filter(user_id=user_id)
+    return events.order_by('created_at', 'id').values(*EVENT_FIELDS)
+
+
+def flush():
+    """Записывает накопленные события аудита в БД."""
+    return _buffer.flush()
+
+
+def _flush_at_exit():
+    # Исключение из atexit выводится интерпретатором как traceback; при завершении
+    # процесса ошибку записи (БД уже недоступна или удалена) достаточно залогировать
+    if not len(_buffer):
+        return
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception('Не удалось записать журнал аудита при завершении процесса')
+
+
+# Записываем буфер при штатном завершении процесса
+atexit.register(_flush_at_exit)
@@ -0,0 +1,20 @@
+from rest_framework.authentication import BaseAuthentication
+
+
+class MiddlewareAuthentication(BaseAuthentication):
+    """
+    Класс аутентификации DRF, использующий пользователя, найденного AuthenticationMiddleware.
+    Без него DRF заменяет request.user на AnonymousUser.
+    """
+
+    def authenticate(self, request):
+        """
+        Возвращает пользователя и токен, установленные middleware.
+
+        Args: request: DRF запрос
+        Returns: tuple: (пользователь, токен) или None, если запрос не аутентифицирован
+        """
+        user = getattr(request._request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        return user, getattr(request._request, 'auth_token', None)
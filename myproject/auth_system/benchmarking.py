@@ -0,0 +1,57 @@
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, percent):
+    """
+    Возвращает перцентиль выборки (метод ближайшего ранга).
+
+    Args:
+        values (list): Значения выборки
+        percent (float): Перцентиль от 0 до 100
+    Returns: float: Значение перцентиля
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def measure(operation, iterations, setup=None, warmup=1):
+    """
+    Измеряет задержку, пропускную способность и число SQL запросов операции.
+
+    Args:
+        operation (callable): Измеряемая операция
+        iterations (int): Количество замеров
+        setup (callable): Подготовка перед каждым замером (не входит во время)
+        warmup (int): Количество прогревочных вызовов
+    Returns: dict: ops_per_sec, p50_ms, p95_ms, p99_ms, mean_ms, queries_per_op
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        operation()
+
+    latencies = []
+    queries = 0
+    for _ in range(iterations):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            operation()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries += len(captured)
+
+    total_seconds = sum(latencies) / 1000
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total_seconds, 1) if total_seconds else None,
+        'mean_ms': round(sum(latencies) / iterations, 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries_per_op': round(queries / iterations, 2),
+    }
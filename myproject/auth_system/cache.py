@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кеш ограниченного размера.
+    При переполнении вытесняется запись, к которой дольше всего не обращались.
+    Если задан ttl, записи также устаревают по времени.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        Args:
+            maxsize (int): Максимальное количество записей в кеше
+            ttl (float): Время жизни записи в секундах; None - без ограничения
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Возвращает значение по ключу и помечает запись как недавно использованную.
+
+        Args:
+            key: Ключ записи
+            default: Значение по умолчанию, если записи нет
+        Returns: Значение из кеша или default
+        """
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            value, expires = self._data[key]
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        """
+        Сохраняет значение, при необходимости вытесняя самую старую запись.
+
+        Args:
+            key: Ключ записи
+            value: Сохраняемое значение
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """
+        Удаляет запись по ключу, если она есть.
+
+        Args: key: Ключ записи
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Удаляет все записи из кеша."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,54 @@
+"""
+ETag для условных GET запросов.
+
+Функции *_etag передаются в django.views.decorators.http.condition(): декоратор
+вычисляет ETag до вызова view и при совпадении с If-None-Match сразу отвечает 304,
+не выполняя запросы и сериализацию тела. ETag строится из дешевых признаков версии
+ресурса, а не из готового ответа:
+    profile_etag - ID пользователя и User.updated_at (объект уже загружен middleware);
+    roles_etag   - версия политики доступа (меняется при любом изменении ролей)
+                   и параметры страницы limit/cursor.
+"""
+import hashlib
+
+from .policy_version import get_policy_version
+from .renderers import dumps
+
+
+def make_etag(*parts):
+    """
+    Args: *parts: Признаки версии ресурса
+    Returns: str: Сильный ETag в кавычках
+    """
+    digest = hashlib.blake2b('\x1f'.join(map(str, parts)).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def content_etag(data):
+    """
+    ETag по содержимому ответа. Для данных, которые вычисляются один раз и затем не меняются.
+
+    Args: data: Данные ответа
+    Returns: str: Сильный ETag в кавычках
+    """
+    return make_etag(dumps(data).decode())
+
+
+def profile_etag(request, *args, **kwargs):
+    """
+    Returns: str: ETag профиля текущего пользователя или None для анонимного запроса
+    """
+    user = request.user
+    if not user or not user.is_authenticated:
+        return None
+    return make_etag('profile', user.pk, user.updated_at.isoformat())
+
+
+def roles_etag(request, *args, **kwargs):
+    """
+    Версия политики берется из кеша процесса, поэтому роль, созданная в другом процессе,
+    меняет ETag не позже чем через AUTH_POLICY_VERSION_TTL секунд.
+
+    Returns: str: ETag страницы списка ролей
+    """
+    return make_etag('roles', get_policy_version(), request.GET.get('limit', ''), request.GET.get('cursor', ''))
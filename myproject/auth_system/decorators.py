@@ -0,0 +1,173 @@
+"""
+Декларативная проверка прав для view.
+
+    @api_view(['GET'])
+    @require_permission('products', 'read')
+    def products_list(request): ...
+
+    @require_permission('products', any_of=['update', 'update_all'])
+    async def update_product(request, product_id): ...
+
+Таблица прав пользователя загружается один раз за запрос и запоминается
+на объекте запроса, поэтому повторные проверки внутри view не обращаются к кешу и БД.
+"""
+import functools
+
+from asgiref.sync import iscoroutinefunction
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .audit import record_denied
+from .http import json_response
+from .instrumentation import instrumented
+from .utils import aget_permission_table, get_permission_table, table_allows
+
+
+def _http_request(request):
+    # Запоминаем таблицу на исходном HttpRequest: DRF Request оборачивает его заново в каждом view
+    return request._request if isinstance(request, Request) else request
+
+
+def _error(request, message, status_code):
+    # Внутри api_view отвечаем Response DRF, в асинхронных view - JsonResponse того же вида
+    if isinstance(request, Request):
+        return Response({'error': message}, status=status_code)
+    return json_response({'error': message}, status=status_code)
+
+
+def is_authenticated(request):
+    """
+    Args: request: HTTP запрос
+    Returns: bool: True если middleware аутентифицировал пользователя
+    """
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated)
+
+
+@instrumented('perm')
+def get_request_permissions(request):
+    """
+    Возвращает таблицу прав пользователя запроса, загружая ее не более одного раза за запрос.
+
+    Args: request: HTTP запрос (HttpRequest или Request DRF)
+    Returns: dict: Название бизнес-элемента -> битовая маска действий
+    """
+    http_request = _http_request(request)
+    table = getattr(http_request, '_permission_table', None)
+    if table is None:
+        table = http_request._permission_table = get_permission_table(request.user)
+    return table
+
+
+@instrumented('perm')
+async def aget_request_permissions(request):
+    """
+    Асинхронная версия get_request_permissions().
+
+    Args: request: HTTP запрос
+    Returns: dict: Название бизнес-элемента -> битовая маска действий
+    """
+    http_request = _http_request(request)
+    table = getattr(http_request, '_permission_table', None)
+    if table is None:
+        table = http_request._permission_table = await aget_permission_table(request.user)
+    return table
+
+
+def has_permission(request, element_name, action):
+    """
+    Проверяет право пользователя запроса по запомненной таблице прав.
+
+    Args:
+        request: HTTP запрос
+        element_name (str): Название бизнес-элемента
+        action (str): Действие
+    Returns: bool: True если есть права, иначе False
+    """
+    return _allows_any(request, get_request_permissions(request), element_name, [action])
+
+
+async def ahas_permission(request, element_name, action):
+    """
+    Асинхронная версия has_permission().
+    """
+    return _allows_any(request, await aget_request_permissions(request), element_name, [action])
+
+
+def _allows_any(request, table, element_name, actions):
+    # Отказ записывается в журнал аудита один раз, после проверки всех действий
+    if any(table_allows(table, element_name, action) for action in actions):
+        return True
+    record_denied(request.user, element_name, actions, _http_request(request))
+    return False
+
+
+def require_permission(element_name, action=None, any_of=None):
+    """
+    Декоратор view: 401 для неаутентифицированного запроса и 403, если у пользователя
+    нет права action (или ни одного из прав any_of) на элемент element_name.
+    Поддерживает синхронные view (внутри api_view) и асинхронные.
+
+    Args:
+        element_name (str): Название бизнес-элемента
+        action (str): Требуемое действие
+        any_of (list): Действия, достаточно любого из которых
+    """
+    if (action is None) == (any_of is None):
+        raise ValueError('Нужно указать либо action, либо any_of')
+    actions = [action] if action is not None else list(any_of)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not is_authenticated(request):
+                    return _error(request, 'Не авторизован', status.HTTP_401_UNAUTHORIZED)
+                if not _allows_any(request, await aget_request_permissions(request), element_name, actions):
+                    return _error(request, 'Доступ запрещен', status.HTTP_403_FORBIDDEN)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_authenticated(request):
+                return _error(request, 'Не авторизован', status.HTTP_401_UNAUTHORIZED)
+            if not _allows_any(request, get_request_permissions(request), element_name, actions):
+                return _error(request, 'Доступ запрещен', status.HTTP_403_FORBIDDEN)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _scope(table, user, queryset, element_name, action, owner_field):
+    if table_allows(table, element_name, f'{action}_all'):
+        return queryset
+    if table_allows(table, element_name, action):
+        return queryset.filter(**{owner_field: user})
+    return queryset.none()
+
+
+def scope_queryset(request, queryset, element_name, action, owner_field='owner'):
+    """
+    Ограничивает queryset объектами, доступными пользователю запроса для действия action:
+    с правом '<action>_all' queryset возвращается без фильтра, с правом action -
+    только объекты пользователя (фильтр по индексированному полю владельца), иначе пустой.
+
+    Args:
+        request: HTTP запрос
+        queryset (QuerySet): Исходный queryset
+        element_name (str): Название бизнес-элемента
+        action (str): Базовое действие: read, update или delete
+        owner_field (str): Поле владельца объекта
+    Returns: QuerySet: Отфильтрованный queryset
+    """
+    return _scope(get_request_permissions(request), request.user, queryset, element_name, action, owner_field)
+
+
+async def ascope_queryset(request, queryset, element_name, action, owner_field='owner'):
+    """
+    Асинхронная версия scope_queryset().
+    """
+    table = await aget_request_permissions(request)
+    return _scope(table, request.user, queryset, element_name, action, owner_field)
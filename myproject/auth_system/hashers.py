@@ -0,0 +1,162 @@
+"""
+Хеширование и проверка паролей bcrypt в отдельном пуле потоков ограниченного размера.
+bcrypt освобождает GIL, поэтому потоки пула не мешают обработке остальных запросов,
+а ограничение очереди не дает всплеску логинов занять все воркеры.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+from .instrumentation import instrumented
+from .metrics import BCRYPT_SECONDS
+
+
+class PasswordHasherBusy(Exception):
+    """Пул хеширования паролей заполнен, задача не может быть поставлена в очередь."""
+
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'AUTH_BCRYPT_WORKERS', None) or os.cpu_count() or 1
+                queue_size = getattr(settings, 'AUTH_BCRYPT_QUEUE_SIZE', 32)
+                # Слоты учитывают и выполняющиеся, и ожидающие задачи
+                _slots = threading.BoundedSemaphore(workers + queue_size)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+    return _executor
+
+
+def _submit(fn, *args):
+    executor = _get_executor()
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def get_rounds():
+    """
+    Возвращает целевую стоимость (log2 числа раундов) bcrypt из настроек.
+
+    Returns: int: Стоимость bcrypt
+    """
+    return getattr(settings, 'AUTH_BCRYPT_ROUNDS', 12)
+
+
+def get_hash_rounds(hashed):
+    """
+    Извлекает стоимость из bcrypt хеша вида $2b$12$...
+
+    Args: hashed (str): bcrypt хеш
+    Returns: int: Стоимость или None, если хеш не в формате bcrypt
+    """
+    parts = hashed.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(hashed):
+    """
+    Проверяет, отличается ли стоимость хеша от целевой.
+
+    Args: hashed (str): bcrypt хеш
+    Returns: bool: True если хеш нужно пересчитать
+    """
+    return get_hash_rounds(hashed) != get_rounds()
+
+
+def _hashpw(raw_password):
+    salt = bcrypt.gensalt(rounds=get_rounds())
+    with BCRYPT_SECONDS.time(operation='hash'):
+        return bcrypt.hashpw(raw_password.encode('utf-8'), salt).decode('utf-8')
+
+
+def _checkpw(raw_password, hashed):
+    with BCRYPT_SECONDS.time(operation='verify'):
+        return bcrypt.checkpw(raw_password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def hash_passwords(raw_passwords, rounds):
+    """
+    Хеширует список паролей в текущем процессе. Используется пулом процессов
+    при массовом импорте, поэтому не обращается к настройкам Django.
+
+    Args:
+        raw_passwords (list): Исходные пароли
+        rounds (int): Стоимость bcrypt
+    Returns: list: bcrypt хеши в том же порядке
+    """
+    return [
+        bcrypt.hashpw(raw_password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+        for raw_password in raw_passwords
+    ]
+
+
+@instrumented('bcrypt')
+def hash_password(raw_password):
+    """
+    Хеширует пароль в пуле bcrypt.
+
+    Args: raw_password (str): Исходный пароль
+    Returns: str: bcrypt хеш
+    Raises: PasswordHasherBusy: Если очередь пула заполнена
+    """
+    return _submit(_hashpw, raw_password).result()
+
+
+@instrumented('bcrypt')
+def verify_password(raw_password, hashed):
+    """
+    Проверяет пароль в пуле bcrypt.
+
+    Args:
+        raw_password (str): Пароль для проверки
+        hashed (str): bcrypt хеш из БД
+    Returns: bool: True если пароль верный, иначе False
+    Raises: PasswordHasherBusy: Если очередь пула заполнена
+    """
+    return _submit(_checkpw, raw_password, hashed).result()
+
+
+@instrumented('bcrypt')
+async def ahash_password(raw_password):
+    """
+    Асинхронная версия hash_password(): ожидание не блокирует event loop.
+
+    Args: raw_password (str): Исходный пароль
+    Returns: str: bcrypt хеш
+    Raises: PasswordHasherBusy: Если очередь пула заполнена
+    """
+    return await asyncio.wrap_future(_submit(_hashpw, raw_password))
+
+
+@instrumented('bcrypt')
+async def averify_password(raw_password, hashed):
+    """
+    Асинхронная версия verify_password(): ожидание не блокирует event loop.
+
+    Args:
+        raw_password (str): Пароль для проверки
+        hashed (str): bcrypt хеш из БД
+    Returns: bool: True если пароль верный, иначе False
+    Raises: PasswordHasherBusy: Если очередь пула заполнена
+    """
+    return await asyncio.wrap_future(_submit(_checkpw, raw_password, hashed))
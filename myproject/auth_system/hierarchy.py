@@ -0,0 +1,168 @@
+"""
+Поддержка транзитивного замыкания иерархии ролей (RoleClosure).
+
+При изменении связи родитель -> потомок пересчитываются только строки замыкания
+дочерней роли и ее потомков: предки каждой затронутой роли находятся обходом
+графа наследования в памяти, а в БД записывается разница с текущими строками.
+
+Замыкание обновляется после фиксации транзакции, поэтому проверка циклов
+читает сами связи RoleInheritance, а изменения иерархии выполняются
+под общей блокировкой (строка PolicyVersion) до конца транзакции.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import PolicyVersion, Role, RoleClosure, RoleInheritance
+
+# Максимальное количество значений в одном IN (...)
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def add_roles(role_ids):
+    """
+    Добавляет строки замыкания роли с самой собой. Нужна для ролей,
+    созданных через bulk_create (сигналы post_save для них не отправляются).
+
+    Args: role_ids (iterable): ID ролей
+    """
+    RoleClosure.objects.bulk_create(
+        [RoleClosure(ancestor_id=role_id, descendant_id=role_id, depth=0) for role_id in role_ids],
+        batch_size=CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def lock_hierarchy():
+    """
+    Блокирует изменения иерархии ролей в других транзакциях до конца текущей.
+    Без блокировки две транзакции, добавляющие A -> B и B -> A, не видят связей
+    друг друга и обе проходят проверку циклов. Должна вызываться внутри atomic().
+    """
+    list(PolicyVersion.objects.select_for_update().filter(pk=1).values_list('pk', flat=True))
+
+
+def would_create_cycle(parent_id, child_id, exclude_id=None):
+    """
+    Проверяет, создаст ли связь parent -> child цикл в иерархии.
+    Обходит связи RoleInheritance вверх от parent (один запрос на уровень),
+    поэтому видит связи, добавленные в текущей транзакции.
+
+    Args:
+        parent_id (int): ID родительской роли
+        child_id (int): ID дочерней роли
+        exclude_id (int): ID изменяемой связи, которая не учитывается
+    Returns: bool: True если child уже является предком parent (или это одна роль)
+    """
+    if parent_id == child_id:
+        return True
+    links = RoleInheritance.objects.exclude(pk=exclude_id) if exclude_id else RoleInheritance.objects.all()
+    seen = {parent_id}
+    frontier = [parent_id]
+    while frontier:
+        parents = set()
+        for chunk in _chunks(frontier):
+            parents.update(links.filter(child_id__in=chunk).values_list('parent_id', flat=True))
+        if child_id in parents:
+            return True
+        frontier = parents - seen
+        seen |= frontier
+    return False
+
+
+def validate_inheritance(parent_id, child_id, exclude_id=None):
+    """
+    Блокирует иерархию и проверяет связь на цикл. Должна вызываться внутри atomic().
+
+    Raises: ValidationError: Если связь создает цикл
+    """
+    lock_hierarchy()
+    if would_create_cycle(parent_id, child_id, exclude_id):
+        raise ValidationError('Наследование ролей не может быть циклическим')
+
+
+def _ancestor_depths(role_id, parents):
+    # Обход в ширину вверх по графу: предок -> длина кратчайшего пути
+    depths = {role_id: 0}
+    frontier = [role_id]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for current in frontier:
+            for parent_id in parents[current]:
+                if parent_id not in depths:
+                    depths[parent_id] = depth
+                    next_frontier.append(parent_id)
+        frontier = next_frontier
+    return depths
+
+
+def refresh_closure(role_ids):
+    """
+    Пересчитывает строки замыкания ролей role_ids и всех их потомков
+    по текущим связям RoleInheritance.
+
+    Args: role_ids (iterable): ID ролей, у которых изменились родители
+    Returns: tuple: Количество добавленных и удаленных строк
+    """
+    role_ids = set(role_ids)
+    with transaction.atomic():
+        affected = set(role_ids)
+        for chunk in _chunks(role_ids):
+            affected.update(
+                RoleClosure.objects.filter(ancestor_id__in=chunk).values_list('descendant_id', flat=True)
+            )
+        # Удаленные роли пропускаем: их строки удаляются каскадно
+        existing_roles = set()
+        for chunk in _chunks(affected):
+            existing_roles.update(Role.objects.filter(pk__in=chunk).values_list('id', flat=True))
+        affected &= existing_roles
+
+        parents = defaultdict(list)
+        for parent_id, child_id in RoleInheritance.objects.values_list('parent_id', 'child_id'):
+            parents[child_id].append(parent_id)
+
+        expected = {}
+        for role_id in affected:
+            for ancestor_id, depth in _ancestor_depths(role_id, parents).items():
+                expected[(ancestor_id, role_id)] = depth
+
+        current = {}
+        for chunk in _chunks(affected):
+            for pk, ancestor_id, descendant_id, depth in RoleClosure.objects.filter(
+                descendant_id__in=chunk
+            ).values_list('id', 'ancestor_id', 'descendant_id', 'depth'):
+                current[(ancestor_id, descendant_id)] = (pk, depth)
+
+        stale = [pk for key, (pk, depth) in current.items() if expected.get(key) != depth]
+        missing = [key for key, depth in expected.items() if current.get(key, (None, None))[1] != depth]
+        for chunk in _chunks(stale):
+            RoleClosure.objects.filter(pk__in=chunk).delete()
+        RoleClosure.objects.bulk_create(
+            [RoleClosure(ancestor_id=ancestor_id, descendant_id=descendant_id,
+                         depth=expected[ancestor_id, descendant_id])
+             for ancestor_id, descendant_id in missing],
+            batch_size=CHUNK_SIZE,
+        )
+    return len(missing), len(stale)
+
+
+def rebuild_closure():
+    """
+    Полностью перестраивает замыкание по связям RoleInheritance.
+    Используется после массовых изменений ролей в обход сигналов.
+
+    Returns: tuple: Количество добавленных и удаленных строк
+    """
+    role_ids = list(Role.objects.values_list('id', flat=True))
+    with transaction.atomic():
+        add_roles(role_ids)
+        return refresh_closure(role_ids)
@@ -0,0 +1,128 @@
+import json
+from datetime import datetime, time
+
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .renderers import dumps
+
+# Форматы потоковой выгрузки
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
+
+# Количество строк, отправляемых клиенту одним куском
+STREAM_CHUNK_SIZE = 2000
+
+
+def json_response(data, status=200, headers=None):
+    """
+    Формирует JSON ответ в том же виде, что и JSONRenderer DRF.
+
+    Args:
+        data: Данные ответа
+        status (int): HTTP статус
+        headers (dict): Дополнительные заголовки
+    Returns: HttpResponse: HTTP ответ
+    """
+    return HttpResponse(dumps(data), status=status, headers=headers, content_type='application/json')
+
+
+def read_json(request):
+    """
+    Разбирает JSON тело запроса.
+
+    Args: request: HTTP запрос
+    Returns: dict: Данные запроса или None, если тело не является JSON объектом
+    """
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_moment(value, name):
+    """
+    Разбирает параметр запроса с датой или датой и временем в формате ISO 8601.
+    Дата без времени означает начало дня, время без часового пояса - текущий часовой пояс.
+
+    Args:
+        value (str): Значение параметра
+        name (str): Название параметра для сообщения об ошибке
+    Returns: datetime: Момент времени с часовым поясом
+    Raises: ValueError: Если значение не является датой
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name}: ожидается дата или дата и время в формате ISO 8601')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _dumps(row):
+    return dumps(row).decode()
+
+
+def _join(buffer, output, first):
+    # Кусок ответа из сериализованных строк: строки NDJSON или элементы JSON массива
+    if output == 'ndjson':
+        return '\n'.join(buffer) + '\n'
+    return ('' if first else ',') + ','.join(buffer)
+
+
+def stream_json(rows, output='ndjson', chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Генератор тела потокового ответа: NDJSON (объект на строку) или JSON массив.
+    Строки копятся до chunk_size и отправляются одним куском.
+
+    Args:
+        rows (iterable): Словари строк, обычно queryset.values().iterator(chunk_size)
+        output (str): ndjson или json
+        chunk_size (int): Количество строк в одном куске ответа
+    Yields: str: Очередной кусок ответа
+    """
+    if output == 'json':
+        yield '['
+    first = True
+    buffer = []
+    for row in rows:
+        buffer.append(_dumps(row))
+        if len(buffer) >= chunk_size:
+            yield _join(buffer, output, first)
+            first = False
+            buffer = []
+    if buffer:
+        yield _join(buffer, output, first)
+    if output == 'json':
+        yield ']'
+
+
+async def astream_json(rows, output='ndjson', chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Асинхронная версия stream_json() для StreamingHttpResponse под ASGI.
+
+    Args: rows (async iterable): Словари строк, обычно queryset.values().aiterator(chunk_size)
+    """
+    if output == 'json':
+        yield '['
+    first = True
+    buffer = []
+    async for row in rows:
+        buffer.append(_dumps(row))
+        if len(buffer) >= chunk_size:
+            yield _join(buffer, output, first)
+            first = False
+            buffer = []
+    if buffer:
+        yield _join(buffer, output, first)
+    if output == 'json':
+        yield ']'
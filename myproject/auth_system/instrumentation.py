@@ -0,0 +1,205 @@
+"""
+Инструментирование запросов: число SQL запросов, время в БД, в аутентификации,
+в проверках прав, в bcrypt и в view. Результаты отдаются в заголовке
+Server-Timing и пишутся одной JSON строкой в лог auth_system.instrumentation.
+
+Измеряется только доля запросов AUTH_INSTRUMENTATION_SAMPLE_RATE; для остальных
+инструментированные функции выполняются с накладными расходами одной проверки
+contextvar.
+"""
+import functools
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Метрики текущего запроса; None, если запрос не попал в выборку
+_current = ContextVar('auth_request_timings', default=None)
+
+# Порядок и описания метрик в заголовке Server-Timing (значения заголовков - только latin-1)
+TIMING_DESCRIPTIONS = {
+    'db': 'SQL',
+    'auth': 'Authentication',
+    'perm': 'Permission checks',
+    'bcrypt': 'bcrypt',
+    'view': 'View and serialization',
+    'total': 'Total',
+}
+
+
+class RequestTimings:
+    """
+    Накопитель длительностей и счетчиков одного запроса.
+    """
+
+    def __init__(self):
+        self.durations = dict.fromkeys(TIMING_DESCRIPTIONS, 0.0)
+        self.counts = dict.fromkeys(TIMING_DESCRIPTIONS, 0)
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+        self.counts[name] += 1
+
+    def server_timing(self):
+        """
+        Returns: str: Значение заголовка Server-Timing
+        """
+        parts = []
+        for name, description in TIMING_DESCRIPTIONS.items():
+            if name == 'db':
+                description = f'SQL x{self.counts[name]}'
+            elif name != 'total' and not self.counts[name]:
+                continue
+            parts.append(f'{name};dur={self.durations[name] * 1000:.2f};desc="{description}"')
+        return ', '.join(parts)
+
+    def as_dict(self):
+        data = {f'{name}_ms': round(self.durations[name] * 1000, 3) for name in TIMING_DESCRIPTIONS}
+        data['queries'] = self.counts['db']
+        data['permission_checks'] = self.counts['perm']
+        return data
+
+
+def instrumented(name):
+    """
+    Декоратор: добавляет время выполнения функции к метрике name текущего запроса.
+    Поддерживает синхронные и асинхронные функции.
+
+    Args: name (str): Название метрики из TIMING_DESCRIPTIONS
+    """
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                timings = _current.get()
+                if timings is None:
+                    return await func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    timings.add(name, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.add(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started)
+
+
+def _install_query_wrapper(connection, **kwargs):
+    # Обертка ставится на каждое соединение: под ASGI sync_to_async выполняет
+    # запросы в других потоках со своими соединениями, а contextvar копируется туда
+    if _query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_wrapper)
+
+
+class InstrumentationMiddleware:
+    """
+    Middleware для измерения времени обработки запроса.
+    Должен стоять в MIDDLEWARE перед AuthenticationMiddleware, чтобы учитывать время аутентификации.
+    Отключается (MiddlewareNotUsed), если AUTH_INSTRUMENTATION_SAMPLE_RATE равен 0.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'AUTH_INSTRUMENTATION_SAMPLE_RATE', 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.headers = getattr(settings, 'AUTH_INSTRUMENTATION_HEADERS', True)
+
+        connection_created.connect(_install_query_wrapper, dispatch_uid='auth_instrumentation')
+        for connection in connections.all(initialized_only=True):
+            _install_query_wrapper(connection)
+
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        context_token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(context_token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        context_token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(context_token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    def finish(self, request, response, timings, total):
+        """
+        Добавляет заголовок Server-Timing и пишет строку лога.
+
+        Args:
+            request: HTTP запрос
+            response: HTTP ответ
+            timings (RequestTimings): Метрики запроса
+            total (float): Полное время обработки, с
+        Returns: HttpResponse: HTTP ответ
+        """
+        timings.add('total', total)
+        # Все, что не аутентификация, приходится на view и последующие middleware
+        timings.add('view', max(0.0, total - timings.durations['auth']))
+        if self.headers:
+            response['Server-Timing'] = timings.server_timing()
+
+        user = getattr(request, 'user', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user_id': getattr(user, 'id', None),
+            'sample_rate': self.sample_rate,
+            **timings.as_dict(),
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
+        return response
@@ -0,0 +1,64 @@
+import time
+
+import bcrypt
+from django.core.management.base import BaseCommand, CommandError
+
+from auth_system.benchmarking import percentile
+from auth_system.hashers import get_rounds
+
+
+class Command(BaseCommand):
+    """
+    Измеряет время хеширования и проверки пароля bcrypt на текущей машине
+    для диапазона стоимостей, чтобы подобрать AUTH_BCRYPT_ROUNDS под бюджет времени входа.
+    """
+
+    help = 'Измеряет задержку bcrypt hash/verify для каждой стоимости'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-cost', type=int, default=10, help='Минимальная стоимость (от 4)')
+        parser.add_argument('--max-cost', type=int, default=14, help='Максимальная стоимость (до 31)')
+        parser.add_argument('--iterations', type=int, default=10, help='Число замеров на каждую стоимость')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Бюджет p99 на проверку пароля, мс; выводится рекомендуемая стоимость')
+
+    def handle(self, *args, **options):
+        min_cost, max_cost = options['min_cost'], options['max_cost']
+        iterations = options['iterations']
+        budget_ms = options['budget_ms']
+        if not 4 <= min_cost <= max_cost <= 31:
+            raise CommandError('Стоимость должна быть в диапазоне 4..31 и min-cost <= max-cost')
+        if iterations < 1:
+            raise CommandError('Число замеров должно быть положительным')
+
+        password = b'benchmark-password'
+        self.stdout.write(f'Текущая стоимость AUTH_BCRYPT_ROUNDS: {get_rounds()}')
+        self.stdout.write(f"{'cost':>4} {'hash p50':>10} {'hash p99':>10} {'verify p50':>11} {'verify p99':>11}  (мс)")
+
+        recommended = None
+        for cost in range(min_cost, max_cost + 1):
+            hash_times, verify_times = [], []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=cost))
+                hash_times.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                bcrypt.checkpw(password, hashed)
+                verify_times.append((time.perf_counter() - started) * 1000)
+
+            verify_p99 = percentile(verify_times, 99)
+            self.stdout.write(
+                f'{cost:>4} {percentile(hash_times, 50):>10.1f} {percentile(hash_times, 99):>10.1f} '
+                f'{percentile(verify_times, 50):>11.1f} {verify_p99:>11.1f}'
+            )
+            if budget_ms is not None and verify_p99 <= budget_ms:
+                recommended = cost
+
+        if budget_ms is not None:
+            if recommended is None:
+                self.stdout.write(self.style.WARNING(f'Ни одна стоимость не укладывается в {budget_ms} мс'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Рекомендуемая стоимость для бюджета {budget_ms} мс: AUTH_BCRYPT_ROUNDS = {recommended}'
+                ))
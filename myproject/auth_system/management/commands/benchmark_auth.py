@@ -0,0 +1,193 @@
+import json
+import platform
+import sys
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from auth_system import audit, writebehind
+from auth_system.benchmarking import measure
+from auth_system.middleware import AuthenticationMiddleware
+from auth_system.models import AccessRule, BusinessElement, Role, User, UserRole
+from auth_system.synthetic import create_synthetic_data
+from auth_system.utils import PERMISSION_FIELDS, check_permission, invalidate_permissions
+
+BENCH_PASSWORD = 'bench-password'
+BENCH_ELEMENTS = ['products', 'orders', 'users', 'access_rules', 'dashboard']
+
+
+def parse_counts(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк горячих путей аутентификации и авторизации.
+
+    Работает на отдельной тестовой БД (создается и удаляется командой), измеряет
+    пропускную способность, p50/p95/p99 и число SQL запросов на операцию и
+    сохраняет результаты в JSON для сравнения запусков.
+    """
+
+    help = 'Измеряет задержку и число запросов для login, middleware, check_permission, profile и role_list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='bench_results.json', help='Файл для результатов в JSON')
+        parser.add_argument('--iterations', type=int, default=200, help='Замеров на сценарий')
+        parser.add_argument('--login-iterations', type=int, default=20,
+                            help='Замеров для login (каждый включает bcrypt)')
+        parser.add_argument('--role-counts', type=parse_counts, default=[1, 5, 20, 100],
+                            help='Количество ролей пользователя для check_permission, через запятую')
+        parser.add_argument('--users', type=int, default=1000, help='Количество синтетических пользователей')
+        parser.add_argument('--elements', type=int, default=200, help='Количество синтетических элементов')
+        parser.add_argument('--compare', default=None, help='JSON предыдущего запуска для сравнения')
+        parser.add_argument('--fail-threshold', type=float, default=None,
+                            help='Завершиться с ошибкой, если p95 какого-либо сценария вырос больше, чем на N%%')
+        parser.add_argument('--keepdb', action='store_true', help='Не пересоздавать тестовую БД')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            # Измеряем саму проверку пароля и создание сессии, а не ограничитель частоты
+            with override_settings(AUTH_RATELIMIT_ENABLED=False):
+                results = self.run_benchmarks(options)
+        finally:
+            # События аудита и изменения сессий записываются в тестовую БД до ее удаления
+            audit.flush()
+            writebehind.flush()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'options': {key: options[key] for key in ('iterations', 'login_iterations', 'role_counts',
+                                                          'users', 'elements')},
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['fail_threshold'])
+
+    def setup_data(self, options):
+        max_roles = max(options['role_counts'])
+        bench_role = Role.objects.create(name='bench_admin')
+        for name in BENCH_ELEMENTS:
+            element = BusinessElement.objects.create(name=name)
+            AccessRule.objects.create(role=bench_role, element=element, **{field: True for field in PERMISSION_FIELDS})
+
+        create_synthetic_data(users=options['users'], roles=max_roles, elements=options['elements'],
+                              roles_per_user=min(3, max_roles), log=lambda message: None)
+
+        self.user = User.objects.create_user('bench@example.com', BENCH_PASSWORD, first_name='Bench', last_name='User')
+        UserRole.objects.create(user=self.user, role=bench_role)
+        # Отдельный пользователь для login: вход завершает предыдущие сессии
+        User.objects.create_user('bench-login@example.com', BENCH_PASSWORD, first_name='Bench', last_name='Login')
+
+        role_ids = list(Role.objects.filter(name__startswith='role_').order_by('name').values_list('id', flat=True))
+        self.permission_users = {}
+        for count in options['role_counts']:
+            user = User.objects.create_user(f'bench-roles-{count}@example.com', BENCH_PASSWORD,
+                                            first_name='Bench', last_name=f'Roles{count}')
+            UserRole.objects.bulk_create([UserRole(user=user, role_id=role_id) for role_id in role_ids[:count]])
+            self.permission_users[count] = user
+        invalidate_permissions()
+
+    def request(self, client, method, url, expected_status, **kwargs):
+        response = getattr(client, method)(url, **kwargs)
+        if response.status_code != expected_status:
+            raise CommandError(f'{method.upper()} {url}: ожидался {expected_status}, получен {response.status_code}')
+        return response
+
+    def run_benchmarks(self, options):
+        self.setup_data(options)
+        iterations = options['iterations']
+        client = Client()
+        results = {}
+
+        login_body = {'email': 'bench-login@example.com', 'password': BENCH_PASSWORD}
+        self.stdout.write('login...')
+        results['login'] = measure(
+            lambda: self.request(client, 'post', '/api/login/', 200, data=login_body, content_type='application/json'),
+            options['login_iterations'],
+        )
+
+        token = self.request(client, 'post', '/api/login/', 200, content_type='application/json',
+                             data={'email': self.user.email, 'password': BENCH_PASSWORD}).json()['token']
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+        self.stdout.write('middleware...')
+        middleware = AuthenticationMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+
+        def lookup():
+            request = factory.get('/', **auth)
+            middleware(request)
+            if request.user is None:
+                raise CommandError('Middleware не аутентифицировал запрос')
+
+        results['middleware_token_lookup'] = measure(lookup, iterations)
+
+        self.stdout.write('check_permission...')
+        for count, user in self.permission_users.items():
+            results[f'check_permission_roles_{count}_cold'] = measure(
+                lambda: check_permission(user, 'products', 'read'), iterations, setup=invalidate_permissions
+            )
+            results[f'check_permission_roles_{count}_warm'] = measure(
+                lambda: check_permission(user, 'products', 'read'), iterations
+            )
+
+        self.stdout.write('profile...')
+        results['profile_get'] = measure(lambda: self.request(client, 'get', '/api/profile/', 200, **auth), iterations)
+        results['profile_put'] = measure(
+            lambda: self.request(client, 'put', '/api/profile/', 200, data={'first_name': 'Bench'},
+                                 content_type='application/json', **auth),
+            iterations,
+        )
+
+        self.stdout.write('role_list...')
+        results['role_list'] = measure(lambda: self.request(client, 'get', '/api/admin/roles/', 200, **auth), iterations)
+
+        self.stdout.write(f"{'сценарий':<36} {'ops/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'SQL/op':>7}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<36} {result['ops_per_sec'] or 0:>9.1f} {result['p50_ms']:>9.3f} "
+                f"{result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} {result['queries_per_op']:>7.2f}"
+            )
+        return results
+
+    def compare(self, results, baseline_path, fail_threshold):
+        with open(baseline_path, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+        regressions = []
+        self.stdout.write(f"{'сценарий':<36} {'p95 было':>10} {'p95 стало':>10} {'изм.':>8} {'SQL было/стало':>15}")
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            self.stdout.write(
+                f"{name:<36} {before['p95_ms']:>10.3f} {result['p95_ms']:>10.3f} {change:>+7.1f}% "
+                f"{before['queries_per_op']:>7.2f}/{result['queries_per_op']:<7.2f}"
+            )
+            if fail_threshold is not None and change > fail_threshold:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f'Регрессия p95 больше {fail_threshold}%: {", ".join(regressions)}')
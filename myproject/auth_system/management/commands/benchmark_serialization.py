@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from auth_system.benchmarking import percentile
+from auth_system.models import Role, User
+from auth_system.renderers import ORJSONRenderer, orjson
+from auth_system.serializers import RoleSerializer, UserSerializer, role_data, user_data
+
+
+def make_users(count):
+    now = timezone.now()
+    return [
+        User(id=i, email=f'user{i}@example.com', first_name=f'Имя{i}', last_name=f'Фамилия{i}',
+             middle_name='', is_active=i % 10 != 0, date_joined=now)
+        for i in range(1, count + 1)
+    ]
+
+
+def make_roles(count):
+    return [Role(id=i, name=f'role-{i}', description=f'Синтетическая роль {i}') for i in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает построение JSON ответа со списком объектов: ModelSerializer(many=True).data
+    с JSONRenderer против FastRepresentation с ORJSONRenderer. Объекты создаются
+    в памяти без сохранения, поэтому измеряется только сериализация, без БД.
+    """
+
+    help = 'Измеряет сериализацию списков пользователей и ролей: DRF против быстрого пути'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Количество объектов в списке')
+        parser.add_argument('--iterations', type=int, default=20, help='Число замеров на сценарий')
+
+    def handle(self, *args, **options):
+        rows, iterations = options['rows'], options['iterations']
+        if rows < 1 or iterations < 1:
+            raise CommandError('Количество объектов и замеров должно быть положительным')
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson не установлен, ORJSONRenderer использует JSONRenderer'))
+
+        datasets = [
+            ('users', make_users(rows), UserSerializer, user_data),
+            ('roles', make_roles(rows), RoleSerializer, role_data),
+        ]
+        json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+
+        self.stdout.write(f'{rows} объектов в списке, {iterations} замеров')
+        self.stdout.write(f"{'сценарий':<28} {'p50':>9} {'p99':>9} {'строк/с':>11} {'ускорение':>10}  (мс)")
+        for name, instances, serializer_class, fast in datasets:
+            scenarios = [
+                ('drf + json', lambda: json_renderer.render(serializer_class(instances, many=True).data)),
+                ('fast + json', lambda: json_renderer.render(fast.many(instances))),
+                ('fast + orjson', lambda: orjson_renderer.render(fast.many(instances))),
+            ]
+            outputs = {scenario: operation() for scenario, operation in scenarios}
+            if len(set(outputs.values())) != 1:
+                raise CommandError(f'{name}: ответы быстрого пути отличаются от DRF')
+
+            baseline = None
+            for scenario, operation in scenarios:
+                latencies = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    operation()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                p50 = percentile(latencies, 50)
+                baseline = baseline or p50
+                self.stdout.write(
+                    f'{name + ": " + scenario:<28} {p50:>9.2f} {percentile(latencies, 99):>9.2f} '
+                    f'{rows / p50 * 1000:>11.0f} {baseline / p50:>9.1f}x'
+                )
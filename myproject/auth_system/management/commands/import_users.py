@@ -0,0 +1,237 @@
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from auth_system.hashers import get_rounds, hash_passwords
+from auth_system.models import Role, User, UserRole
+from auth_system.policy_version import bump_policy_version
+from auth_system.utils import invalidate_permissions
+
+# Готовый хеш bcrypt: $2a$/$2b$/$2y$, стоимость из двух цифр, 22 символа соли и 31 символ хеша
+BCRYPT_HASH_RE = re.compile(r'\$2[aby]\$\d\d\$[./A-Za-z0-9]{53}')
+
+
+def read_rows(path, file_format):
+    """
+    Построчно читает пользователей из CSV или JSONL, не загружая файл целиком.
+
+    Args:
+        path (str): Путь к файлу
+        file_format (str): 'csv' или 'jsonl'
+    Returns: generator: Пары (номер строки, словарь полей); для строки JSONL,
+        не являющейся JSON объектом, вместо словаря None
+    """
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            # Номер строки с учетом заголовка
+            for line_number, row in enumerate(csv.DictReader(source), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else None
+
+
+def parse_roles(value):
+    """
+    Разбирает список ролей: в CSV - строка через ';', в JSONL - список или строка.
+
+    Args: value: Значение поля roles
+    Returns: list: Названия ролей
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(';')
+    return [name.strip() for name in value if name.strip()]
+
+
+class Command(BaseCommand):
+    """
+    Потоковый импорт пользователей из CSV/JSONL.
+
+    Поля: email, first_name, last_name, middle_name, password или password_hash
+    (готовый bcrypt хеш), roles. Пароли хешируются в пуле процессов на всех ядрах,
+    пользователи и их роли вставляются пачками bulk_create в отдельных транзакциях.
+    В памяти одновременно находятся не более двух пачек.
+    """
+
+    help = 'Импортирует пользователей из CSV или JSONL пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу CSV или JSONL')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help='Формат файла (по умолчанию определяется по расширению)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество пользователей в пачке')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Количество процессов для хеширования паролей')
+        parser.add_argument('--rounds', type=int, default=None,
+                            help='Стоимость bcrypt (по умолчанию AUTH_BCRYPT_ROUNDS)')
+        parser.add_argument('--default-role', default=None, help='Роль для пользователей без поля roles')
+        parser.add_argument('--skip-existing', action='store_true',
+                            help='Пропускать пользователей с уже существующим email')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('Размер пачки и количество процессов должны быть положительными')
+
+        self.rounds = options['rounds'] or get_rounds()
+        self.workers = options['workers']
+        self.skip_existing = options['skip_existing']
+        self.default_roles = parse_roles(options['default_role'])
+        self.roles = dict(Role.objects.values_list('name', 'id'))
+        unknown = set(self.default_roles) - set(self.roles)
+        if unknown:
+            raise CommandError(f'Неизвестные роли: {", ".join(sorted(unknown))}')
+
+        self.imported = self.skipped = self.linked = 0
+        self.started = time.monotonic()
+        rows = read_rows(path, file_format)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # Пока одна пачка вставляется в БД, пароли следующей уже хешируются
+            pending = None
+            while True:
+                chunk = list(islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                prepared = self.prepare(pool, chunk)
+                if pending is not None:
+                    self.insert(*pending)
+                pending = prepared
+            if pending is not None:
+                self.insert(*pending)
+
+        if self.linked:
+            invalidate_permissions()
+            bump_policy_version()
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: импортировано {self.imported}, пропущено {self.skipped}, '
+            f'назначено ролей {self.linked} за {elapsed:.1f} с'
+        ))
+
+    def prepare(self, pool, chunk):
+        """
+        Проверяет строки пачки и отправляет пароли на хеширование в пул.
+
+        Args:
+            pool (ProcessPoolExecutor): Пул процессов
+            chunk (list): Пары (номер строки, поля)
+        Returns: tuple: (пользователи, роли по email, задачи хеширования)
+        """
+        users, roles = [], {}
+        for line_number, row in chunk:
+            if row is None:
+                self.skipped += 1
+                self.stderr.write(f'Строка {line_number} пропущена: некорректный JSON')
+                continue
+            email = (row.get('email') or '').strip()
+            normalized = User.objects.normalize_email(email)
+            password_hash = row.get('password_hash') or ''
+            password = row.get('password') or ''
+            role_names = parse_roles(row.get('roles')) or self.default_roles
+            unknown = set(role_names) - set(self.roles)
+            if not email or not (password or password_hash):
+                reason = 'нет email или пароля'
+            elif not password and not BCRYPT_HASH_RE.fullmatch(password_hash):
+                reason = 'password_hash не является хешем bcrypt'
+            elif unknown:
+                reason = f'неизвестные роли {", ".join(sorted(unknown))}'
+            elif normalized in roles:
+                # Роли пачки хранятся по email: вторая строка с тем же email получила бы чужого пользователя
+                reason = f'повторяющийся email {normalized}'
+            else:
+                reason = None
+            if reason:
+                self.skipped += 1
+                self.stderr.write(f'Строка {line_number} пропущена: {reason}')
+                continue
+
+            user = User(
+                email=normalized,
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                middle_name=row.get('middle_name') or None,
+                password=password_hash,
+            )
+            users.append((user, password))
+            roles[user.email] = role_names
+
+        if self.skip_existing:
+            # Существующих пользователей отбрасываем до хеширования их паролей
+            existing = set(
+                User.objects.filter(email__in=[user.email for user, _ in users]).values_list('email', flat=True)
+            )
+            self.skipped += len(existing)
+            users = [(user, password) for user, password in users if user.email not in existing]
+        to_hash = [(user, password) for user, password in users if not user.password.startswith('$2')]
+        users = [user for user, _ in users]
+
+        # Делим пароли между процессами поровну
+        step = max(1, -(-len(to_hash) // self.workers))
+        jobs = [
+            (to_hash[start:start + step],
+             pool.submit(hash_passwords, [password for _, password in to_hash[start:start + step]], self.rounds))
+            for start in range(0, len(to_hash), step)
+        ]
+        return users, roles, jobs
+
+    def insert(self, users, roles, jobs):
+        """
+        Дожидается хешей и вставляет пачку пользователей и их роли в одной транзакции.
+
+        Args:
+            users (list): Пользователи пачки
+            roles (dict): Email -> названия ролей
+            jobs (list): Пары (пользователи с паролями, задача хеширования)
+        """
+        for pairs, future in jobs:
+            for (user, _), password_hash in zip(pairs, future.result()):
+                user.password = password_hash
+
+        try:
+            with transaction.atomic():
+                if self.skip_existing:
+                    # Email мог появиться после prepare(): предыдущая пачка вставлялась,
+                    # пока хешировались пароли этой. Такие строки ignore_conflicts пропустил бы
+                    # молча, а роли из них достались бы уже существующему пользователю
+                    existing = set(
+                        User.objects.filter(email__in=[user.email for user in users]).values_list('email', flat=True)
+                    )
+                    self.skipped += len(existing)
+                    users = [user for user in users if user.email not in existing]
+                User.objects.bulk_create(users, ignore_conflicts=self.skip_existing)
+                # ID нужны для связей с ролями; не все БД возвращают их из bulk_create
+                ids = dict(
+                    User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'id')
+                )
+                links = [
+                    UserRole(user_id=ids[user.email], role_id=self.roles[name])
+                    for user in users if user.email in ids
+                    for name in roles[user.email]
+                ]
+                UserRole.objects.bulk_create(links, ignore_conflicts=True)
+        except IntegrityError as exc:
+            raise CommandError(f'Ошибка вставки пачки (повторяющийся email?): {exc}')
+
+        # Считаем вставленные строки, а не переданные в bulk_create
+        self.imported += len(ids)
+        self.skipped += len(users) - len(ids)
+        self.linked += len(links)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'Импортировано: {self.imported} ({self.imported / elapsed:.0f} пользователей/с)')
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from auth_system.models import Session
+
+
+def delete_in_batches(queryset, batch_size, pause=0):
+    """
+    Удаляет строки queryset пачками, чтобы не держать долгие блокировки.
+
+    Args:
+        queryset (QuerySet): Удаляемые сессии
+        batch_size (int): Размер пачки
+        pause (float): Пауза между пачками в секундах
+    Returns: int: Количество удаленных строк
+    """
+    total = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        # У Session нет зависимых моделей и сигналов, поэтому это один DELETE ... WHERE id IN (...)
+        deleted, _ = Session.objects.filter(id__in=ids).delete()
+        total += deleted
+        if len(ids) < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+class Command(BaseCommand):
+    """
+    Удаляет истекшие и деактивированные сессии пачками ограниченного размера.
+    С --interval работает как фоновый процесс и повторяет очистку периодически.
+    """
+
+    help = 'Удаляет истекшие и неактивные сессии пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество строк в одном DELETE')
+        parser.add_argument('--pause', type=float, default=0, help='Пауза между пачками, сек')
+        parser.add_argument('--skip-expired', action='store_true',
+                            help='Не удалять истекшие сессии (если они удаляются через session_partitions drop)')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Повторять очистку каждые N секунд, не завершаясь')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+
+        while True:
+            self.reap(options)
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+
+    def reap(self, options):
+        started = time.monotonic()
+        inactive = delete_in_batches(
+            Session.objects.filter(is_active=False), options['batch_size'], options['pause']
+        )
+        expired = 0
+        if not options['skip_expired']:
+            # Неактивные строки уже удалены; условие по is_active позволяет читать индекс (is_active, expires_at)
+            expired = delete_in_batches(
+                Session.objects.filter(is_active=True, expires_at__lt=timezone.now()),
+                options['batch_size'], options['pause'],
+            )
+        self.stdout.write(
+            f'Удалено неактивных сессий: {inactive}, истекших: {expired} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from auth_system.hierarchy import rebuild_closure
+from auth_system.policy_version import bump_policy_version
+from auth_system.utils import invalidate_permissions
+
+
+class Command(BaseCommand):
+    """
+    Перестраивает замыкание иерархии ролей по связям RoleInheritance.
+    Нужна после изменения ролей или связей в обход ORM (bulk_create, SQL, загрузка дампа).
+    """
+
+    help = 'Перестраивает таблицу замыкания иерархии ролей'
+
+    def handle(self, *args, **options):
+        added, removed = rebuild_closure()
+        invalidate_permissions()
+        bump_policy_version()
+        self.stdout.write(self.style.SUCCESS(f'Замыкание перестроено: добавлено {added}, удалено {removed} строк'))
@@ -0,0 +1,172 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from auth_system.models import Session
+
+PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(value, offset=0):
+    """
+    Возвращает начало месяца, сдвинутого на offset месяцев.
+
+    Args:
+        value (datetime): Исходная дата
+        offset (int): Сдвиг в месяцах
+    Returns: datetime: Начало месяца в UTC
+    """
+    month = value.year * 12 + value.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    """
+    Управляет секционированием таблицы сессий по expires_at в PostgreSQL.
+
+    convert - однократно преобразует таблицу в секционированную по месяцам;
+    ensure  - создает секции на несколько месяцев вперед;
+    drop    - удаляет секции, все сессии в которых уже истекли.
+
+    Секционированная таблица обслуживается вне миграций Django: первичный ключ
+    становится (id, expires_at), а ограничение session_token_hash_uniq, которое
+    миграции считают уникальностью token_hash, становится UNIQUE (token_hash, expires_at),
+    то есть token_hash уникален только в пределах секции. Глобальный уникальный индекс
+    без ключа секционирования PostgreSQL не поддерживает. Совпадение хешей разных токенов
+    практически исключено (SHA-256 токена с jti), но повторная вставка той же сессии
+    с другим expires_at не будет отклонена. Последующие миграции Session для такой таблицы
+    пишутся через RunSQL (см. комментарий в Session.Meta).
+    """
+
+    help = 'Секционирование таблицы сессий по expires_at (только PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['convert', 'ensure', 'drop'])
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='На сколько месяцев вперед создавать секции')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование поддерживается только для PostgreSQL')
+
+        self.table = Session._meta.db_table
+        action = options['action']
+        partitioned = self.is_partitioned()
+
+        if action == 'convert':
+            if partitioned:
+                raise CommandError(f'Таблица {self.table} уже секционирована')
+            self.convert(options['months_ahead'])
+            return
+
+        if not partitioned:
+            raise CommandError(f'Таблица {self.table} не секционирована, сначала выполните convert')
+        if action == 'ensure':
+            self.ensure(timezone.now(), options['months_ahead'])
+        else:
+            self.drop_expired()
+
+    def is_partitioned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [self.table])
+            row = cursor.fetchone()
+        return row is not None and row[0] == 'p'
+
+    def partition_name(self, start):
+        return f'{self.table}_p{start.year:04d}_{start.month:02d}'
+
+    def create_partition(self, cursor, start):
+        name = self.partition_name(start)
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} '
+            f'PARTITION OF {connection.ops.quote_name(self.table)} FOR VALUES FROM (%s) TO (%s)',
+            [start, month_start(start, 1)]
+        )
+        return name
+
+    def ensure(self, now, months_ahead):
+        created = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            for offset in range(months_ahead + 1):
+                created.append(self.create_partition(cursor, month_start(now, offset)))
+        self.stdout.write(f'Секции на месте: {", ".join(created)}')
+
+    def drop_expired(self):
+        now = timezone.now()
+        dropped = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                'WHERE i.inhparent = to_regclass(%s)',
+                [self.table]
+            )
+            for (name,) in cursor.fetchall():
+                match = PARTITION_NAME.search(name)
+                if not match:
+                    # Секция по умолчанию не удаляется
+                    continue
+                start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+                # Секцию можно удалить целиком, когда истекли все сессии в ней
+                if month_start(start, 1) <= now:
+                    quoted = connection.ops.quote_name(name)
+                    cursor.execute(
+                        f'ALTER TABLE {connection.ops.quote_name(self.table)} DETACH PARTITION {quoted}'
+                    )
+                    cursor.execute(f'DROP TABLE {quoted}')
+                    dropped.append(name)
+        self.stdout.write(f'Удалено секций: {len(dropped)} {", ".join(dropped)}')
+
+    def convert(self, months_ahead):
+        qn = connection.ops.quote_name
+        table = qn(self.table)
+        old = qn(f'{self.table}_unpartitioned')
+        sequence = qn(f'{self.table}_part_id_seq')
+        user_table = qn(Session._meta.get_field('user').related_model._meta.db_table)
+        columns = ', '.join(qn(field.column) for field in Session._meta.concrete_fields)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'SELECT MIN(expires_at) FROM {table}')
+            oldest = cursor.fetchone()[0] or timezone.now()
+
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+            cursor.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (expires_at)')
+            # Identity-колонки в секционированных таблицах доступны не во всех версиях PostgreSQL
+            cursor.execute(f'CREATE SEQUENCE {sequence} OWNED BY {table}.id')
+            cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+
+            cursor.execute(f'CREATE TABLE {qn(self.table + "_default")} PARTITION OF {table} DEFAULT')
+            now = timezone.now()
+            offset = 0
+            while month_start(oldest, offset) <= month_start(now, months_ahead):
+                self.create_partition(cursor, month_start(oldest, offset))
+                offset += 1
+
+            cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {old}')
+            cursor.execute(f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)',
+                           [f'{self.table}_part_id_seq'])
+            cursor.execute(f'DROP TABLE {old}')
+
+            # Ключ секционирования обязан входить в первичный ключ и уникальные индексы
+            cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, expires_at)')
+            # Ограничение (а не просто индекс) с тем же именем, что и в миграциях, чтобы
+            # RemoveConstraint('session_token_hash_uniq') в будущей миграции мог его удалить
+            cursor.execute(
+                f'ALTER TABLE {table} ADD CONSTRAINT session_token_hash_uniq '
+                f'UNIQUE (token_hash, expires_at) INCLUDE (is_active)'
+            )
+            cursor.execute(f'CREATE INDEX session_active_expires_idx ON {table} (is_active, expires_at)')
+            cursor.execute(f'CREATE INDEX {qn(self.table + "_user_id_idx")} ON {table} (user_id)')
+            cursor.execute(
+                f'ALTER TABLE {table} ADD CONSTRAINT {qn(self.table + "_user_id_fk")} '
+                f'FOREIGN KEY (user_id) REFERENCES {user_table} (id) DEFERRABLE INITIALLY DEFERRED'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Таблица {self.table} секционирована по expires_at'))
+        self.stdout.write(self.style.WARNING(
+            'token_hash теперь уникален только в пределах секции; миграции, меняющие схему '
+            f'{self.table}, выполняйте через RunSQL'
+        ))
@@ -0,0 +1,336 @@
+"""
+Метрики в формате Prometheus без внешних зависимостей.
+
+Счетчики и гистограммы хранятся в памяти процесса. Если задан AUTH_METRICS_DIR,
+каждый процесс (воркер gunicorn) периодически сохраняет свои значения в файл
+metrics_<pid>.json в этом каталоге, а endpoint суммирует файлы всех воркеров.
+Каталог должен быть общим для воркеров одного хоста и очищаться при деплое.
+При AUTH_METRICS_ENABLED = False значения не записываются и поток записи не запускается.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы корзин гистограмм длительности, в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_lock = threading.Lock()
+
+
+class Metric:
+    """
+    Базовый класс метрики: значения по кортежу значений меток.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        pairs = list(zip(self.labelnames, key)) + list(extra.items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter(Metric):
+    """
+    Монотонно возрастающий счетчик.
+    """
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Увеличивает счетчик.
+
+        Args:
+            amount (float): Величина увеличения
+            **labels: Значения меток
+        """
+        if not _enabled():
+            return
+        key = self._key(labels)
+        with _lock:
+            _store.ensure_thread()
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{self._labels(key)} {_format(value)}'
+
+
+class Histogram(Metric):
+    """
+    Гистограмма с фиксированными корзинами. Значение по меткам хранится списком:
+    количество наблюдений в каждой корзине (последняя - +Inf), затем их сумма.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        Добавляет наблюдение.
+
+        Args:
+            value (float): Наблюдаемое значение
+            **labels: Значения меток
+        """
+        if not _enabled():
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            _store.ensure_thread()
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, **labels):
+        """
+        Контекстный менеджер, измеряющий длительность блока.
+
+        Args: **labels: Значения меток
+        """
+        return _Timer(self, labels)
+
+    @staticmethod
+    def merge(value, other):
+        return [left + right for left, right in zip(value, other)]
+
+    def render(self, values):
+        bounds = [_format(bound) for bound in self.buckets] + ['+Inf']
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f'{self.name}_bucket{self._labels(key, le=bound)} {cumulative}'
+            yield f'{self.name}_sum{self._labels(key)} {_format(counts[-1])}'
+            yield f'{self.name}_count{self._labels(key)} {cumulative}'
+
+
+class Gauge(Metric):
+    """
+    Мгновенное значение, вычисляемое функцией в момент запроса метрик.
+    Не сохраняется в файлы воркеров и не суммируется между ними.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def render(self, values):
+        yield f'{self.name} {_format(self.function())}'
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+def _enabled():
+    return getattr(settings, 'AUTH_METRICS_ENABLED', True)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _snapshot():
+    # Значения счетчиков и гистограмм процесса: {имя: [[метки, значение], ...]}
+    with _lock:
+        return {
+            metric.name: [[list(key), value if metric.type == 'counter' else list(value)]
+                          for key, value in metric._values.items()]
+            for metric in _registry.values()
+            if metric.type != 'gauge'
+        }
+
+
+def _merge_into(target, snapshot):
+    for name, entries in snapshot.items():
+        metric = _registry.get(name)
+        if metric is None or metric.type == 'gauge':
+            continue
+        values = target.setdefault(name, {})
+        for key, value in entries:
+            key = tuple(key)
+            values[key] = metric.merge(values[key], value) if key in values else value
+
+
+class FileStore:
+    """
+    Сохранение значений процесса в файл metrics_<pid>.json для агрегации между воркерами.
+    Файл пишется фоновым потоком каждые interval секунд и при завершении процесса.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._pid = None
+
+    @property
+    def directory(self):
+        return getattr(settings, 'AUTH_METRICS_DIR', None)
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'metrics_{pid}.json')
+
+    def ensure_thread(self):
+        # Вызывается под _lock
+        if self._pid == os.getpid():
+            return
+        if self._pid is not None:
+            # Процесс создан fork: значения родителя уже учтены в его файле
+            for metric in _registry.values():
+                metric._values.clear()
+        self._pid = os.getpid()
+        if self.directory:
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = getattr(settings, 'AUTH_METRICS_FLUSH_INTERVAL', 5.0)
+        while True:
+            time.sleep(interval)
+            try:
+                self.write()
+            except Exception:
+                logger.exception('Не удалось сохранить метрики процесса')
+
+    def write(self):
+        """Атомарно записывает значения текущего процесса в его файл."""
+        if not self.directory or self._pid != os.getpid():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics_')
+        with os.fdopen(descriptor, 'w') as temp_file:
+            json.dump(_snapshot(), temp_file)
+        os.replace(temp_path, self.path(self._pid))
+
+    def read_others(self):
+        """
+        Читает файлы остальных процессов, включая завершившиеся:
+        их счетчики остаются в сумме, чтобы значения не уменьшались.
+
+        Returns: list: Снимки значений процессов
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        own = f'metrics_{os.getpid()}.json'
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.startswith('metrics_') or not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as metrics_file:
+                    snapshots.append(json.load(metrics_file))
+            except (OSError, ValueError):
+                # Файл удален или еще не дописан
+                continue
+        return snapshots
+
+
+_store = FileStore()
+
+
+def collect():
+    """
+    Собирает значения метрик текущего процесса и остальных воркеров.
+
+    Returns: dict: {имя метрики: {кортеж меток: значение}}
+    """
+    merged = {}
+    _merge_into(merged, _snapshot())
+    for snapshot in _store.read_others():
+        _merge_into(merged, snapshot)
+    return merged
+
+
+def render():
+    """
+    Формирует текст метрик в формате Prometheus (text exposition format 0.0.4).
+
+    Returns: str: Текст метрик
+    """
+    merged = collect()
+    lines = []
+    for metric in _registry.values():
+        lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.render(merged.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+# Число активных сессий: (значение, время подсчета по time.monotonic())
+_active_sessions_cache = None
+
+
+def _count_active_sessions():
+    # COUNT(*) по таблице сессий выполняется не чаще раза в AUTH_METRICS_ACTIVE_SESSIONS_TTL секунд
+    global _active_sessions_cache
+    cached = _active_sessions_cache
+    if cached is not None and time.monotonic() - cached[1] < getattr(settings, 'AUTH_METRICS_ACTIVE_SESSIONS_TTL', 30):
+        return cached[0]
+    from .models import Session
+    count = Session.objects.filter(is_active=True, expires_at__gt=timezone.now()).count()
+    _active_sessions_cache = (count, time.monotonic())
+    return count
+
+
+LOGINS = Counter('auth_login_total', 'Попытки входа', ['result'])
+BCRYPT_SECONDS = Histogram('auth_bcrypt_seconds', 'Длительность bcrypt', ['operation'])
+SESSION_LOOKUPS = Counter('auth_session_lookups_total', 'Проверки токена в middleware', ['result'])
+PERMISSION_CHECKS = Counter('auth_permission_checks_total', 'Решения check_permission',
+                            ['element', 'action', 'decision'])
+PERMISSION_CLAIMS = Counter('auth_permission_claims_total', 'Снимки прав в JWT: used, stale, absent, invalid',
+                            ['result'])
+AUDIT_DROPPED = Counter('auth_audit_dropped_total', 'События аудита, не записанные в журнал', ['reason'])
+ACTIVE_SESSIONS = Gauge('auth_active_sessions', 'Активные неистекшие сессии', _count_active_sessions)
+
+# Сохраняем значения при штатном завершении процесса
+atexit.register(_store.write)
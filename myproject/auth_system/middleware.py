@@ -1,5 +1,13 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import JsonResponse
+from .instrumentation import instrumented
+from .metrics import SESSION_LOOKUPS
 from .models import Session
+from .policy import atable_from_claims, table_from_claims
+from .tokens import aget_cached_user, decode_token, get_cached_user, is_token_revoked
+from .writebehind import (
+    adeactivate_session, atouch_session, deactivate_session, is_session_deactivated, touch_session
+)
 import jwt
 from django.conf import settings
 
@@ -8,13 +16,29 @@ class AuthenticationMiddleware:
     """
     Middleware для аутентификации пользователей по JWT токенам.
     Проверяет заголовок Authorization и устанавливает request.user.
+
+    По умолчанию токен ищется в таблице сессий. При AUTH_JWT_STATELESS = True
+    подпись и срок действия токена проверяются локально, а БД используется
+    только для загрузки пользователя (с кешированием). Если токен содержит
+    актуальный снимок прав (AUTH_JWT_PERMISSION_CLAIMS), проверки прав
+    в запросе выполняются по нему без обращения к БД.
+
+    Поддерживает синхронный и асинхронный режимы: под ASGI запросы
+    обрабатываются без переключения в поток, с асинхронными запросами к БД.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         """
         Инициализация middleware.
         """
         self.get_response = get_response
+        self.stateless = getattr(settings, 'AUTH_JWT_STATELESS', False)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
         """
@@ -23,29 +47,197 @@ class AuthenticationMiddleware:
         Args: request: HTTP запрос
         Returns: HttpResponse: HTTP ответ
         """
-        auth_header = request.headers.get('Authorization')
+        if self.is_async:
+            return self.__acall__(request)
+
+        request.user = None
+        token = self.get_bearer_token(request)
+        if token:
+            if self.stateless:
+                self.authenticate_token(request, token)
+            else:
+                self.authenticate_session(request, token)
+
+        response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        """
+        Асинхронная обработка входящего запроса.
+
+        Args: request: HTTP запрос
+        Returns: HttpResponse: HTTP ответ
+        """
+        request.user = None
+        token = self.get_bearer_token(request)
+        if token:
+            if self.stateless:
+                await self.aauthenticate_token(request, token)
+            else:
+                await self.aauthenticate_session(request, token)
 
+        response = await self.get_response(request)
+        return response
+
+    @staticmethod
+    def get_bearer_token(request):
+        """
+        Извлекает токен из заголовка Authorization.
+
+        Args: request: HTTP запрос
+        Returns: str: Токен или None, если заголовок отсутствует или неверного формата
+        """
+        auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                # Ищем активную сессию с данным токеном
-                session = Session.objects.select_related('user').get(token=token, is_active=True)
-
-                if session.is_valid():
-                    # Устанавливаем пользователя в request
-                    request.user = session.user
-                    request.session_obj = session
-                else:
-                    # Деактивируем просроченную сессию
-                    session.is_active = False
-                    session.save()
-                    request.user = None
-            except (Session.DoesNotExist, jwt.InvalidTokenError):
-                # Невалидный токен или сессия не найдена
-                request.user = None
+            return auth_header.split(' ')[1]
+        return None
+
+    @staticmethod
+    def apply_permission_claims(request, table):
+        """
+        Запоминает таблицу прав из актуального снимка в токене: проверки прав
+        в этом запросе (require_permission, has_permission) не обращаются к БД.
+
+        Args:
+            request: HTTP запрос
+            table (dict): Таблица прав из policy.table_from_claims() или None
+        """
+        if table is not None:
+            request._permission_table = table
+
+    @instrumented('auth')
+    def authenticate_session(self, request, token):
+        """
+        Аутентифицирует запрос по активной сессии в БД.
+
+        Args:
+            request: HTTP запрос
+            token (str): JWT токен из заголовка
+        """
+        token_hash = Session.hash_token(token)
+        try:
+            # Ищем активную сессию с данным токеном
+            session = Session.objects.select_related('user').get(
+                token_hash=token_hash, is_active=True, user__is_active=True
+            )
+        except Session.DoesNotExist:
+            # Невалидный токен или сессия не найдена
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        if is_session_deactivated(token_hash, session.user_id):
+            # Сессия уже завершена, но запись об этом еще в буфере
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        if session.is_valid():
+            # Устанавливаем пользователя в request
+            request.user = session.user
+            request.session_obj = session
+            request.auth_token = token
+            SESSION_LOOKUPS.inc(result='hit')
+            touch_session(token_hash)
         else:
-            # Заголовок Authorization отсутствует или неверного формата
-            request.user = None
+            # Деактивируем просроченную сессию
+            SESSION_LOOKUPS.inc(result='expired')
+            deactivate_session(token_hash)
 
-        response = self.get_response(request)
-        return response
\ No newline at end of file
+    @instrumented('auth')
+    def authenticate_token(self, request, token):
+        """
+        Аутентифицирует запрос без обращения к таблице сессий:
+        проверяет подпись, срок действия и список отозванных токенов.
+
+        Args:
+            request: HTTP запрос
+            token (str): JWT токен из заголовка
+        """
+        try:
+            payload = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            SESSION_LOOKUPS.inc(result='expired')
+            return
+        except jwt.InvalidTokenError:
+            # Подпись неверна
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        if is_token_revoked(token, payload):
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        user = get_cached_user(payload['user_id'])
+        if user is not None:
+            request.user = user
+            request.auth_token = token
+            request.token_payload = payload
+            self.apply_permission_claims(request, table_from_claims(payload, user))
+            SESSION_LOOKUPS.inc(result='hit')
+            touch_session(Session.hash_token(token))
+        else:
+            SESSION_LOOKUPS.inc(result='miss')
+
+    @instrumented('auth')
+    async def aauthenticate_session(self, request, token):
+        """
+        Асинхронная версия authenticate_session().
+
+        Args:
+            request: HTTP запрос
+            token (str): JWT токен из заголовка
+        """
+        token_hash = Session.hash_token(token)
+        try:
+            session = await Session.objects.select_related('user').aget(
+                token_hash=token_hash, is_active=True, user__is_active=True
+            )
+        except Session.DoesNotExist:
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        if is_session_deactivated(token_hash, session.user_id):
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        if session.is_valid():
+            request.user = session.user
+            request.session_obj = session
+            request.auth_token = token
+            SESSION_LOOKUPS.inc(result='hit')
+            await atouch_session(token_hash)
+        else:
+            SESSION_LOOKUPS.inc(result='expired')
+            await adeactivate_session(token_hash)
+
+    @instrumented('auth')
+    async def aauthenticate_token(self, request, token):
+        """
+        Асинхронная версия authenticate_token().
+
+        Args:
+            request: HTTP запрос
+            token (str): JWT токен из заголовка
+        """
+        try:
+            payload = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            SESSION_LOOKUPS.inc(result='expired')
+            return
+        except jwt.InvalidTokenError:
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        if is_token_revoked(token, payload):
+            SESSION_LOOKUPS.inc(result='miss')
+            return
+
+        user = await aget_cached_user(payload['user_id'])
+        if user is not None:
+            request.user = user
+            request.auth_token = token
+            request.token_payload = payload
+            self.apply_permission_claims(request, await atable_from_claims(payload, user))
+            SESSION_LOOKUPS.inc(result='hit')
+            await atouch_session(Session.hash_token(token))
+        else:
+            SESSION_LOOKUPS.inc(result='miss')
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_token_hash(apps, schema_editor):
+    """Заполняет token_hash для существующих сессий пачками."""
+    Session = apps.get_model('auth_system', 'Session')
+    batch = []
+    for session in Session.objects.only('id', 'token').iterator(chunk_size=BATCH_SIZE):
+        session.token_hash = hashlib.sha256(session.token.encode('utf-8')).hexdigest()
+        batch.append(session)
+        if len(batch) >= BATCH_SIZE:
+            Session.objects.bulk_update(batch, ['token_hash'])
+            batch = []
+    if batch:
+        Session.objects.bulk_update(batch, ['token_hash'])
+
+
+def restore_token(apps, schema_editor):
+    """
+    Исходные токены из хеша не восстановить: заполняем token хешем,
+    чтобы сохранить уникальность. Такие сессии перестанут проходить проверку.
+    """
+    Session = apps.get_model('auth_system', 'Session')
+    Session.objects.update(token=models.F('token_hash'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_system', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='token_hash',
+            field=models.CharField(max_length=64, null=True, verbose_name='Хеш JWT токена'),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='token',
+            field=models.CharField(max_length=500, null=True, unique=True, verbose_name='JWT токен'),
+        ),
+        migrations.RunPython(fill_token_hash, restore_token),
+        migrations.RemoveField(
+            model_name='session',
+            name='token',
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='token_hash',
+            field=models.CharField(max_length=64, verbose_name='Хеш JWT токена'),
+        ),
+        migrations.AddConstraint(
+            model_name='session',
+            constraint=models.UniqueConstraint(fields=('token_hash',), name='session_token_hash_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['is_active', 'expires_at'], name='session_active_expires_idx'),
+        ),
+    ]
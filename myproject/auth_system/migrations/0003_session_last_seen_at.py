@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_system', '0002_session_token_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность'),
+        ),
+    ]
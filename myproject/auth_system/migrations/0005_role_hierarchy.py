@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_closure(apps, schema_editor):
+    """Добавляет существующие роли в замыкание: до этой миграции иерархии нет, только пары роли с собой."""
+    Role = apps.get_model('auth_system', 'Role')
+    RoleClosure = apps.get_model('auth_system', 'RoleClosure')
+    RoleClosure.objects.bulk_create(
+        [RoleClosure(ancestor_id=role_id, descendant_id=role_id, depth=0)
+         for role_id in Role.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_system', '0003_session_last_seen_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0, verbose_name='Длина кратчайшего пути')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='auth_system.role', verbose_name='Предок')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='auth_system.role', verbose_name='Потомок')),
+            ],
+            options={
+                'verbose_name': 'Замыкание иерархии ролей',
+                'verbose_name_plural': 'Замыкание иерархии ролей',
+                'indexes': [models.Index(fields=['ancestor', 'descendant'], name='role_closure_ancestor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('descendant', 'ancestor'), name='role_closure_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoleInheritance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parent_links', to='auth_system.role', verbose_name='Дочерняя роль')),
+                ('parent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='child_links', to='auth_system.role', verbose_name='Родительская роль')),
+            ],
+            options={
+                'verbose_name': 'Наследование ролей',
+                'verbose_name_plural': 'Наследование ролей',
+                'unique_together': {('parent', 'child')},
+            },
+        ),
+        migrations.RunPython(fill_closure, migrations.RunPython.noop),
+    ]
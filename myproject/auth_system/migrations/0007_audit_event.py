@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_system', '0006_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Время события')),
+                ('event', models.CharField(choices=[('login', 'Вход'), ('login_failed', 'Неудачный вход'), ('logout', 'Выход'), ('account_deleted', 'Удаление аккаунта'), ('permission_denied', 'Отказ в доступе')], max_length=32, verbose_name='Событие')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP адрес')),
+                ('element', models.CharField(blank=True, max_length=100, verbose_name='Бизнес-элемент')),
+                ('action', models.CharField(blank=True, max_length=100, verbose_name='Действие')),
+                ('details', models.JSONField(blank=True, default=dict, verbose_name='Подробности')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_events', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Событие аудита',
+                'verbose_name_plural': 'Журнал аудита',
+                'indexes': [models.Index(fields=['created_at', 'id'], name='audit_created_idx'), models.Index(fields=['user', 'created_at'], name='audit_user_created_idx')],
+            },
+        ),
+    ]
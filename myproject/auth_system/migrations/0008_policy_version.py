@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:09
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    """Создает единственную строку версии политики."""
+    PolicyVersion = apps.get_model('auth_system', 'PolicyVersion')
+    PolicyVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_system', '0007_audit_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolicyVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия политики доступа',
+                'verbose_name_plural': 'Версия политики доступа',
+            },
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
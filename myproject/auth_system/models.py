@@ -1,11 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
-import bcrypt
+import hashlib
 import jwt
+import secrets
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
 
+from .hashers import ahash_password, averify_password, hash_password, needs_rehash, verify_password
+
+# Время жизни JWT токена и сессии
+TOKEN_LIFETIME = timedelta(days=1)
+
 
 class UserManager(BaseUserManager):
     """Кастомный менеджер для модели User с поддержкой bcrypt хеширования паролей"""
@@ -60,20 +66,51 @@ class User(AbstractBaseUser):
     is_superuser = models.BooleanField(default=False, verbose_name='Суперпользователь')
     date_joined = models.DateTimeField(auto_now_add=True, verbose_name='Дата регистрации')
     deleted_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата удаления')
+    # Меняется при каждом save(), кроме save(update_fields=...) без этого поля; основа ETag профиля
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+    # Увеличивается при изменении ролей пользователя; кеш и снимок его прав действительны для одной версии
+    permissions_version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия ролей')
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
 
+    def save(self, *args, **kwargs):
+        # permissions_version меняется только запросом UPDATE из bump_user_permissions_version():
+        # полное сохранение объекта, загруженного до изменения ролей, не должно откатывать версию
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'permissions_version'
+            ]
+        super().save(*args, **kwargs)
+
     def set_password(self, raw_password):
         """
-        Хеширует пароль с использованием bcrypt.
+        Хеширует пароль с использованием bcrypt в пуле хеширования.
+
+        Args: raw_password (str): Исходный пароль
+        Raises: PasswordHasherBusy: Если пул хеширования перегружен
+        """
+        self.password = hash_password(raw_password)
+
+    async def aset_password(self, raw_password):
+        """
+        Асинхронная версия set_password().
 
         Args: raw_password (str): Исходный пароль
+        Raises: PasswordHasherBusy: Если пул хеширования перегружен
         """
-        salt = bcrypt.gensalt()
-        self.password = bcrypt.hashpw(raw_password.encode('utf-8'), salt).decode('utf-8')
+        self.password = await ahash_password(raw_password)
+
+    def password_needs_rehash(self):
+        """
+        Проверяет, отличается ли стоимость bcrypt хеша пароля от AUTH_BCRYPT_ROUNDS.
+
+        Returns: bool: True если хеш нужно пересчитать
+        """
+        return needs_rehash(self.password)
 
     def check_password(self, raw_password):
         """
@@ -81,19 +118,34 @@ class User(AbstractBaseUser):
 
         Args: raw_password (str): Пароль для проверки
         Returns: bool: True если пароль верный, иначе False
+        Raises: PasswordHasherBusy: Если пул хеширования перегружен
         """
-        return bcrypt.checkpw(raw_password.encode('utf-8'), self.password.encode('utf-8'))
+        return verify_password(raw_password, self.password)
 
-    def generate_token(self):
+    async def acheck_password(self, raw_password):
+        """
+        Асинхронная версия check_password(). Проверка выполняется в пуле хеширования.
+
+        Args: raw_password (str): Пароль для проверки
+        Returns: bool: True если пароль верный, иначе False
+        Raises: PasswordHasherBusy: Если пул хеширования перегружен
+        """
+        return await averify_password(raw_password, self.password)
+
+    def generate_token(self, extra_claims=None):
         """
         Генерирует JWT токен для пользователя.
 
+        Args: extra_claims (dict): Дополнительные claims (например, снимок прав из policy.permission_claims())
         Returns: str: JWT токен
         """
         payload = {
             'user_id': self.id,
-            'exp': timezone.now() + timedelta(days=1),  # Токен действителен 1 день
-            'iat': timezone.now()  # Время создания токена
+            'exp': timezone.now() + TOKEN_LIFETIME,  # Токен действителен 1 день
+            'iat': timezone.now(),  # Время создания токена
+            # iat имеет точность до секунды: без jti два входа за одну секунду дают одинаковый токен
+            'jti': secrets.token_hex(8),
+            **(extra_claims or {}),
         }
         return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
 
@@ -101,6 +153,11 @@ class User(AbstractBaseUser):
         return f"{self.email} ({self.first_name} {self.last_name})"
 
     class Meta:
+        indexes = [
+            # Фильтры каталога пользователей при keyset-пагинации по id
+            models.Index(fields=['is_active', 'id'], name='user_active_id_idx'),
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
 
@@ -184,17 +241,91 @@ class UserRole(models.Model):
         return f"{self.user.email} - {self.role.name}"
 
 
+class RoleInheritance(models.Model):
+    """
+    Модель наследования ролей.
+    Дочерняя роль получает все правила доступа родительской и ее предков.
+    """
+
+    parent = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='child_links',
+                               verbose_name='Родительская роль')
+    child = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='parent_links',
+                              verbose_name='Дочерняя роль')
+
+    class Meta:
+        unique_together = ['parent', 'child']
+        verbose_name = 'Наследование ролей'
+        verbose_name_plural = 'Наследование ролей'
+
+    def __str__(self):
+        return f"{self.child.name} наследует {self.parent.name}"
+
+    def save(self, *args, **kwargs):
+        # Проверка циклов в pre_save блокирует иерархию до конца транзакции,
+        # поэтому проверка и запись связи должны быть в одной транзакции
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class RoleClosure(models.Model):
+    """
+    Транзитивное замыкание иерархии ролей: строка на каждую пару (предок, потомок),
+    включая пару роли с самой собой. Позволяет получить правила всех ролей пользователя
+    с учетом наследования одним JOIN независимо от глубины иерархии.
+    Поддерживается модулем hierarchy, вручную не изменяется.
+    """
+
+    ancestor = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='descendant_links',
+                                 verbose_name='Предок')
+    descendant = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='ancestor_links',
+                                   verbose_name='Потомок')
+    depth = models.PositiveIntegerField(default=0, verbose_name='Длина кратчайшего пути')
+
+    class Meta:
+        constraints = [
+            # Уникальный индекс начинается с descendant: по нему ищутся предки ролей пользователя
+            models.UniqueConstraint(fields=['descendant', 'ancestor'], name='role_closure_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'descendant'], name='role_closure_ancestor_idx'),
+        ]
+        verbose_name = 'Замыкание иерархии ролей'
+        verbose_name_plural = 'Замыкание иерархии ролей'
+
+    def __str__(self):
+        return f"{self.ancestor.name} -> {self.descendant.name} ({self.depth})"
+
+
+class PolicyVersion(models.Model):
+    """
+    Глобальная версия политики доступа: единственная строка, значение которой увеличивается
+    при любом изменении ролей, правил, бизнес-элементов или наследования. Назначение ролей
+    отражается в версии ролей пользователя (User.permissions_version).
+    Снимок прав в JWT действителен, только пока его версия совпадает с текущей.
+    """
+
+    version = models.BigIntegerField(default=0, verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'Версия политики доступа'
+        verbose_name_plural = 'Версия политики доступа'
+
+    def __str__(self):
+        return str(self.version)
+
+
 class Session(models.Model):
     """
     Модель сессий пользователей.
-    Хранит активные JWT токены для управления сессиями.
+    Хранит SHA-256 хеши активных JWT токенов для управления сессиями.
     """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sessions', verbose_name='Пользователь')
-    token = models.CharField(max_length=500, unique=True, verbose_name='JWT токен')
+    token_hash = models.CharField(max_length=64, verbose_name='Хеш JWT токена')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     expires_at = models.DateTimeField(verbose_name='Дата истечения')
     is_active = models.BooleanField(default=True, verbose_name='Активна')
+    last_seen_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя активность')
 
     def is_valid(self):
         """
@@ -204,9 +335,68 @@ class Session(models.Model):
         """
         return self.is_active and timezone.now() < self.expires_at
 
+    @staticmethod
+    def hash_token(token):
+        """
+        Вычисляет хеш токена, по которому сессия ищется в БД.
+
+        Args: token (str): JWT токен
+        Returns: str: SHA-256 хеш токена в hex (64 символа)
+        """
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
     def __str__(self):
         return f"Session for {self.user.email}"
 
     class Meta:
         verbose_name = 'Сессия'
-        verbose_name_plural = 'Сессии'
\ No newline at end of file
+        verbose_name_plural = 'Сессии'
+        constraints = [
+            # Уникальный индекс фиксированной ширины по хешу токена.
+            # После `session_partitions convert` (PostgreSQL) под этим именем в БД лежит
+            # ограничение UNIQUE (token_hash, expires_at): ключ секционирования обязан входить
+            # в уникальные индексы, поэтому token_hash уникален только в пределах секции.
+            # Состояние миграций об этом не знает: миграции, меняющие ограничения, индексы
+            # или поля Session, для секционированной таблицы нужно писать через RunSQL
+            # (SeparateDatabaseAndState), иначе их SQL не совпадет с реальной схемой.
+            models.UniqueConstraint(fields=['token_hash'], name='session_token_hash_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['is_active', 'expires_at'], name='session_active_expires_idx'),
+        ]
+
+
+class AuditEvent(models.Model):
+    """
+    Запись журнала аудита: входы, выходы, удаления аккаунтов и отказы в доступе.
+    Записи накапливаются в буфере процесса и вставляются пачками модулем audit.
+    """
+
+    EVENT_CHOICES = [
+        ('login', 'Вход'),
+        ('login_failed', 'Неудачный вход'),
+        ('logout', 'Выход'),
+        ('account_deleted', 'Удаление аккаунта'),
+        ('permission_denied', 'Отказ в доступе'),
+    ]
+
+    created_at = models.DateTimeField(verbose_name='Время события')
+    event = models.CharField(max_length=32, choices=EVENT_CHOICES, verbose_name='Событие')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False,
+                             related_name='audit_events', verbose_name='Пользователь')
+    ip = models.GenericIPAddressField(null=True, blank=True, verbose_name='IP адрес')
+    element = models.CharField(max_length=100, blank=True, verbose_name='Бизнес-элемент')
+    action = models.CharField(max_length=100, blank=True, verbose_name='Действие')
+    details = models.JSONField(default=dict, blank=True, verbose_name='Подробности')
+
+    class Meta:
+        indexes = [
+            # Чтение журнала по интервалу времени и по пользователю за интервал
+            models.Index(fields=['created_at', 'id'], name='audit_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='audit_user_created_idx'),
+        ]
+        verbose_name = 'Событие аудита'
+        verbose_name_plural = 'Журнал аудита'
+
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M:%S} {self.event} ({self.user_id})"
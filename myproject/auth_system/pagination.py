@@ -0,0 +1,129 @@
+"""
+Keyset (курсорная) пагинация списков.
+
+Страница выбирается условием по индексированному уникальному полю (по умолчанию id):
+
+    WHERE id > <последний id предыдущей страницы> ORDER BY id LIMIT <limit + 1>
+
+поэтому стоимость любой страницы одинакова, в отличие от OFFSET, при котором
+БД читает и отбрасывает все предыдущие строки. Позиция передается клиенту
+непрозрачным курсором next; лишняя строка в выборке показывает, что следующая страница есть.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+
+# Граница целочисленного ключа: значения вне BIGINT отвергаются до запроса в БД
+MAX_INT_KEY = 2 ** 63
+
+
+class PaginationError(ValueError):
+    """
+    Некорректные параметры пагинации (limit или cursor).
+    """
+
+
+def encode_cursor(value):
+    """
+    Args: value: Значение ключевого поля последнего объекта страницы
+    Returns: str: Непрозрачный курсор
+    """
+    raw = json.dumps([value], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, key_type=int):
+    """
+    Args:
+        cursor (str): Курсор, полученный из encode_cursor()
+        key_type (type): Ожидаемый тип значения ключа
+    Returns: Значение ключевого поля
+    Raises: PaginationError: Если курсор поврежден или значение ключа другого типа
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise PaginationError('Некорректный курсор')
+    # bool - подкласс int, но ключом быть не может
+    if not isinstance(value, key_type) or isinstance(value, bool):
+        raise PaginationError('Некорректный курсор')
+    if key_type is int and not -MAX_INT_KEY <= value < MAX_INT_KEY:
+        raise PaginationError('Некорректный курсор')
+    return value
+
+
+def get_page_params(request, key_type=int):
+    """
+    Читает параметры limit и cursor из строки запроса.
+
+    Args:
+        request: HTTP запрос
+        key_type (type): Тип ключа пагинации (int для id)
+    Returns: tuple: (limit, значение ключа после которого начинается страница или None)
+    Raises: PaginationError: Если параметры некорректны
+    """
+    default = getattr(settings, 'AUTH_PAGE_SIZE', 100)
+    maximum = getattr(settings, 'AUTH_MAX_PAGE_SIZE', 1000)
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise PaginationError('limit должен быть целым числом')
+    if limit < 1:
+        raise PaginationError('limit должен быть положительным')
+
+    cursor = request.GET.get('cursor')
+    after = decode_cursor(cursor, key_type) if cursor else None
+    return min(limit, maximum), after
+
+
+def _page_queryset(queryset, limit, after, key):
+    if after is not None:
+        try:
+            queryset = queryset.filter(**{f'{key}__gt': after})
+        except (ValueError, TypeError, ValidationError):
+            # Значение курсора не приводится к типу поля
+            raise PaginationError('Некорректный курсор')
+    return queryset.order_by(key)[:limit + 1]
+
+
+def _page(rows, limit, key):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[key] if isinstance(last, dict) else getattr(last, key))
+
+
+def paginate(queryset, limit, after=None, key='id'):
+    """
+    Выбирает одну страницу queryset по ключу key.
+
+    Args:
+        queryset (QuerySet): Исходный queryset (объекты или values())
+        limit (int): Размер страницы
+        after: Значение ключа из курсора (None - первая страница)
+        key (str): Уникальное индексированное поле сортировки
+    Returns: tuple: (список объектов страницы, курсор следующей страницы или None)
+    Raises: PaginationError: Если значение курсора не подходит к типу ключа
+    """
+    return _page(list(_page_queryset(queryset, limit, after, key)), limit, key)
+
+
+async def apaginate(queryset, limit, after=None, key='id'):
+    """
+    Асинхронная версия paginate().
+    """
+    rows = [row async for row in _page_queryset(queryset, limit, after, key)]
+    return _page(rows, limit, key)
+
+
+def page_data(results, next_cursor):
+    """
+    Returns: dict: Тело ответа со страницей: {'results': [...], 'next': курсор или None}
+    """
+    return {'results': results, 'next': next_cursor}
@@ -0,0 +1,194 @@
+"""
+Версия политики доступа и снимок прав пользователя в JWT.
+
+При AUTH_JWT_PERMISSION_CLAIMS = True токен, выданный при входе, содержит:
+    pv   - глобальная версия политики (PolicyVersion) на момент выдачи;
+    upv  - версия ролей пользователя (User.permissions_version) на момент выдачи;
+    perm - битовая маска прав: бит INDEX * 7 + номер действия из utils.ACTIONS, где INDEX -
+           позиция бизнес-элемента в списке элементов, упорядоченном по id (0..N-1),
+           целое число в little-endian, base64url без '='. Размер claim зависит
+           от числа элементов, а не от их ID; список меняется только вместе с версией.
+
+Middleware в stateless-режиме проверяет права по токену без обращения к БД, пока pv
+совпадает с текущей версией политики, а upv - с версией ролей загруженного пользователя.
+Изменение ролей, правил, элементов или наследования увеличивает pv, и устаревают снимки
+во всех выданных токенах; назначение или снятие роли увеличивает только upv пользователя,
+и устаревают лишь его снимки. После этого права читаются из БД.
+"""
+import base64
+import binascii
+
+from django.conf import settings
+
+from .metrics import PERMISSION_CLAIMS
+from .models import BusinessElement
+from .policy_version import aget_policy_version, get_policy_version
+from .utils import ACTIONS, abuild_permission_table, build_permission_table
+
+ACTION_COUNT = len(ACTIONS)
+ACTION_MASK = (1 << ACTION_COUNT) - 1
+
+# Бизнес-элементы текущей версии: (версия, {название: позиция}, {позиция: название})
+_elements_cache = None
+
+
+def _elements_queryset():
+    # Позиция элемента в этом порядке - его номер в маске perm
+    return BusinessElement.objects.order_by('id').values_list('name', flat=True)
+
+
+def _elements(version, names):
+    global _elements_cache
+    _elements_cache = (version, {name: index for index, name in enumerate(names)}, dict(enumerate(names)))
+    return _elements_cache
+
+
+def _element_maps(version):
+    cached = _elements_cache
+    if cached is not None and cached[0] == version:
+        return cached
+    return _elements(version, list(_elements_queryset()))
+
+
+async def _aelement_maps(version):
+    cached = _elements_cache
+    if cached is not None and cached[0] == version:
+        return cached
+    return _elements(version, [name async for name in _elements_queryset()])
+
+
+def encode_permissions(table, element_indexes):
+    """
+    Упаковывает таблицу прав в битовую маску.
+
+    Args:
+        table (dict): Название бизнес-элемента -> маска действий
+        element_indexes (dict): Название бизнес-элемента -> позиция в списке элементов
+    Returns: str: Маска в base64url
+    """
+    bits = 0
+    for name, mask in table.items():
+        if mask and name in element_indexes:
+            bits |= mask << (element_indexes[name] * ACTION_COUNT)
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_permissions(claim, element_names):
+    """
+    Распаковывает битовую маску прав из токена.
+
+    Args:
+        claim (str): Значение claim perm
+        element_names (dict): Позиция бизнес-элемента в списке элементов -> название
+    Returns: dict: Название бизнес-элемента -> маска действий
+    Raises: ValueError: Если claim поврежден
+    """
+    try:
+        raw = base64.urlsafe_b64decode(claim + '=' * (-len(claim) % 4))
+    except (binascii.Error, TypeError):
+        raise ValueError('Некорректный claim perm')
+    bits = int.from_bytes(raw, 'little')
+    table = {}
+    for index, name in element_names.items():
+        mask = (bits >> (index * ACTION_COUNT)) & ACTION_MASK
+        if mask:
+            table[name] = mask
+    return table
+
+
+def _claims_enabled():
+    return getattr(settings, 'AUTH_JWT_PERMISSION_CLAIMS', False)
+
+
+def permission_claims(user):
+    """
+    Формирует claims со снимком прав для нового токена.
+    Версия читается до прав и в обход кешей: если права изменятся между этими
+    запросами, снимок получит старую версию и будет сразу считаться устаревшим.
+
+    Args: user (User): Пользователь, только что загруженный из БД
+    Returns: dict: {'pv': версия, 'upv': версия ролей, 'perm': маска} или пустой словарь,
+        если снимки выключены
+    """
+    if not _claims_enabled():
+        return {}
+    version = get_policy_version(fresh=True)
+    element_indexes = _element_maps(version)[1]
+    return {
+        'pv': version,
+        'upv': user.permissions_version,
+        'perm': encode_permissions(build_permission_table(user.pk), element_indexes),
+    }
+
+
+async def apermission_claims(user):
+    """
+    Асинхронная версия permission_claims().
+    """
+    if not _claims_enabled():
+        return {}
+    version = await aget_policy_version(fresh=True)
+    element_indexes = (await _aelement_maps(version))[1]
+    return {
+        'pv': version,
+        'upv': user.permissions_version,
+        'perm': encode_permissions(await abuild_permission_table(user.pk), element_indexes),
+    }
+
+
+def _claim(payload):
+    if not _claims_enabled():
+        return None
+    if 'perm' not in payload or not isinstance(payload.get('pv'), int) or not isinstance(payload.get('upv'), int):
+        PERMISSION_CLAIMS.inc(result='absent')
+        return None
+    return payload['perm']
+
+
+def _is_stale(payload, version, user):
+    if payload['pv'] != version or payload['upv'] != user.permissions_version:
+        PERMISSION_CLAIMS.inc(result='stale')
+        return True
+    return False
+
+
+def _decode(claim, element_names):
+    try:
+        table = decode_permissions(claim, element_names)
+    except ValueError:
+        PERMISSION_CLAIMS.inc(result='invalid')
+        return None
+    PERMISSION_CLAIMS.inc(result='used')
+    return table
+
+
+def table_from_claims(payload, user):
+    """
+    Возвращает таблицу прав из проверенного токена, если снимок актуален.
+
+    Args:
+        payload (dict): Проверенная полезная нагрузка JWT
+        user (User): Пользователь токена
+    Returns: dict: Таблица прав или None, если снимка нет или он устарел
+    """
+    claim = _claim(payload)
+    if claim is None:
+        return None
+    version = get_policy_version()
+    if _is_stale(payload, version, user):
+        return None
+    return _decode(claim, _element_maps(version)[2])
+
+
+async def atable_from_claims(payload, user):
+    """
+    Асинхронная версия table_from_claims().
+    """
+    claim = _claim(payload)
+    if claim is None:
+        return None
+    version = await aget_policy_version()
+    if _is_stale(payload, version, user):
+        return None
+    return _decode(claim, (await _aelement_maps(version))[2])
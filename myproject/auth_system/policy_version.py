@@ -0,0 +1,91 @@
+"""
+Глобальная версия политики доступа - счетчик поколений прав, общий для всех процессов.
+
+Версия хранится в единственной строке PolicyVersion и увеличивается при любом
+изменении ролей, правил, бизнес-элементов или наследования.
+Каждый воркер перечитывает ее не чаще раза в AUTH_POLICY_VERSION_TTL секунд
+и сравнивает с версией своих кешей: если она изменилась, кеши считаются устаревшими.
+Проверка стоит одного сравнения на запрос и одного запроса по первичному ключу
+на процесс за TTL, без рассылки сообщений о конкретных ключах.
+
+Назначение ролей затрагивает одного пользователя и увеличивает только его
+User.permissions_version: кеши и снимки прав остальных пользователей сохраняются.
+"""
+import time
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import PolicyVersion, User
+
+# Закешированная версия политики: (версия, время чтения по time.monotonic())
+_version_cache = None
+
+
+def _version_ttl():
+    return getattr(settings, 'AUTH_POLICY_VERSION_TTL', 1.0)
+
+
+def _cached_version():
+    cached = _version_cache
+    if cached is not None and time.monotonic() - cached[1] < _version_ttl():
+        return cached[0]
+    return None
+
+
+def _remember_version(version):
+    global _version_cache
+    _version_cache = (version, time.monotonic())
+    return version
+
+
+def get_policy_version(fresh=False):
+    """
+    Возвращает текущую версию политики. Значение кешируется в процессе
+    на AUTH_POLICY_VERSION_TTL секунд: это максимальная задержка, с которой
+    воркер замечает изменение прав, сделанное в другом процессе.
+
+    Args: fresh (bool): Прочитать версию из БД в обход кеша
+    Returns: int: Версия политики
+    """
+    version = None if fresh else _cached_version()
+    if version is None:
+        version = _remember_version(
+            PolicyVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+        )
+    return version
+
+
+async def aget_policy_version(fresh=False):
+    """
+    Асинхронная версия get_policy_version().
+    """
+    version = None if fresh else _cached_version()
+    if version is None:
+        version = _remember_version(
+            await PolicyVersion.objects.filter(pk=1).values_list('version', flat=True).afirst() or 0
+        )
+    return version
+
+
+def bump_policy_version():
+    """
+    Увеличивает версию политики. Вызывается сигналами при изменении прав
+    и командами, изменяющими права в обход сигналов (bulk_create).
+    """
+    global _version_cache
+    if not PolicyVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        PolicyVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+    # Этот процесс видит новую версию сразу, остальные - по истечении TTL
+    _version_cache = None
+
+
+def bump_user_permissions_version(user_id):
+    """
+    Увеличивает версию ролей пользователя. Вызывается сигналами при изменении UserRole:
+    кеши и снимки прав остальных пользователей остаются действительными.
+    Воркеры замечают новую версию при следующей загрузке пользователя из БД.
+
+    Args: user_id (int): ID пользователя
+    """
+    User.objects.filter(pk=user_id).update(permissions_version=F('permissions_version') + 1)
@@ -0,0 +1,227 @@
+"""
+Ограничение частоты запросов к login и register по IP и email.
+Используется алгоритм скользящего окна со счетчиками: оценка числа запросов
+за последние window секунд = счетчик предыдущего окна * доля его перекрытия + счетчик текущего окна.
+"""
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+DEFAULT_RULES = {
+    'login': [('ip', 20, 60), ('email', 5, 60)],
+    'register': [('ip', 10, 3600)],
+}
+
+
+def _sliding_window(previous, current, elapsed, limit, window):
+    # Возвращает через сколько секунд оценка опустится ниже лимита, или 0 если запрос разрешен
+    weight = 1 - elapsed / window
+    if previous * weight + current < limit:
+        return 0
+    if current >= limit:
+        # Текущее окно заполнено целиком, ждем его окончания
+        return math.ceil(window - elapsed)
+    # Ждем, пока доля предыдущего окна уменьшится достаточно
+    needed_weight = (limit - current) / previous
+    return max(1, math.ceil((weight - needed_weight) * window))
+
+
+class BaseBackend:
+    """Базовый класс хранилища счетчиков."""
+
+    def hit(self, key, limit, window):
+        """
+        Учитывает запрос, если лимит не превышен.
+
+        Args:
+            key (str): Ключ ограничения (например, 'login:ip:127.0.0.1')
+            limit (int): Максимум запросов за окно
+            window (int): Длина окна в секундах
+        Returns: int: 0 если запрос разрешен, иначе через сколько секунд повторить
+        """
+        raise NotImplementedError
+
+    async def ahit(self, key, limit, window):
+        """Асинхронная версия hit(). По умолчанию выполняется в потоке."""
+        return await sync_to_async(self.hit)(key, limit, window)
+
+
+class LocalMemoryBackend(BaseBackend):
+    """
+    Счетчики в памяти процесса. Не требует внешних сервисов,
+    но каждый воркер считает запросы независимо.
+    """
+
+    # Очистка устаревших ключей выполняется не чаще, чем раз в столько запросов
+    prune_every = 1024
+
+    def __init__(self):
+        # key -> [номер окна, счетчик предыдущего окна, счетчик текущего окна, длина окна]
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        with self._lock:
+            self._hits += 1
+            if self._hits >= self.prune_every:
+                self._prune(now)
+
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < index - 1:
+                counter = [index, 0, 0, window]
+            elif counter[0] == index - 1:
+                counter = [index, counter[2], 0, window]
+            self._counters[key] = counter
+
+            retry_after = _sliding_window(counter[1], counter[2], now - index * window, limit, window)
+            if not retry_after:
+                counter[2] += 1
+            return retry_after
+
+    async def ahit(self, key, limit, window):
+        # Операция только в памяти, поток не нужен
+        return self.hit(key, limit, window)
+
+    def _prune(self, now):
+        self._hits = 0
+        stale = [key for key, counter in self._counters.items() if counter[0] < now // counter[3] - 1]
+        for key in stale:
+            del self._counters[key]
+
+
+class CacheBackend(BaseBackend):
+    """
+    Счетчики в кеше Django (AUTH_RATELIMIT_CACHE). С FileBasedCache или DatabaseCache
+    лимиты общие для всех воркеров на хосте, с Memcached/Redis - для всего кластера.
+    """
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'AUTH_RATELIMIT_CACHE', 'default')]
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        current_key = f'ratelimit:{key}:{index}'
+        previous_key = f'ratelimit:{key}:{index - 1}'
+        timeout = window * 2  # Окно хранится вдвое дольше своей длины, чтобы участвовать в оценке следующего
+
+        # Сначала атомарно учитываем запрос, затем проверяем лимит по полученному значению:
+        # при чтении и записи по отдельности конкурентные воркеры видят одно и то же значение
+        # счетчика и пропускают всплеск запросов сверх лимита
+        self.cache.add(current_key, 0, timeout=timeout)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Ключ истек между add и incr
+            self.cache.set(current_key, 1, timeout=timeout)
+            current = 1
+
+        retry_after = _sliding_window(
+            self.cache.get(previous_key, 0), current - 1, now - index * window, limit, window
+        )
+        if retry_after:
+            # Отклоненный запрос не учитывается, как и в LocalMemoryBackend
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                pass
+        return retry_after
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Возвращает хранилище счетчиков, заданное в AUTH_RATELIMIT_BACKEND.
+
+    Returns: BaseBackend: Экземпляр хранилища
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'AUTH_RATELIMIT_BACKEND', 'auth_system.ratelimit.LocalMemoryBackend')
+                _backend = import_string(path)()
+    return _backend
+
+
+def get_client_ip(request):
+    """
+    Определяет IP клиента. За прокси заголовок с IP задается в AUTH_RATELIMIT_IP_HEADER.
+    Каждый прокси дописывает адрес своего клиента в конец X-Forwarded-For, а левые записи
+    присылает сам клиент. Поэтому берется запись, добавленная ближайшим к клиенту доверенным
+    прокси: AUTH_RATELIMIT_TRUSTED_PROXIES-я справа.
+
+    Args: request: HTTP запрос
+    Returns: str: IP адрес клиента
+    """
+    header = getattr(settings, 'AUTH_RATELIMIT_IP_HEADER', None)
+    if header and request.META.get(header):
+        addresses = [address.strip() for address in request.META[header].split(',') if address.strip()]
+        if addresses:
+            hops = max(1, getattr(settings, 'AUTH_RATELIMIT_TRUSTED_PROXIES', 1))
+            return addresses[-min(hops, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _rate_limit_keys(scope, request, email):
+    rules = getattr(settings, 'AUTH_RATELIMIT_RULES', DEFAULT_RULES).get(scope, [])
+    for kind, limit, window in rules:
+        if kind == 'ip':
+            value = get_client_ip(request)
+        elif kind == 'email':
+            value = str(email).strip().lower() if email else ''
+        else:
+            continue
+        if value:
+            yield f'{scope}:{kind}:{value}', limit, window
+
+
+def check_rate_limit(scope, request, email=None):
+    """
+    Проверяет и учитывает запрос по всем правилам области.
+
+    Args:
+        scope (str): Область ограничения ('login', 'register')
+        request: HTTP запрос
+        email (str): Email из тела запроса, если есть
+    Returns: int: Через сколько секунд можно повторить запрос или None, если запрос разрешен
+    """
+    if not getattr(settings, 'AUTH_RATELIMIT_ENABLED', True):
+        return None
+    backend = get_backend()
+    for key, limit, window in _rate_limit_keys(scope, request, email):
+        retry_after = backend.hit(key, limit, window)
+        if retry_after:
+            return retry_after
+    return None
+
+
+async def acheck_rate_limit(scope, request, email=None):
+    """
+    Асинхронная версия check_rate_limit().
+
+    Args:
+        scope (str): Область ограничения ('login', 'register')
+        request: HTTP запрос
+        email (str): Email из тела запроса, если есть
+    Returns: int: Через сколько секунд можно повторить запрос или None, если запрос разрешен
+    """
+    if not getattr(settings, 'AUTH_RATELIMIT_ENABLED', True):
+        return None
+    backend = get_backend()
+    for key, limit, window in _rate_limit_keys(scope, request, email):
+        retry_after = await backend.ahit(key, limit, window)
+        if retry_after:
+            return retry_after
+    return None
@@ -0,0 +1,43 @@
+"""
+JSON renderer на orjson.
+
+orjson сериализует dict/list/str/datetime в несколько раз быстрее стандартного json.
+Типы, которых он не знает (Decimal, ленивые строки, QuerySet и т.д.), передаются
+в JSONEncoder DRF, поэтому вывод совпадает с JSONRenderer: компактный UTF-8,
+datetime в UTC с суффиксом Z. Если orjson не установлен или клиент запросил
+отступы (Accept: application/json; indent=4), используется стандартный JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """
+    Сериализует данные в JSON так же, как JSONRenderer DRF.
+
+    Args: data: Данные ответа
+    Returns: bytes: JSON в UTF-8
+    """
+    if orjson is None:
+        return JSONRenderer().render(data)
+    return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renderer DRF для application/json на orjson.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import User, Role, BusinessElement, AccessRule, UserRole
+from .representation import FastRepresentation
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -86,4 +87,9 @@ class UserRoleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserRole
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+# Быстрое отображение для ответов со списками и профилем (см. representation.py)
+user_data = FastRepresentation(UserSerializer)
+role_data = FastRepresentation(RoleSerializer)
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .hierarchy import add_roles, refresh_closure, validate_inheritance
+from .models import AccessRule, BusinessElement, Role, RoleInheritance, User, UserRole
+from .policy_version import bump_policy_version, bump_user_permissions_version
+from .tokens import invalidate_cached_user
+from .utils import invalidate_permissions
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+def invalidate_user_permissions(sender, instance, **kwargs):
+    """
+    Сбрасывает кеш прав пользователя при изменении его ролей. Глобальная версия политики
+    не меняется: остальные процессы замечают изменение по версии ролей пользователя.
+    """
+    bump_user_permissions_version(instance.user_id)
+    invalidate_permissions(instance.user_id)
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=AccessRule)
+@receiver([post_save, post_delete], sender=Role)
+@receiver([post_save, post_delete], sender=BusinessElement)
+def invalidate_all_permissions(sender, instance, **kwargs):
+    """Сбрасывает кеш прав всех пользователей при изменении ролей, элементов или правил."""
+    invalidate_permissions()
+    bump_policy_version()
+
+
+@receiver(post_save, sender=Role)
+def add_role_to_closure(sender, instance, created, **kwargs):
+    """Добавляет новую роль в замыкание иерархии."""
+    if created:
+        add_roles([instance.pk])
+
+
+@receiver(pre_save, sender=RoleInheritance)
+def check_role_inheritance(sender, instance, raw=False, **kwargs):
+    """Запрещает циклы в иерархии и запоминает прежнюю дочернюю роль при изменении связи."""
+    if not raw:
+        validate_inheritance(instance.parent_id, instance.child_id, exclude_id=instance.pk)
+    instance._previous_child_id = None
+    if instance.pk:
+        instance._previous_child_id = (
+            RoleInheritance.objects.filter(pk=instance.pk).values_list('child_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=RoleInheritance)
+def update_role_closure(sender, instance, **kwargs):
+    """
+    Пересчитывает замыкание для дочерней роли и ее потомков и сбрасывает кеш прав.
+    Выполняется после фиксации транзакции: при каскадном удалении роли
+    к этому моменту удалены и роль, и все ее связи.
+    """
+    role_ids = {instance.child_id, getattr(instance, '_previous_child_id', None)} - {None}
+
+    def refresh():
+        refresh_closure(role_ids)
+        invalidate_permissions()
+        bump_policy_version()
+
+    transaction.on_commit(refresh)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Удаляет пользователя из кеша stateless-аутентификации при его изменении."""
+    invalidate_cached_user(instance.pk)
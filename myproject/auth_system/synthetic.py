@@ -0,0 +1,114 @@
+"""
+Генератор синтетических данных для проверки масштабирования:
+роли, бизнес-элементы, правила доступа, пользователи, их роли и сессии.
+Данные детерминированы seed и вставляются пачками bulk_create.
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .hashers import get_rounds, hash_passwords
+from .hierarchy import add_roles
+from .models import AccessRule, BusinessElement, Role, Session, User, UserRole
+from .policy_version import bump_policy_version
+from .utils import PERMISSION_FIELDS, invalidate_permissions
+
+EMAIL_TEMPLATE = 'user{:07d}@synthetic.example.com'
+
+
+def _batches(total, size):
+    for start in range(0, total, size):
+        yield range(start, min(start + size, total))
+
+
+def _create_named(model, prefix, count, batch_size):
+    # Создает объекты с именами prefix_00000.. и возвращает их ID в порядке номеров
+    names = [f'{prefix}_{index:05d}' for index in range(count)]
+    model.objects.bulk_create(
+        [model(name=name, description=f'Синтетический объект {name}') for name in names],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    ids = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+    return [ids[name] for name in names]
+
+
+def create_synthetic_data(users=1000, roles=10, elements=20, roles_per_user=2, sessions_per_user=1,
+                          rules_per_role=None, seed=0, batch_size=5000, password='password', log=print):
+    """
+    Создает синтетический набор данных заданного размера.
+    Повторный запуск с теми же параметрами не создает дубликатов пользователей, ролей и элементов.
+
+    Args:
+        users (int): Количество пользователей
+        roles (int): Количество ролей
+        elements (int): Количество синтетических бизнес-элементов
+        roles_per_user (int): Количество ролей у каждого пользователя
+        sessions_per_user (int): Количество сессий у каждого пользователя
+        rules_per_role (int): Количество правил доступа у роли (по умолчанию min(20, число элементов))
+        seed (int): Seed генератора случайных чисел
+        batch_size (int): Размер пачки bulk_create
+        password (str): Общий пароль всех пользователей (хешируется один раз)
+        log (callable): Функция вывода прогресса
+    """
+    rng = random.Random(seed)
+    started = time.monotonic()
+
+    role_ids = _create_named(Role, 'role', roles, batch_size)
+    # bulk_create не вызывает сигналы, поэтому роли добавляются в замыкание иерархии явно
+    add_roles(role_ids)
+    element_ids = _create_named(BusinessElement, 'element', elements, batch_size)
+    # Правила назначаются и на стандартные элементы (products, orders, ...), которые проверяют view
+    all_element_ids = list(BusinessElement.objects.values_list('id', flat=True).order_by('id'))
+    rules_per_role = min(rules_per_role if rules_per_role is not None else 20, len(all_element_ids))
+    roles_per_user = min(roles_per_user, len(role_ids))
+
+    rules = [
+        AccessRule(role_id=role_id, element_id=element_id,
+                   **{field: rng.random() < 0.5 for field in PERMISSION_FIELDS})
+        for role_id in role_ids
+        for element_id in rng.sample(all_element_ids, rules_per_role)
+    ]
+    AccessRule.objects.bulk_create(rules, batch_size=batch_size, ignore_conflicts=True)
+    log(f'Роли: {len(role_ids)}, элементы: {len(element_ids)}, правила: {len(rules)}')
+
+    # Один хеш на всех пользователей: bcrypt не должен быть узким местом генерации
+    password_hash = hash_passwords([password], get_rounds())[0]
+    now = timezone.now()
+    created = 0
+    for batch in _batches(users, batch_size):
+        emails = [EMAIL_TEMPLATE.format(index) for index in batch]
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(email=email, first_name=f'Имя{index}', last_name=f'Фамилия{index}', password=password_hash)
+                 for index, email in zip(batch, emails)],
+                ignore_conflicts=True,
+            )
+            user_ids = list(User.objects.filter(email__in=emails).values_list('id', flat=True).order_by('id'))
+            UserRole.objects.bulk_create(
+                [UserRole(user_id=user_id, role_id=role_id)
+                 for user_id in user_ids
+                 for role_id in rng.sample(role_ids, roles_per_user)],
+                ignore_conflicts=True,
+            )
+            Session.objects.bulk_create(
+                [Session(user_id=user_id,
+                         token_hash=f'{rng.getrandbits(256):064x}',
+                         # Часть сессий уже истекла, часть деактивирована
+                         expires_at=now + timedelta(seconds=rng.randint(-2 * 86400, 86400)),
+                         is_active=rng.random() < 0.8)
+                 for user_id in user_ids
+                 for _ in range(sessions_per_user)],
+                ignore_conflicts=True,
+            )
+        created += len(batch)
+        elapsed = time.monotonic() - started
+        log(f'Пользователи: {created}/{users} ({created / elapsed:.0f}/с)')
+
+    # bulk_create не вызывает сигналы, поэтому кеш прав сбрасывается явно
+    invalidate_permissions()
+    bump_policy_version()
+    log(f'Готово за {time.monotonic() - started:.1f} с')
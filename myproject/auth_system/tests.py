@@ -1,3 +1,939 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F, QuerySet
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+
+from . import async_views, audit, hashers, metrics, policy, policy_version, ratelimit, serializers, tokens, utils
+from .models import (
+    AccessRule, BusinessElement, PolicyVersion, Role, RoleClosure, RoleInheritance, Session, User, UserRole,
+)
+from .pagination import PaginationError, decode_cursor, encode_cursor, paginate
+from .writebehind import SessionWriteBuffer
+
+
+def create_user(email='user@example.com', password='password123', **fields):
+    return User.objects.create_user(email=email, password=password, first_name='Иван', last_name='Петров', **fields)
+
+
+def grant(role, element_name, *actions):
+    element, _ = BusinessElement.objects.get_or_create(name=element_name)
+    return AccessRule.objects.create(role=role, element=element, **{f'{action}_permission': True for action in actions})
+
+
+def reset_permission_caches():
+    # Кеши уровня процесса переживают откат транзакции теста
+    utils.invalidate_permissions()
+    utils._cached_policy_version = None
+    policy_version._version_cache = None
+    policy._elements_cache = None
+
+
+def saturate_password_hasher(test):
+    # Все слоты пула bcrypt заняты: следующая задача отклоняется
+    hashers._get_executor()
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    patcher = mock.patch.object(hashers, '_slots', slots)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+def login(client, email='user@example.com', password='password123'):
+    response = client.post('/api/login/', {'email': email, 'password': password}, content_type='application/json')
+    return {'HTTP_AUTHORIZATION': f"Bearer {response.json()['token']}"}
+
+
+@override_settings(AUTH_POLICY_VERSION_TTL=60, AUTH_AUDIT_ENABLED=False)
+class PermissionCacheTests(TestCase):
+    """Кеш таблиц прав и его сброс."""
+
+    def setUp(self):
+        reset_permission_caches()
+        self.addCleanup(reset_permission_caches)
+        self.user = create_user()
+        self.role = Role.objects.create(name='manager')
+        self.rule = grant(self.role, 'products', 'read')
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def test_permissions_follow_rules(self):
+        self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+        self.assertFalse(utils.check_permission(self.user, 'products', 'delete'))
+        self.assertFalse(utils.check_permission(self.user, 'orders', 'read'))
+
+    def test_cached_table_used_without_queries(self):
+        utils.check_permission(self.user, 'products', 'read')
+        with self.assertNumQueries(0):
+            self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+
+    def test_rule_change_invalidates_cache(self):
+        self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+
+        self.rule.read_permission = False
+        self.rule.delete_permission = True
+        self.rule.save()
+
+        self.assertFalse(utils.check_permission(self.user, 'products', 'read'))
+        self.assertTrue(utils.check_permission(self.user, 'products', 'delete'))
+
+    def test_role_removal_invalidates_cache(self):
+        self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+        UserRole.objects.filter(user=self.user).delete()
+        self.assertFalse(utils.check_permission(self.user, 'products', 'read'))
+
+    def test_inherited_rules_applied(self):
+        parent = Role.objects.create(name='supervisor')
+        grant(parent, 'orders', 'read_all')
+        self.assertFalse(utils.check_permission(self.user, 'orders', 'read_all'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RoleInheritance.objects.create(parent=parent, child=self.role)
+
+        self.assertTrue(utils.check_permission(self.user, 'orders', 'read_all'))
+
+    def test_role_change_from_other_process_seen_with_user_version(self):
+        guest = Role.objects.create(name='guest')
+        self.user.refresh_from_db()
+        self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+
+        # Другой процесс меняет роль: сигналы этого процесса не срабатывают
+        UserRole.objects.filter(user=self.user).update(role=guest)
+        User.objects.filter(pk=self.user.pk).update(permissions_version=F('permissions_version') + 1)
+        self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+
+        # Следующий запрос загружает пользователя с новой версией ролей
+        self.user.refresh_from_db()
+        self.assertFalse(utils.check_permission(self.user, 'products', 'read'))
+
+    def test_full_save_keeps_permissions_version(self):
+        stale = User.objects.get(pk=self.user.pk)
+        UserRole.objects.filter(user=self.user).delete()
+
+        stale.first_name = 'Петр'
+        stale.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Петр')
+        self.assertEqual(self.user.permissions_version, stale.permissions_version + 1)
+
+    def test_change_from_other_process_seen_after_version_ttl(self):
+        self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+
+        # Другой процесс меняет правило: сигналы этого процесса не срабатывают
+        AccessRule.objects.filter(pk=self.rule.pk).update(read_permission=False)
+        PolicyVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertTrue(utils.check_permission(self.user, 'products', 'read'))
+
+        # Истек AUTH_POLICY_VERSION_TTL: новая версия сбрасывает кеш процесса
+        policy_version._version_cache = None
+        self.assertFalse(utils.check_permission(self.user, 'products', 'read'))
+
+
+@override_settings(AUTH_JWT_PERMISSION_CLAIMS=True, AUTH_POLICY_VERSION_TTL=60, AUTH_AUDIT_ENABLED=False)
+class PermissionClaimsTests(TestCase):
+    """Снимок прав в JWT."""
+
+    def setUp(self):
+        reset_permission_caches()
+        self.addCleanup(reset_permission_caches)
+        self.user = create_user()
+        self.role = Role.objects.create(name='manager')
+        self.rule = grant(self.role, 'products', 'read', 'update')
+        grant(self.role, 'orders', 'create')
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def payload(self):
+        # Как при входе: снимок строится для пользователя, только что загруженного из БД
+        self.user.refresh_from_db()
+        return tokens.decode_token(self.user.generate_token(policy.permission_claims(self.user)))
+
+    def test_encode_decode_round_trip(self):
+        table = {'products': 0b1011, 'orders': 0b1}
+        claim = policy.encode_permissions(table, {'products': 0, 'orders': 1})
+        self.assertEqual(policy.decode_permissions(claim, {0: 'products', 1: 'orders'}), table)
+
+    def test_claim_size_independent_of_element_ids(self):
+        BusinessElement.objects.create(id=10 ** 6, name='reports')
+        grant(self.role, 'reports', 'read_all')
+        payload = self.payload()
+
+        # 3 элемента * 7 бит - не больше 3 байт, 4 символов base64url
+        self.assertLessEqual(len(payload['perm']), 4)
+        self.assertEqual(policy.table_from_claims(payload, self.user), utils.build_permission_table(self.user.pk))
+
+    def test_current_claims_used_without_queries(self):
+        payload = self.payload()
+        with self.assertNumQueries(0):
+            table = policy.table_from_claims(payload, self.user)
+        self.assertEqual(table, utils.build_permission_table(self.user.pk))
+
+    def test_claims_stale_after_policy_change(self):
+        payload = self.payload()
+        self.rule.delete_permission = True
+        self.rule.save()
+        self.assertIsNone(policy.table_from_claims(payload, self.user))
+
+    def test_claims_stale_after_own_role_change(self):
+        payload = self.payload()
+        UserRole.objects.filter(user=self.user).delete()
+        self.user.refresh_from_db()
+        self.assertIsNone(policy.table_from_claims(payload, self.user))
+
+    def test_other_user_role_change_keeps_claims(self):
+        payload = self.payload()
+        version = policy_version.get_policy_version(fresh=True)
+
+        UserRole.objects.create(user=create_user(email='other@example.com'), role=self.role)
+
+        self.assertEqual(policy_version.get_policy_version(fresh=True), version)
+        self.assertEqual(policy.table_from_claims(payload, self.user), utils.build_permission_table(self.user.pk))
+
+    def test_invalid_or_absent_claims_ignored(self):
+        payload = self.payload()
+        self.assertIsNone(policy.table_from_claims({**payload, 'perm': 'A'}, self.user))
+        self.assertIsNone(policy.table_from_claims({'user_id': self.user.pk}, self.user))
+
+
+@override_settings(AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class ConditionalGetTests(TestCase):
+    """ETag и ответ 304 для профиля и списка ролей."""
+
+    def setUp(self):
+        reset_permission_caches()
+        self.addCleanup(reset_permission_caches)
+        self.user = create_user()
+        admin = Role.objects.create(name='admin')
+        grant(admin, 'access_rules', 'read', 'create')
+        UserRole.objects.create(user=self.user, role=admin)
+        self.auth = login(self.client)
+
+    def assert_not_modified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_profile_not_modified_until_updated(self):
+        etag = self.client.get('/api/profile/', **self.auth)['ETag']
+        self.assert_not_modified('/api/profile/', etag)
+
+        response = self.client.put('/api/profile/', {'first_name': 'Петр'}, content_type='application/json',
+                                   **self.auth)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['first_name'], 'Петр')
+
+    def test_roles_etag_changes_with_policy(self):
+        etag = self.client.get('/api/admin/roles/', **self.auth)['ETag']
+        self.assert_not_modified('/api/admin/roles/', etag)
+
+        response = self.client.post('/api/admin/roles/', {'name': 'auditor'}, content_type='application/json',
+                                    **self.auth)
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get('/api/admin/roles/', HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('auditor', [role['name'] for role in response.json()['results']])
+
+
+@override_settings(AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class SessionTokenHashTests(TransactionTestCase):
+    """Поиск сессии по хешу токена и заполнение хешей миграцией 0002."""
+
+    def test_session_found_by_token_hash(self):
+        create_user()
+        token = self.client.post('/api/login/', {'email': 'user@example.com', 'password': 'password123'},
+                                 content_type='application/json').json()['token']
+
+        session = Session.objects.get(token_hash=Session.hash_token(token))
+        self.assertTrue(session.is_active)
+        response = self.client.get('/api/profile/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_backfill_matches_hash_token(self):
+        before, after = [('auth_system', '0001_initial')], [('auth_system', '0002_session_token_hash')]
+        executor = MigrationExecutor(connection)
+        self.addCleanup(self.migrate_to_latest)
+        executor.migrate(before)
+
+        old_apps = executor.loader.project_state(before).apps
+        user = old_apps.get_model('auth_system', 'User').objects.create(
+            email='old@example.com', password='-', first_name='Иван', last_name='Петров'
+        )
+        token = User(pk=user.pk, email=user.email).generate_token()
+        old_apps.get_model('auth_system', 'Session').objects.create(
+            user_id=user.pk, token=token, expires_at=timezone.now() + timedelta(hours=1)
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(after)
+        new_apps = executor.loader.project_state(after).apps
+        session = new_apps.get_model('auth_system', 'Session').objects.get(user_id=user.pk)
+        self.assertEqual(session.token_hash, Session.hash_token(token))
+
+    @staticmethod
+    def migrate_to_latest():
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class SessionWriteBufferTests(TestCase):
+    """Отложенная запись деактивации сессий."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.session = Session.objects.create(
+            user=self.user, token_hash='a' * 64, expires_at=timezone.now() + timedelta(days=1)
+        )
+        # Фоновый поток не запускается: сброс вызывается в тесте явно
+        self.buffer = SessionWriteBuffer(interval=3600, max_pending=10 ** 6)
+        self.buffer._ensure_thread = lambda: None
+
+    def test_flush_deactivates_session(self):
+        self.buffer.deactivate(self.session.token_hash)
+        self.assertTrue(self.buffer.is_deactivated(self.session.token_hash, self.user.id))
+
+        self.buffer.flush()
+
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.is_active)
+        self.assertFalse(self.buffer.is_deactivated(self.session.token_hash, self.user.id))
+
+    def test_failed_flush_retries_deactivation(self):
+        self.buffer.deactivate(self.session.token_hash)
+        self.buffer.deactivate_user(self.user.id)
+
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError('БД недоступна')):
+            with self.assertRaises(DatabaseError):
+                self.buffer.flush()
+
+        # Деактивация не потеряна: сессия по-прежнему считается неактивной и будет записана
+        self.assertTrue(self.buffer.is_deactivated(self.session.token_hash, self.user.id))
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.is_active)
+
+        self.buffer.flush()
+
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.is_active)
+        self.assertEqual(self.buffer._pending(), 0)
+
+    def test_failed_flush_keeps_newer_touch(self):
+        older = timezone.now() - timedelta(minutes=5)
+        newer = timezone.now()
+        self.buffer.touch(self.session.token_hash, older)
+
+        def fail_and_touch(*args, **kwargs):
+            # Пока запись идет, запрос успевает отметить сессию еще раз
+            self.buffer.touch(self.session.token_hash, newer)
+            raise DatabaseError('БД недоступна')
+
+        with mock.patch.object(QuerySet, 'update', side_effect=fail_and_touch):
+            with self.assertRaises(DatabaseError):
+                self.buffer.flush()
+        self.buffer.flush()
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.last_seen_at, newer)
+
+
+class RoleHierarchyTests(TestCase):
+    """Иерархия ролей: замыкание и запрет циклов."""
+
+    def setUp(self):
+        self.a, self.b, self.c = (Role.objects.create(name=name) for name in ('a', 'b', 'c'))
+
+    def closure(self):
+        return set(RoleClosure.objects.exclude(depth=0).values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_closure_follows_links(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RoleInheritance.objects.create(parent=self.a, child=self.b)
+            RoleInheritance.objects.create(parent=self.b, child=self.c)
+
+        self.assertEqual(self.closure(), {
+            (self.a.id, self.b.id, 1), (self.b.id, self.c.id, 1), (self.a.id, self.c.id, 2),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RoleInheritance.objects.filter(parent=self.a, child=self.b).delete()
+        self.assertEqual(self.closure(), {(self.b.id, self.c.id, 1)})
+
+    def test_self_inheritance_rejected(self):
+        with self.assertRaises(ValidationError):
+            RoleInheritance.objects.create(parent=self.a, child=self.a)
+
+    def test_cycle_in_one_transaction_rejected(self):
+        # Замыкание обновляется только после фиксации, проверка должна видеть сами связи
+        with transaction.atomic():
+            RoleInheritance.objects.create(parent=self.a, child=self.b)
+            RoleInheritance.objects.create(parent=self.b, child=self.c)
+            with self.assertRaises(ValidationError):
+                RoleInheritance.objects.create(parent=self.c, child=self.a)
+            with self.assertRaises(ValidationError):
+                RoleInheritance.objects.create(parent=self.b, child=self.a)
+
+        self.assertEqual(
+            set(RoleInheritance.objects.values_list('parent_id', 'child_id')),
+            {(self.a.id, self.b.id), (self.b.id, self.c.id)},
+        )
+
+    def test_changing_link_ignores_its_old_edge(self):
+        link = RoleInheritance.objects.create(parent=self.a, child=self.b)
+        link.parent, link.child = self.b, self.a
+        link.save()
+        self.assertEqual(list(RoleInheritance.objects.values_list('parent_id', 'child_id')), [(self.b.id, self.a.id)])
+
+
+class PaginationTests(TestCase):
+    """Keyset-пагинация и разбор курсора."""
+
+    def test_pages_cover_queryset(self):
+        roles = [Role.objects.create(name=f'role-{i}') for i in range(5)]
+
+        page, cursor = paginate(Role.objects.all(), 2)
+        self.assertEqual([role.id for role in page], [roles[0].id, roles[1].id])
+        page, cursor = paginate(Role.objects.all(), 2, decode_cursor(cursor))
+        self.assertEqual([role.id for role in page], [roles[2].id, roles[3].id])
+        page, cursor = paginate(Role.objects.all(), 2, decode_cursor(cursor))
+        self.assertEqual([role.id for role in page], [roles[4].id])
+        self.assertIsNone(cursor)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(42)), 42)
+
+    def test_malformed_cursor_rejected(self):
+        for cursor in ('!!!', 'e30', encode_cursor('x'), encode_cursor(True), encode_cursor(None),
+                       encode_cursor(2 ** 70)):
+            with self.subTest(cursor=cursor), self.assertRaises(PaginationError):
+                decode_cursor(cursor)
+
+    def test_cursor_of_wrong_field_type_rejected(self):
+        with self.assertRaises(PaginationError):
+            paginate(Role.objects.all(), 2, after='x')
+
+
+@override_settings(AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class LoginTests(TestCase):
+    """Вход в систему."""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_login_returns_token(self):
+        response = self.client.post(
+            '/api/login/', {'email': 'user@example.com', 'password': 'password123'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.json())
+
+    def test_non_object_body_rejected(self):
+        response = self.client.post('/api/login/', [1, 2], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_busy_password_hasher_returns_503(self):
+        saturate_password_hasher(self)
+        response = self.client.post(
+            '/api/login/', {'email': 'user@example.com', 'password': 'password123'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_password_rehashed_with_new_cost(self):
+        with override_settings(AUTH_BCRYPT_ROUNDS=4):
+            user = create_user(email='old@example.com')
+        self.assertEqual(hashers.get_hash_rounds(user.password), 4)
+
+        with override_settings(AUTH_BCRYPT_ROUNDS=5):
+            response = self.client.post('/api/login/', {'email': 'old@example.com', 'password': 'password123'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(hashers.get_hash_rounds(user.password), 5)
+        self.assertTrue(user.check_password('password123'))
+
+    @override_settings(AUTH_RATELIMIT_ENABLED=True, AUTH_RATELIMIT_RULES={'login': [('email', 2, 60)]})
+    def test_attempts_limited_per_email(self):
+        def attempt(email):
+            return self.client.post('/api/login/', {'email': email, 'password': 'wrong'},
+                                    content_type='application/json')
+
+        with mock.patch.object(ratelimit, '_backend', ratelimit.LocalMemoryBackend()):
+            self.assertEqual([attempt('User@example.com ').status_code for _ in range(2)], [401, 401])
+            response = attempt('user@example.com')
+            self.assertEqual(response.status_code, 429)
+            self.assertGreater(int(response['Retry-After']), 0)
+            # Лимит считается отдельно для каждого email
+            self.assertEqual(attempt('other@example.com').status_code, 401)
+
+
+def slow_read(read):
+    def wrapper(*args, **kwargs):
+        value = read(*args, **kwargs)
+        time.sleep(0.01)
+        return value
+    return wrapper
+
+
+class PasswordHasherPoolTests(TestCase):
+    """Ограничение очереди пула bcrypt."""
+
+    def test_task_rejected_when_slots_taken(self):
+        hashers._get_executor()
+        started, release = threading.Event(), threading.Event()
+        with mock.patch.object(hashers, '_slots', threading.BoundedSemaphore(1)):
+            future = hashers._submit(lambda: (started.set(), release.wait()))
+            started.wait()
+            with self.assertRaises(hashers.PasswordHasherBusy):
+                hashers._submit(lambda: None)
+
+            release.set()
+            future.result()
+            # Слот освобождается после выполнения задачи
+            self.assertIsNotNone(hashers._submit(lambda: 'ok'))
+
+
+class CacheRateLimitTests(TestCase):
+    """Счетчики ограничения частоты в общем кеше."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.backend = ratelimit.CacheBackend()
+
+    def test_rejected_requests_not_counted(self):
+        results = [self.backend.hit('login:email:a', 3, 60) for _ in range(5)]
+
+        self.assertEqual(results[:3], [0, 0, 0])
+        self.assertTrue(all(results[3:]))
+        self.assertEqual(cache.get(f'ratelimit:login:email:a:{int(time.time() // 60)}'), 3)
+
+    def test_concurrent_burst_limited(self):
+        barrier = threading.Barrier(20)
+        allowed = []
+        # Задержка после чтения из кеша: все потоки успевают прочитать счетчики до записи
+        for method in ('get', 'get_many'):
+            patcher = mock.patch.object(self.backend.cache, method, slow_read(getattr(cache, method)))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        def worker():
+            barrier.wait()
+            if not self.backend.hit('login:ip:10.0.0.1', 5, 60):
+                allowed.append(1)
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(allowed), 5)
+
+
+@override_settings(AUTH_RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+class ClientIPTests(TestCase):
+    """Определение IP клиента за прокси."""
+
+    def client_ip(self, forwarded_for):
+        return ratelimit.get_client_ip(RequestFactory().get('/', HTTP_X_FORWARDED_FOR=forwarded_for))
+
+    def test_address_added_by_trusted_proxy_used(self):
+        # Левую запись подставил клиент, правую дописал прокси
+        self.assertEqual(self.client_ip('1.2.3.4, 10.0.0.7'), '10.0.0.7')
+
+    @override_settings(AUTH_RATELIMIT_TRUSTED_PROXIES=2)
+    def test_trusted_proxy_count(self):
+        self.assertEqual(self.client_ip('1.2.3.4, 10.0.0.7, 10.0.0.1'), '10.0.0.7')
+        self.assertEqual(self.client_ip('10.0.0.7'), '10.0.0.7')
+
+
+@override_settings(AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class InstrumentationTests(TestCase):
+    """Заголовок Server-Timing и лог измеренных запросов."""
+
+    def setUp(self):
+        create_user()
+        # Клиент собирает цепочку middleware при первом запросе: вход выполняется отдельным клиентом,
+        # чтобы self.client прочитал AUTH_INSTRUMENTATION_SAMPLE_RATE теста
+        self.auth = login(self.client_class())
+
+    @override_settings(AUTH_INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_sampled_request_timed(self):
+        with self.assertLogs('auth_system.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/profile/', **self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        timings = {part.split(';')[0]: part for part in response['Server-Timing'].split(', ')}
+        self.assertRegex(timings['db'], r'^db;dur=\d+\.\d\d;desc="SQL x[1-9]\d*"$')
+        self.assertRegex(timings['total'], r'^total;dur=\d+\.\d\d;desc="Total"$')
+        self.assertIn('auth', timings)
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['path'], record['status']), ('/api/profile/', 200))
+        self.assertGreater(record['queries'], 0)
+
+    @override_settings(AUTH_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_not_timed_when_disabled(self):
+        response = self.client.get('/api/profile/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsTests(TestCase):
+    """Формат /metrics/ и суммирование значений воркеров."""
+
+    def setUp(self):
+        # Значения метрик общие для процесса: тест работает с пустыми и возвращает прежние
+        saved = {metric: metric._values for metric in metrics._registry.values()}
+        for metric in saved:
+            metric._values = {}
+        self.addCleanup(lambda: [setattr(metric, '_values', values) for metric, values in saved.items()])
+        patcher = mock.patch.object(metrics, '_active_sessions_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_exposition_format(self):
+        metrics.LOGINS.inc(result='success')
+        metrics.LOGINS.inc(result='success')
+        metrics.BCRYPT_SECONDS.observe(0.25, operation='hash')
+        metrics.BCRYPT_SECONDS.observe(0.5, operation='hash')
+
+        lines = metrics.render().splitlines()
+        self.assertIn('# HELP auth_login_total Попытки входа', lines)
+        self.assertIn('# TYPE auth_login_total counter', lines)
+        self.assertIn('auth_login_total{result="success"} 2', lines)
+        self.assertIn('# TYPE auth_bcrypt_seconds histogram', lines)
+        self.assertIn('auth_bcrypt_seconds_bucket{operation="hash",le="0.1"} 0', lines)
+        self.assertIn('auth_bcrypt_seconds_bucket{operation="hash",le="0.25"} 1', lines)
+        self.assertIn('auth_bcrypt_seconds_bucket{operation="hash",le="+Inf"} 2', lines)
+        self.assertIn('auth_bcrypt_seconds_sum{operation="hash"} 0.75', lines)
+        self.assertIn('auth_bcrypt_seconds_count{operation="hash"} 2', lines)
+        self.assertIn('# TYPE auth_active_sessions gauge', lines)
+        self.assertIn('auth_active_sessions 0', lines)
+
+    def test_active_sessions_counted_once_per_ttl(self):
+        user = create_user()
+        expires_at = timezone.now() + timedelta(hours=1)
+        Session.objects.create(user=user, token_hash=Session.hash_token('first'), expires_at=expires_at)
+        self.assertIn('auth_active_sessions 1', metrics.render().splitlines())
+
+        Session.objects.create(user=user, token_hash=Session.hash_token('second'), expires_at=expires_at)
+        with self.assertNumQueries(0):
+            self.assertIn('auth_active_sessions 1', metrics.render().splitlines())
+
+    def test_workers_summed_from_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(lambda: [os.remove(os.path.join(directory, name)) for name in os.listdir(directory)])
+        buckets = len(metrics.BCRYPT_SECONDS.buckets) + 1
+        other = {
+            'auth_login_total': [[['success'], 3], [['failure'], 1]],
+            'auth_bcrypt_seconds': [[['hash'], [1] + [0] * (buckets - 1) + [0.004]]],
+        }
+        with open(os.path.join(directory, 'metrics_999999.json'), 'w') as metrics_file:
+            json.dump(other, metrics_file)
+
+        with override_settings(AUTH_METRICS_DIR=directory), \
+                mock.patch.object(metrics._store, '_pid', os.getpid()):
+            metrics.LOGINS.inc(result='success')
+            metrics.BCRYPT_SECONDS.observe(0.5, operation='hash')
+            lines = metrics.render().splitlines()
+
+            metrics._store.write()
+            with open(metrics._store.path(os.getpid())) as metrics_file:
+                self.assertEqual(json.load(metrics_file)['auth_login_total'], [[['success'], 1]])
+
+        self.assertIn('auth_login_total{result="success"} 4', lines)
+        self.assertIn('auth_login_total{result="failure"} 1', lines)
+        self.assertIn('auth_bcrypt_seconds_bucket{operation="hash",le="0.005"} 1', lines)
+        self.assertIn('auth_bcrypt_seconds_count{operation="hash"} 2', lines)
+        self.assertIn('auth_bcrypt_seconds_sum{operation="hash"} 0.504', lines)
+
+    @override_settings(AUTH_METRICS_ENABLED=False)
+    def test_disabled_metrics_not_recorded(self):
+        with mock.patch.object(metrics._store, 'ensure_thread') as ensure_thread:
+            metrics.LOGINS.inc(result='success')
+            metrics.BCRYPT_SECONDS.observe(0.5, operation='hash')
+
+        ensure_thread.assert_not_called()
+        self.assertEqual(metrics._snapshot(), {name: [] for name in metrics._snapshot()})
+
+
+class AuditBufferTests(TestCase):
+    """Буфер журнала аудита."""
+
+    def setUp(self):
+        self.buffer = audit.AuditBuffer(capacity=10, batch_size=5, interval=3600)
+        self.buffer._ensure_thread = lambda: None
+
+    def test_flush_writes_in_batches(self):
+        for _ in range(7):
+            self.buffer.put(audit.AuditEvent(created_at=timezone.now(), event='login'))
+
+        self.assertEqual(self.buffer.flush(), 7)
+        self.assertEqual(audit.AuditEvent.objects.count(), 7)
+
+    def test_flush_at_exit_logs_errors(self):
+        self.buffer.put(audit.AuditEvent(created_at=timezone.now(), event='login'))
+        with mock.patch.object(audit, '_buffer', self.buffer), \
+                mock.patch.object(audit.AuditEvent.objects, 'bulk_create', side_effect=DatabaseError('нет таблицы')), \
+                self.assertLogs('auth_system.audit', 'ERROR'):
+            audit._flush_at_exit()
+
+    @override_settings(AUTH_RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_invalid_client_ip_not_stored(self):
+        factory = RequestFactory()
+        with mock.patch.object(audit, '_buffer', self.buffer):
+            audit.record('login', request=factory.get('/', HTTP_X_FORWARDED_FOR='not-an-ip'))
+            audit.record('login', request=factory.get('/', HTTP_X_FORWARDED_FOR='10.0.0.1, 10.0.0.2'))
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            sorted(audit.AuditEvent.objects.values_list('ip', flat=True), key=str), ['10.0.0.2', None]
+        )
+
+
+class ImportUsersTests(TestCase):
+    """Команда import_users."""
+
+    def setUp(self):
+        self.admin = Role.objects.create(name='admin')
+        self.manager = Role.objects.create(name='manager')
+
+    def run_import(self, lines, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as source:
+            source.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.unlink, source.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_users', source.name, '--workers', '1', '--rounds', '4', *args,
+                     stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def row(self, email, roles):
+        return json.dumps({'email': email, 'password': 'secret123', 'first_name': 'Иван', 'last_name': 'Петров',
+                           'roles': roles})
+
+    def test_duplicate_email_in_chunk_skipped(self):
+        create_user(email='old@example.com')
+
+        stdout, stderr = self.run_import([
+            self.row('new@example.com', ['manager']),
+            self.row('new@example.com', ['admin']),
+            self.row('old@example.com', ['admin']),
+        ], '--skip-existing')
+
+        new = User.objects.get(email='new@example.com')
+        self.assertEqual(list(UserRole.objects.filter(user=new).values_list('role__name', flat=True)), ['manager'])
+        self.assertFalse(UserRole.objects.filter(user__email='old@example.com').exists())
+        self.assertIn('импортировано 1, пропущено 2', stdout)
+        self.assertIn('Строка 2 пропущена: повторяющийся email', stderr)
+
+    def test_duplicate_email_across_chunks_skipped(self):
+        stdout, _ = self.run_import([
+            self.row('new@example.com', ['manager']),
+            self.row('new@example.com', ['admin']),
+        ], '--skip-existing', '--chunk-size', '1')
+
+        self.assertEqual(
+            list(UserRole.objects.filter(user__email='new@example.com').values_list('role__name', flat=True)),
+            ['manager'],
+        )
+        self.assertIn('импортировано 1, пропущено 1', stdout)
+
+    def test_malformed_json_line_skipped(self):
+        stdout, stderr = self.run_import([self.row('new@example.com', []), '{"email": ', '[1, 2]'])
+
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+        self.assertIn('импортировано 1, пропущено 2', stdout)
+        self.assertIn('Строка 2 пропущена: некорректный JSON', stderr)
+        self.assertIn('Строка 3 пропущена: некорректный JSON', stderr)
+
+    def test_invalid_password_hash_skipped(self):
+        valid = hashers.hash_passwords(['secret123'], rounds=4)[0]
+        rows = [
+            {'email': 'valid@example.com', 'password_hash': valid},
+            {'email': 'prefix@example.com', 'password_hash': '$2b$'},
+            {'email': 'truncated@example.com', 'password_hash': valid[:-1]},
+            {'email': 'argon@example.com', 'password_hash': '$argon2id$v=19$m=65536,t=3,p=4$c2FsdA$aGFzaA'},
+        ]
+        stdout, stderr = self.run_import([json.dumps({**row, 'first_name': 'Иван', 'last_name': 'Петров'})
+                                          for row in rows])
+
+        self.assertTrue(User.objects.get(email='valid@example.com').check_password('secret123'))
+        self.assertEqual(User.objects.count(), 1)
+        self.assertIn('импортировано 1, пропущено 3', stdout)
+        for line_number in (2, 3, 4):
+            self.assertIn(f'Строка {line_number} пропущена: password_hash не является хешем bcrypt', stderr)
+
+
+class ReapSessionsTests(TestCase):
+    """Команда reap_sessions."""
+
+    def test_expired_and_inactive_sessions_deleted_in_batches(self):
+        user = create_user()
+        now = timezone.now()
+        # 3 неактивные, 3 истекшие и 2 действующие сессии
+        for index in range(8):
+            Session.objects.create(
+                user=user, token_hash=f'{index:064x}', is_active=index >= 3,
+                expires_at=now + timedelta(days=-1 if 3 <= index < 6 else 1),
+            )
+        live = set(Session.objects.filter(is_active=True, expires_at__gt=now).values_list('id', flat=True))
+
+        stdout = StringIO()
+        with mock.patch.object(QuerySet, 'delete', autospec=True, side_effect=QuerySet.delete) as delete:
+            call_command('reap_sessions', '--batch-size', '2', stdout=stdout)
+
+        self.assertEqual(set(Session.objects.values_list('id', flat=True)), live)
+        self.assertEqual(len(live), 2)
+        self.assertEqual(delete.call_count, 4)
+        self.assertIn('Удалено неактивных сессий: 3, истекших: 3', stdout.getvalue())
+
+
+class TokenRevocationTests(TestCase):
+    """Отзыв JWT токенов в памяти процесса."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.addCleanup(tokens._revoked_users.pop, self.user.id, None)
+
+    def token(self):
+        token = self.user.generate_token()
+        return token, tokens.decode_token(token)
+
+    def test_login_revokes_older_token_from_same_second(self):
+        # Оба токена выпущены в одну секунду: iat совпадает
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now()):
+            old_token, old_payload = self.token()
+            new_token, new_payload = self.token()
+
+        tokens.revoke_user_tokens(self.user.id, issued_before=new_payload['iat'], keep_jti=new_payload['jti'])
+
+        self.assertTrue(tokens.is_token_revoked(old_token, old_payload))
+        self.assertFalse(tokens.is_token_revoked(new_token, new_payload))
+
+    def test_revoke_all_tokens(self):
+        token, payload = self.token()
+        tokens.revoke_user_tokens(self.user.id)
+        self.assertTrue(tokens.is_token_revoked(token, payload))
+
+    def test_revoke_single_token(self):
+        token, payload = self.token()
+        other, other_payload = self.token()
+        tokens.revoke_token(token)
+        self.assertTrue(tokens.is_token_revoked(token, payload))
+        self.assertFalse(tokens.is_token_revoked(other, other_payload))
+
+
+class AsyncURLConf:
+    # myproject.urls выбирает модули view при импорте по AUTH_ASYNC_VIEWS, поэтому маршруты ASGI задаются здесь
+    urlpatterns = [
+        path('api/login/', async_views.login),
+        path('api/profile/', async_views.profile),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf, AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class AsyncViewTests(TestCase):
+    """Асинхронные view и асинхронный путь AuthenticationMiddleware."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.addCleanup(tokens.invalidate_cached_user, self.user.id)
+        self.addCleanup(tokens._revoked_users.pop, self.user.id, None)
+
+    async def login(self):
+        response = await self.async_client.post(
+            '/api/login/', {'email': 'user@example.com', 'password': 'password123'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['token']
+
+    async def get_profile(self, token, **headers):
+        return await self.async_client.get('/api/profile/', headers={'Authorization': f'Bearer {token}', **headers})
+
+    async def test_login_creates_session(self):
+        token = await self.login()
+        self.assertTrue(await Session.objects.filter(token_hash=Session.hash_token(token), is_active=True).aexists())
+
+    async def test_profile_not_modified_until_updated(self):
+        token = await self.login()
+        response = await self.get_profile(token)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = await self.get_profile(token, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.put(
+            '/api/profile/', {'first_name': 'Петр'}, content_type='application/json',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        response = await self.get_profile(token, **{'If-None-Match': etag})
+        self.assertEqual(response.json()['first_name'], 'Петр')
+
+    async def test_busy_password_hasher_returns_503(self):
+        saturate_password_hasher(self)
+        response = await self.async_client.post(
+            '/api/login/', {'email': 'user@example.com', 'password': 'password123'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(AUTH_BCRYPT_ROUNDS=5)
+    async def test_password_rehashed_with_new_cost(self):
+        await self.login()
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertEqual(hashers.get_hash_rounds(user.password), 5)
+
+    async def test_expired_session_rejected(self):
+        token = self.user.generate_token()
+        await Session.objects.acreate(
+            user=self.user, token_hash=Session.hash_token(token), expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        response = await self.get_profile(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(await Session.objects.filter(token_hash=Session.hash_token(token), is_active=True).aexists())
+
+    @override_settings(AUTH_JWT_STATELESS=True)
+    async def test_revoked_token_rejected_in_stateless_mode(self):
+        token = await self.login()
+        self.assertEqual((await self.get_profile(token)).status_code, 200)
+
+        tokens.revoke_user_tokens(self.user.id)
+        self.assertEqual((await self.get_profile(token)).status_code, 401)
+
+
+class FastRepresentationTests(TestCase):
+    """Скомпилированное отображение совпадает с ответом DRF."""
+
+    def test_user_data_matches_serializer(self):
+        # Отчество: не задано (NULL), пустое и заполненное
+        users = [
+            create_user(),
+            create_user(email='blank@example.com', middle_name=''),
+            create_user(email='middle@example.com', middle_name='Сергеевич', is_active=False),
+        ]
+
+        for user in users:
+            with self.subTest(email=user.email):
+                self.assertEqual(serializers.user_data(user), serializers.UserSerializer(user).data)
+        self.assertEqual(serializers.user_data.many(users), serializers.UserSerializer(users, many=True).data)
+
+    def test_role_data_matches_serializer(self):
+        role = Role.objects.create(name='manager', description='Менеджер')
+        self.assertEqual(serializers.role_data(role), serializers.RoleSerializer(role).data)
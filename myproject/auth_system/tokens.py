@@ -0,0 +1,159 @@
+import copy
+import hashlib
+import threading
+import time
+
+import jwt
+from django.conf import settings
+
+from .cache import LRUCache
+from .models import TOKEN_LIFETIME, User
+
+# Отозванные токены: sha256-дайджест токена -> время истечения токена (unix time)
+_revoked_tokens = {}
+# Отзыв всех токенов пользователя: user_id -> (граница, jti сохраняемого токена или None).
+# Недействительны токены с iat <= границы, кроме токена с сохраняемым jti
+_revoked_users = {}
+_revocation_lock = threading.Lock()
+# Очистка истекших записей выполняется не чаще, чем раз в столько добавлений
+_PRUNE_EVERY = 1024
+_revocations_since_prune = 0
+
+_user_cache = LRUCache(
+    maxsize=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 60),
+)
+
+
+def _token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+def decode_token(token):
+    """
+    Проверяет подпись HS256 и срок действия JWT токена.
+
+    Args: token (str): JWT токен
+    Returns: dict: Полезная нагрузка токена
+    Raises: jwt.InvalidTokenError: Если токен поврежден, подделан или истек
+    """
+    return jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=['HS256'],
+        options={'require': ['exp', 'iat', 'user_id']},
+    )
+
+
+def _prune_revocations(now):
+    global _revocations_since_prune
+    _revocations_since_prune = 0
+    for digest in [digest for digest, exp in _revoked_tokens.items() if exp <= now]:
+        del _revoked_tokens[digest]
+    # Отзыв пользователя нужен, только пока могут существовать выпущенные до него токены
+    max_age = TOKEN_LIFETIME.total_seconds()
+    for user_id in [user_id for user_id, (revoked_at, _) in _revoked_users.items() if revoked_at + max_age <= now]:
+        del _revoked_users[user_id]
+
+
+def revoke_token(token, expires_at=None):
+    """
+    Добавляет токен в список отозванных.
+
+    Args:
+        token (str): JWT токен
+        expires_at (float): Время истечения токена (unix time); по умолчанию берется из токена
+    """
+    global _revocations_since_prune
+    now = time.time()
+    if expires_at is None:
+        try:
+            expires_at = jwt.decode(token, options={'verify_signature': False}).get('exp', now)
+        except jwt.InvalidTokenError:
+            return
+    if expires_at <= now:
+        return
+    with _revocation_lock:
+        _revoked_tokens[_token_digest(token)] = expires_at
+        _revocations_since_prune += 1
+        if _revocations_since_prune >= _PRUNE_EVERY:
+            _prune_revocations(now)
+
+
+def revoke_user_tokens(user_id, issued_before=None, keep_jti=None):
+    """
+    Отзывает все токены пользователя, выпущенные не позже указанного момента.
+    iat в токене имеет точность до секунды, поэтому граница включительная: токены,
+    выпущенные в ту же секунду, тоже отзываются. Новый токен, выпущенный вместе
+    с отзывом (при входе), сохраняется по своему jti.
+
+    Args:
+        user_id (int): ID пользователя
+        issued_before (float): Граница времени выпуска (unix time); по умолчанию - текущее время
+        keep_jti (str): jti токена, который остается действительным
+    """
+    if issued_before is None:
+        issued_before = time.time()
+    with _revocation_lock:
+        current = _revoked_users.get(user_id)
+        if current is None or issued_before >= current[0]:
+            _revoked_users[user_id] = (issued_before, keep_jti)
+
+
+def is_token_revoked(token, payload):
+    """
+    Проверяет, отозван ли токен.
+
+    Args:
+        token (str): JWT токен
+        payload (dict): Проверенная полезная нагрузка токена
+    Returns: bool: True если токен отозван
+    """
+    revoked = _revoked_users.get(payload['user_id'])
+    if revoked is not None:
+        revoked_at, keep_jti = revoked
+        if payload['iat'] <= revoked_at and (keep_jti is None or payload.get('jti') != keep_jti):
+            return True
+    return _token_digest(token) in _revoked_tokens
+
+
+def get_cached_user(user_id):
+    """
+    Возвращает активного пользователя по ID, используя кеш с ограниченным временем жизни.
+
+    Args: user_id (int): ID пользователя
+    Returns: User или None, если пользователь не найден или деактивирован
+    """
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = User.objects.filter(pk=user_id, is_active=True).first()
+        if user is None:
+            return None
+        _user_cache.set(user_id, user)
+    # Каждый запрос получает свою копию, чтобы изменения не попадали в кеш
+    return copy.copy(user)
+
+
+async def aget_cached_user(user_id):
+    """
+    Асинхронная версия get_cached_user().
+
+    Args: user_id (int): ID пользователя
+    Returns: User или None, если пользователь не найден или деактивирован
+    """
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = await User.objects.filter(pk=user_id, is_active=True).afirst()
+        if user is None:
+            return None
+        _user_cache.set(user_id, user)
+    return copy.copy(user)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Удаляет пользователя из кеша.
+
+    Args: user_id (int): ID пользователя
+    """
+    _user_cache.pop(user_id)
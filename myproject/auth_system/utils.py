@@ -1,6 +1,167 @@
-from .models import User, AccessRule, BusinessElement, UserRole
+import threading
 
+from django.conf import settings
 
+from .audit import record_denied
+from .cache import LRUCache
+from .instrumentation import instrumented
+from .metrics import PERMISSION_CHECKS
+from .models import AccessRule, RoleClosure, UserRole
+from .policy_version import aget_policy_version, get_policy_version
+
+# Порядок действий задает номер бита в маске прав
+ACTIONS = ('read', 'read_all', 'create', 'update', 'update_all', 'delete', 'delete_all')
+ACTION_BITS = {action: 1 << index for index, action in enumerate(ACTIONS)}
+PERMISSION_FIELDS = tuple(f'{action}_permission' for action in ACTIONS)
+
+# Скомпилированные таблицы прав: user_id -> (User.permissions_version, {element_name: маска действий})
+_permission_cache = LRUCache(maxsize=getattr(settings, 'AUTH_PERMISSION_CACHE_SIZE', 10000))
+_generation_lock = threading.Lock()
+_generation = 0
+# Версия политики, для которой действительно содержимое _permission_cache
+_cached_policy_version = None
+
+
+def build_permission_table(user_id):
+    """
+    Строит таблицу прав пользователя одним запросом к БД.
+    Права всех ролей пользователя объединяются по ИЛИ.
+
+    Args: user_id (int): ID пользователя
+    Returns: dict: Название бизнес-элемента -> битовая маска действий
+    """
+    return _compile_permission_table(_user_rules(user_id))
+
+
+async def abuild_permission_table(user_id):
+    """
+    Асинхронная версия build_permission_table().
+
+    Args: user_id (int): ID пользователя
+    Returns: dict: Название бизнес-элемента -> битовая маска действий
+    """
+    return _compile_permission_table([rule async for rule in _user_rules(user_id)])
+
+
+def _user_rules(user_id):
+    # Правила всех ролей пользователя и их предков. Каждый уровень вложенного запроса
+    # покрывается индексом: userrole (user, role), roleclosure (descendant, ancestor), accessrule (role, element)
+    role_ids = UserRole.objects.filter(user_id=user_id).values('role_id')
+    ancestor_ids = RoleClosure.objects.filter(descendant_id__in=role_ids).values('ancestor_id')
+    return AccessRule.objects.filter(role_id__in=ancestor_ids).values_list('element__name', *PERMISSION_FIELDS)
+
+
+def _compile_permission_table(rules):
+    table = {}
+    for element_name, *flags in rules:
+        mask = 0
+        for action, allowed in zip(ACTIONS, flags):
+            if allowed:
+                mask |= ACTION_BITS[action]
+        table[element_name] = table.get(element_name, 0) | mask
+    return table
+
+
+def get_permission_table(user):
+    """
+    Возвращает таблицу прав пользователя из кеша, при промахе строит ее.
+
+    Args: user (User): Пользователь
+    Returns: dict: Название бизнес-элемента -> битовая маска действий
+    """
+    _sync_policy_version(get_policy_version())
+    table = _cached_table(user)
+    if table is None:
+        generation = _generation
+        table = build_permission_table(user.pk)
+        _store_permission_table(user, table, generation)
+    return table
+
+
+async def aget_permission_table(user):
+    """
+    Асинхронная версия get_permission_table().
+
+    Args: user (User): Пользователь
+    Returns: dict: Название бизнес-элемента -> битовая маска действий
+    """
+    _sync_policy_version(await aget_policy_version())
+    table = _cached_table(user)
+    if table is None:
+        generation = _generation
+        table = await abuild_permission_table(user.pk)
+        _store_permission_table(user, table, generation)
+    return table
+
+
+def _cached_table(user):
+    # Роли пользователя изменены в другом процессе: его версия ролей больше не совпадает
+    cached = _permission_cache.get(user.pk)
+    if cached is not None and cached[0] == user.permissions_version:
+        return cached[1]
+    return None
+
+
+def _sync_policy_version(version):
+    # Права изменены в другом процессе: кеш этого процесса целиком устарел
+    global _cached_policy_version
+    if version != _cached_policy_version:
+        with _generation_lock:
+            if version != _cached_policy_version:
+                _invalidate_locked(None)
+                _cached_policy_version = version
+
+
+def _store_permission_table(user, table, generation):
+    # Не кешируем таблицу, если во время ее построения права изменились
+    with _generation_lock:
+        if generation == _generation:
+            _permission_cache.set(user.pk, (user.permissions_version, table))
+
+
+def invalidate_permissions(user_id=None):
+    """
+    Сбрасывает закешированные права.
+
+    Args: user_id (int): ID пользователя; если не указан, сбрасываются права всех пользователей
+    """
+    with _generation_lock:
+        _invalidate_locked(user_id)
+
+
+def _invalidate_locked(user_id):
+    global _generation
+    _generation += 1
+    if user_id is None:
+        _permission_cache.clear()
+    else:
+        _permission_cache.pop(user_id)
+
+
+def table_allows(table, element_name, action):
+    """
+    Проверяет право по уже загруженной таблице прав.
+
+    Args:
+        table (dict): Таблица прав из get_permission_table()
+        element_name (str): Название бизнес-элемента
+        action (str): Действие (read, create, update, delete, etc.)
+    Returns:
+        bool: True если есть права, иначе False
+    """
+    allowed = bool(table.get(element_name, 0) & ACTION_BITS.get(action, 0))
+    PERMISSION_CHECKS.inc(element=element_name, action=action, decision='allow' if allowed else 'deny')
+    return allowed
+
+
+def _audited(user, element_name, action, allowed):
+    # Отказы в доступе попадают в журнал аудита
+    if not allowed:
+        record_denied(user, element_name, [action])
+    return allowed
+
+
+@instrumented('perm')
 def check_permission(user, element_name, action):
     """
     Проверяет наличие у пользователя прав на выполнение действия с элементом.
@@ -12,38 +173,4 @@ def check_permission(user, element_name, action):
     Returns:
         bool: True если есть права, иначе False
     """
-
-    try:
-        element = BusinessElement.objects.get(name=element_name)
-    except BusinessElement.DoesNotExist:
-        return False
-
-    # Получаем все роли пользователя
-    user_roles = UserRole.objects.filter(user=user).select_related('role')
-
-    # Проверяем права для каждой роли пользователя
-    for user_role in user_roles:
-        try:
-            access_rule = AccessRule.objects.get(role=user_role.role, element=element)
-
-            # Проверяем конкретное разрешение в зависимости от действия
-            if action == 'read' and access_rule.read_permission:
-                return True
-            elif action == 'read_all' and access_rule.read_all_permission:
-                return True
-            elif action == 'create' and access_rule.create_permission:
-                return True
-            elif action == 'update' and access_rule.update_permission:
-                return True
-            elif action == 'update_all' and access_rule.update_all_permission:
-                return True
-            elif action == 'delete' and access_rule.delete_permission:
-                return True
-            elif action == 'delete_all' and access_rule.delete_all_permission:
-                return True
-
-        except AccessRule.DoesNotExist:
-            # Для данной роли нет правил доступа к элементу
-            continue
-
-    return False
\ No newline at end of file
+    return _audited(user, element_name, action, table_allows(get_permission_table(user), element_name, action))
@@ -1,16 +1,56 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.utils import timezone
-from datetime import timedelta
 
-from .models import User, Session, Role, BusinessElement, AccessRule, UserRole
+from . import audit
+from .conditional import profile_etag, roles_etag
+from .decorators import has_permission, require_permission
+from .hashers import PasswordHasherBusy
+from .http import STREAM_CONTENT_TYPES, parse_moment, stream_json
+from . import metrics as auth_metrics
+from .metrics import LOGINS
+from .models import TOKEN_LIFETIME, User, Session, Role, BusinessElement, AccessRule, UserRole
+from .pagination import PaginationError, get_page_params, page_data, paginate
+from .policy import permission_claims
+from .ratelimit import check_rate_limit, get_client_ip
 from .serializers import (
     UserRegistrationSerializer, UserSerializer, LoginSerializer,
     RoleSerializer, BusinessElementSerializer, AccessRuleSerializer,
-    UserRoleSerializer
+    UserRoleSerializer, role_data, user_data
 )
-from .utils import check_permission
+from .tokens import decode_token, revoke_token, revoke_user_tokens
+from .writebehind import deactivate_session, deactivate_user_sessions
+
+
+def password_service_busy():
+    """
+    Ответ на запрос, для которого не нашлось места в пуле хеширования паролей.
+
+    Returns: Response: 503 с заголовком Retry-After
+    """
+    return Response(
+        {'error': 'Сервис перегружен, повторите попытку позже'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'}
+    )
+
+
+def too_many_requests(retry_after):
+    """
+    Ответ на запрос, превысивший ограничение частоты.
+
+    Args: retry_after (int): Через сколько секунд можно повторить запрос
+    Returns: Response: 429 с заголовком Retry-After
+    """
+    return Response(
+        {'error': 'Слишком много попыток, повторите попытку позже'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(retry_after)}
+    )
 
 
 @api_view(['POST'])
@@ -23,9 +63,16 @@ def register(request):
     Returns: Сообщение об успешной регистрации или ошибки валидации
     """
 
+    retry_after = check_rate_limit('register', request)
+    if retry_after:
+        return too_many_requests(retry_after)
+
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
+        try:
+            user = serializer.save()
+        except PasswordHasherBusy:
+            return password_service_busy()
         return Response({'message': 'Пользователь успешно зарегистрирован'}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -40,6 +87,14 @@ def login(request):
     Returns: Response: JWT токен и данные пользователя или ошибка аутентификации
     """
 
+    # Ограничение частоты проверяется до обращения к БД и bcrypt. Тело может быть
+    # не объектом (например, JSON массивом) - такой запрос отклонит сериализатор
+    email = request.data.get('email') if isinstance(request.data, dict) else None
+    retry_after = check_rate_limit('login', request, email=email)
+    if retry_after:
+        LOGINS.inc(result='rate_limited')
+        return too_many_requests(retry_after)
+
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
         email = serializer.validated_data['email']
@@ -48,27 +103,47 @@ def login(request):
         try:
             user = User.objects.get(email=email, is_active=True)
             if user.check_password(password):
-                token = user.generate_token()
-                expires_at = timezone.now() + timedelta(days=1)
+                # Пересчитываем хеш, если изменилась стоимость bcrypt
+                if user.password_needs_rehash():
+                    try:
+                        user.set_password(password)
+                        user.save(update_fields=['password'])
+                    except PasswordHasherBusy:
+                        # Пересчет не обязателен, выполним его при следующем входе
+                        pass
+
+                token = user.generate_token(permission_claims(user))
+                expires_at = timezone.now() + TOKEN_LIFETIME
 
                 # Деактивируем предыдущие сессии пользователя
                 Session.objects.filter(user=user, is_active=True).update(is_active=False)
+                payload = decode_token(token)
+                revoke_user_tokens(user.id, issued_before=payload['iat'], keep_jti=payload['jti'])
 
                 # Создаем новую сессию
                 session = Session.objects.create(
                     user=user,
-                    token=token,
+                    token_hash=Session.hash_token(token),
                     expires_at=expires_at
                 )
 
+                LOGINS.inc(result='success')
+                audit.record('login', user, request)
                 return Response({
                     'token': token,
-                    'user': UserSerializer(user).data
+                    'user': user_data(user)
                 })
             else:
+                LOGINS.inc(result='failure')
+                audit.record('login_failed', user, request, reason='password')
                 return Response({'error': 'Неверный пароль'}, status=status.HTTP_401_UNAUTHORIZED)
         except User.DoesNotExist:
+            LOGINS.inc(result='failure')
+            audit.record('login_failed', request=request, reason='unknown_user', email=email)
             return Response({'error': 'Пользователь не найден'}, status=status.HTTP_401_UNAUTHORIZED)
+        except PasswordHasherBusy:
+            LOGINS.inc(result='busy')
+            return password_service_busy()
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -83,21 +158,25 @@ def logout(request):
     Returns: Response: Сообщение об успешном выходе или ошибка
     """
 
-    if hasattr(request, 'session_obj'):
-        request.session_obj.is_active = False
-        request.session_obj.save()
+    token = getattr(request, 'auth_token', None)
+    if token:
+        revoke_token(token)
+        deactivate_session(Session.hash_token(token))
+        audit.record('logout', request.user, request)
         return Response({'message': 'Успешный выход из системы'})
     return Response({'error': 'Не авторизован'}, status=status.HTTP_401_UNAUTHORIZED)
 
 
 @api_view(['GET', 'PUT'])
+@condition(etag_func=profile_etag)
 def profile(request):
     """
     Получение и обновление профиля пользователя.
+    GET отдает ETag и отвечает 304 на If-None-Match с актуальным ETag.
 
     GET /api/profile/ - получение профиля
-    PUT /api/profile/ - обновление профиля
-    Headers: Authorization: Bearer {token}
+    PUT /api/profile/ - обновление профиля, в ответе новый ETag
+    Headers: Authorization: Bearer {token}, If-None-Match (необязательно)
 
     Returns:Response: Данные пользователя или ошибки
     """
@@ -105,14 +184,13 @@ def profile(request):
         return Response({'error': 'Не авторизован'}, status=status.HTTP_401_UNAUTHORIZED)
 
     if request.method == 'GET':
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        return Response(user_data(request.user))
 
     elif request.method == 'PUT':
         serializer = UserSerializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return Response(serializer.data, headers={'ETag': profile_etag(request)})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -134,45 +212,86 @@ def delete_account(request):
     request.user.deleted_at = timezone.now()
     request.user.save()
 
-    # Деактивируем текущую сессию
-    if hasattr(request, 'session_obj'):
-        request.session_obj.is_active = False
-        request.session_obj.save()
+    # Деактивируем все сессии и отзываем выпущенные токены
+    revoke_user_tokens(request.user.id)
+    deactivate_user_sessions(request.user.id)
+    audit.record('account_deleted', request.user, request)
 
     return Response({'message': 'Аккаунт успешно удален'})
 
 
 @api_view(['GET', 'POST'])
+@require_permission('access_rules', 'read')
+@condition(etag_func=roles_etag)
 def role_list(request):
     """
     Получение списка ролей и создание новой роли (только для админов).
+    GET отдает ETag страницы и отвечает 304 на If-None-Match, пока роли не менялись.
 
-    GET /api/admin/roles/ - список всех ролей
+    GET /api/admin/roles/?limit=&cursor= - страница списка ролей
     POST /api/admin/roles/ - создание новой роли
-    Headers: Authorization: Bearer {token}
+    Headers: Authorization: Bearer {token}, If-None-Match (необязательно)
 
     Returns: Response: Список ролей или созданная роль
     """
 
-    if not request.user or not request.user.is_authenticated:
-        return Response({'error': 'Не авторизован'}, status=status.HTTP_401_UNAUTHORIZED)
-
-    # Проверяем права доступа к управлению правилами доступа
-    if not check_permission(request.user, 'access_rules', 'read'):
-        return Response({'error': 'Доступ запрещен'}, status=status.HTTP_403_FORBIDDEN)
-
     if request.method == 'GET':
-        roles = Role.objects.all()
-        serializer = RoleSerializer(roles, many=True)
-        return Response(serializer.data)
+        try:
+            roles, next_cursor = paginate(Role.objects.all(), *get_page_params(request))
+        except PaginationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(page_data(role_data.many(roles), next_cursor))
 
     elif request.method == 'POST':
         # Дополнительная проверка на право создания
-        if not check_permission(request.user, 'access_rules', 'create'):
+        if not has_permission(request, 'access_rules', 'create'):
             return Response({'error': 'Доступ запрещен'}, status=status.HTTP_403_FORBIDDEN)
 
         serializer = RoleSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@require_permission('access_rules', 'read')
+def audit_log(request):
+    """
+    Потоковая выгрузка журнала аудита за интервал времени (только для админов).
+
+    GET /api/admin/audit/?since=2024-01-15&until=2024-01-16&event=&user_id=&output=ndjson|json
+    Headers: Authorization: Bearer {token}
+
+    Returns: StreamingHttpResponse: События в порядке времени или ошибка параметров
+    """
+    params = request.query_params
+    output = params.get('output', 'ndjson')
+    if output not in STREAM_CONTENT_TYPES:
+        return Response({'error': 'output: ожидается ndjson или json'}, status=status.HTTP_400_BAD_REQUEST)
+    if not params.get('since'):
+        return Response({'error': 'since: обязательный параметр'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        since = parse_moment(params['since'], 'since')
+        until = parse_moment(params['until'], 'until') if params.get('until') else None
+        user_id = int(params['user_id']) if params.get('user_id') else None
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    events = audit.read_events(since, until, event=params.get('event') or None, user_id=user_id)
+    return StreamingHttpResponse(stream_json(events, output), content_type=STREAM_CONTENT_TYPES[output])
+
+
+@require_GET
+def metrics(request):
+    """
+    Метрики в формате Prometheus, суммированные по всем воркерам.
+    Доступ ограничен адресами из AUTH_METRICS_ALLOWED_IPS (None - без ограничения).
+
+    GET /metrics/
+    Returns: HttpResponse: Текст метрик
+    """
+    allowed_ips = getattr(settings, 'AUTH_METRICS_ALLOWED_IPS', None)
+    if allowed_ips is not None and get_client_ip(request) not in allowed_ips:
+        return HttpResponseForbidden()
+    return HttpResponse(auth_metrics.render(), content_type=auth_metrics.CONTENT_TYPE)
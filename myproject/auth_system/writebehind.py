@@ -0,0 +1,294 @@
+"""
+Отложенная запись изменений сессий (write-behind).
+
+Деактивация сессий и обновление last_seen_at накапливаются в памяти процесса
+и записываются фоновым потоком одним UPDATE на группу, а не отдельным save()
+на пути обработки запроса. При AUTH_SESSION_WRITE_BEHIND = False изменения
+записываются сразу.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .cache import LRUCache
+from .models import Session
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество значений в одном IN (...) / CASE
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _last_seen_update(touches):
+    # Один UPDATE с CASE по token_hash вместо отдельного запроса на каждую сессию
+    return Case(
+        *[When(token_hash=token_hash, then=Value(seen_at)) for token_hash, seen_at in touches],
+        output_field=DateTimeField(),
+    )
+
+
+class SessionWriteBuffer:
+    """
+    Буфер изменений сессий. Сбрасывается в БД фоновым потоком каждые interval секунд
+    или раньше, когда накопилось max_pending изменений.
+    """
+
+    def __init__(self, interval=1.0, max_pending=1000):
+        """
+        Args:
+            interval (float): Период сброса буфера в секундах
+            max_pending (int): Количество изменений, после которого буфер сбрасывается досрочно
+        """
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._reset()
+        # Изменения, которые сейчас записываются в БД: учитываются в is_deactivated()
+        self._flushing_tokens = set()
+        self._flushing_users = set()
+
+    def _reset(self):
+        self._deactivated_tokens = set()
+        self._deactivated_users = set()
+        self._touches = {}
+
+    def _pending(self):
+        return len(self._deactivated_tokens) + len(self._deactivated_users) + len(self._touches)
+
+    def _ensure_thread(self):
+        # После fork поток родителя не наследуется, запускаем свой
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='session-write-behind', daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, apply):
+        with self._lock:
+            self._ensure_thread()
+            apply()
+            if self._pending() >= self.max_pending:
+                self._wakeup.set()
+
+    def deactivate(self, token_hash):
+        """
+        Ставит в очередь деактивацию сессии.
+
+        Args: token_hash (str): Хеш токена сессии
+        """
+        self._enqueue(lambda: self._deactivated_tokens.add(token_hash))
+
+    def deactivate_user(self, user_id):
+        """
+        Ставит в очередь деактивацию всех сессий пользователя.
+
+        Args: user_id (int): ID пользователя
+        """
+        self._enqueue(lambda: self._deactivated_users.add(user_id))
+
+    def touch(self, token_hash, seen_at):
+        """
+        Ставит в очередь обновление last_seen_at сессии.
+
+        Args:
+            token_hash (str): Хеш токена сессии
+            seen_at (datetime): Время последнего запроса
+        """
+        self._enqueue(lambda: self._touches.__setitem__(token_hash, seen_at))
+
+    def is_deactivated(self, token_hash, user_id):
+        """
+        Проверяет, ожидает ли сессия деактивации в этом процессе.
+
+        Args:
+            token_hash (str): Хеш токена сессии
+            user_id (int): ID владельца сессии
+        Returns: bool: True если сессия уже деактивирована, но это еще не записано в БД
+        """
+        with self._lock:
+            return (
+                token_hash in self._deactivated_tokens or token_hash in self._flushing_tokens
+                or user_id in self._deactivated_users or user_id in self._flushing_users
+            )
+
+    def flush(self):
+        """
+        Записывает накопленные изменения в БД.
+        Если запись не удалась, изменения возвращаются в буфер и записываются при следующем сбросе.
+
+        Raises: DatabaseError: Ошибка записи (изменения остаются в буфере)
+        """
+        with self._lock:
+            tokens, users, touches = self._deactivated_tokens, self._deactivated_users, self._touches
+            self._reset()
+            self._flushing_tokens, self._flushing_users = tokens, users
+        try:
+            for chunk in _chunks(tokens):
+                Session.objects.filter(token_hash__in=chunk, is_active=True).update(is_active=False)
+            for chunk in _chunks(users):
+                Session.objects.filter(user_id__in=chunk, is_active=True).update(is_active=False)
+            for chunk in _chunks(touches.items()):
+                Session.objects.filter(token_hash__in=[token_hash for token_hash, _ in chunk]).update(
+                    last_seen_at=_last_seen_update(chunk)
+                )
+        except Exception:
+            with self._lock:
+                self._requeue(tokens, users, touches)
+            raise
+        with self._lock:
+            self._flushing_tokens, self._flushing_users = set(), set()
+
+    def _requeue(self, tokens, users, touches):
+        # Вызывается под _lock. Повторные UPDATE идемпотентны, поэтому частично записанные
+        # группы можно записать еще раз; last_seen_at, поставленные во время записи, новее
+        self._deactivated_tokens |= tokens
+        self._deactivated_users |= users
+        for token_hash, seen_at in touches.items():
+            self._touches.setdefault(token_hash, seen_at)
+        self._flushing_tokens, self._flushing_users = set(), set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать изменения сессий')
+            finally:
+                # Соединение потока не должно держаться открытым между сбросами
+                connection.close()
+
+
+_buffer = SessionWriteBuffer(
+    interval=getattr(settings, 'AUTH_SESSION_WRITE_BEHIND_INTERVAL', 1.0),
+    max_pending=getattr(settings, 'AUTH_SESSION_WRITE_BEHIND_MAX_PENDING', 1000),
+)
+# Недавно отмеченные сессии: token_hash -> время последнего обновления last_seen_at
+_recently_seen = LRUCache(maxsize=10000)
+
+
+def _write_behind_enabled():
+    return getattr(settings, 'AUTH_SESSION_WRITE_BEHIND', False)
+
+
+def _should_touch(token_hash):
+    if not getattr(settings, 'AUTH_SESSION_TRACK_LAST_SEEN', False):
+        return False
+    now = time.monotonic()
+    last = _recently_seen.get(token_hash)
+    if last is not None and now - last < getattr(settings, 'AUTH_SESSION_LAST_SEEN_INTERVAL', 60):
+        return False
+    _recently_seen.set(token_hash, now)
+    return True
+
+
+def is_session_deactivated(token_hash, user_id):
+    """
+    Проверяет, деактивирована ли сессия в этом процессе, но еще не записана в БД.
+
+    Args:
+        token_hash (str): Хеш токена сессии
+        user_id (int): ID владельца сессии
+    Returns: bool: True если сессию нужно считать неактивной
+    """
+    return _write_behind_enabled() and _buffer.is_deactivated(token_hash, user_id)
+
+
+def deactivate_session(token_hash):
+    """
+    Деактивирует сессию (сразу или через буфер).
+
+    Args: token_hash (str): Хеш токена сессии
+    """
+    if _write_behind_enabled():
+        _buffer.deactivate(token_hash)
+    else:
+        Session.objects.filter(token_hash=token_hash, is_active=True).update(is_active=False)
+
+
+async def adeactivate_session(token_hash):
+    """
+    Асинхронная версия deactivate_session().
+
+    Args: token_hash (str): Хеш токена сессии
+    """
+    if _write_behind_enabled():
+        _buffer.deactivate(token_hash)
+    else:
+        await Session.objects.filter(token_hash=token_hash, is_active=True).aupdate(is_active=False)
+
+
+def deactivate_user_sessions(user_id):
+    """
+    Деактивирует все сессии пользователя (сразу или через буфер).
+
+    Args: user_id (int): ID пользователя
+    """
+    if _write_behind_enabled():
+        _buffer.deactivate_user(user_id)
+    else:
+        Session.objects.filter(user_id=user_id, is_active=True).update(is_active=False)
+
+
+def touch_session(token_hash):
+    """
+    Обновляет last_seen_at сессии не чаще, чем раз в AUTH_SESSION_LAST_SEEN_INTERVAL секунд.
+
+    Args: token_hash (str): Хеш токена сессии
+    """
+    if not _should_touch(token_hash):
+        return
+    if _write_behind_enabled():
+        _buffer.touch(token_hash, timezone.now())
+    else:
+        Session.objects.filter(token_hash=token_hash).update(last_seen_at=timezone.now())
+
+
+async def atouch_session(token_hash):
+    """
+    Асинхронная версия touch_session().
+
+    Args: token_hash (str): Хеш токена сессии
+    """
+    if not _should_touch(token_hash):
+        return
+    if _write_behind_enabled():
+        _buffer.touch(token_hash, timezone.now())
+    else:
+        await Session.objects.filter(token_hash=token_hash).aupdate(last_seen_at=timezone.now())
+
+
+def flush():
+    """Записывает накопленные изменения сессий в БД."""
+    _buffer.flush()
+
+
+def _flush_at_exit():
+    # Ошибку записи при завершении процесса только логируем, см. audit._flush_at_exit()
+    with _buffer._lock:
+        if not _buffer._pending():
+            return
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception('Не удалось записать изменения сессий при завершении процесса')
+
+
+# Сбрасываем буфер при штатном завершении процесса
+atexit.register(_flush_at_exit)
@@ -0,0 +1,274 @@
+"""
+Асинхронные версии бизнес-view для работы под ASGI.
+Используются вместо views.py при AUTH_ASYNC_VIEWS = True.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+from rest_framework import status
+
+from auth_system.decorators import ascope_queryset, require_permission
+from auth_system.http import STREAM_CONTENT_TYPES, json_response, read_json
+from auth_system.pagination import PaginationError, apaginate, get_page_params, page_data
+from .dashboard import DASHBOARD_DATA, dashboard_etag
+from .directory import aexport_users, filter_users
+from .models import Order, Product
+from .serializers import OrderCreateSerializer, ProductSerializer, order_data, product_data
+
+
+def _bad_json():
+    return json_response({'error': 'Некорректный JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _bad_request(error):
+    return json_response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _not_found():
+    return json_response({'error': 'Продукт не найден'}, status=status.HTTP_404_NOT_FOUND)
+
+
+def _create_order(user, data):
+    # Валидация проверяет товары в БД, а заказ создается в транзакции, поэтому выполняется синхронно в потоке
+    serializer = OrderCreateSerializer(data=data)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    return serializer.save(owner=user).id, None
+
+
+@require_http_methods(['GET'])
+@require_permission('products', any_of=['read', 'read_all'])
+async def products_list(request):
+    """
+    Получение списка продуктов.
+    С правом read_all возвращаются все продукты, с правом read - только свои.
+
+    GET /api/products/?limit=&cursor=
+
+    Returns: JsonResponse: Страница продуктов или ошибка доступа
+    """
+    products = await ascope_queryset(request, Product.objects.all(), 'products', 'read')
+    try:
+        products, next_cursor = await apaginate(products, *get_page_params(request))
+    except PaginationError as e:
+        return _bad_request(e)
+    return json_response(page_data(product_data.many(products), next_cursor))
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@require_permission('products', 'create')
+async def create_product(request):
+    """
+    Создание нового продукта. Владельцем становится текущий пользователь.
+
+    POST /api/products/create/
+    Body: {name, price, category, description}
+
+    Returns: JsonResponse: Созданный продукт или ошибка валидации/доступа
+    """
+    data = read_json(request)
+    if data is None:
+        return _bad_json()
+
+    serializer = ProductSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    product = await Product.objects.acreate(owner=request.user, **serializer.validated_data)
+
+    return json_response(
+        {'message': 'Продукт успешно создан', 'data': ProductSerializer(product).data},
+        status=status.HTTP_201_CREATED
+    )
+
+
+@require_http_methods(['GET'])
+@require_permission('orders', any_of=['read', 'read_all'])
+async def orders_list(request):
+    """
+    Получение списка заказов.
+    С правом read_all возвращаются все заказы, с правом read - только свои.
+
+    GET /api/orders/?limit=&cursor=
+
+    Returns: JsonResponse: Страница заказов или ошибка доступа
+    """
+    orders = await ascope_queryset(request, Order.objects.prefetch_related('items'), 'orders', 'read')
+    try:
+        orders, next_cursor = await apaginate(orders, *get_page_params(request))
+    except PaginationError as e:
+        return _bad_request(e)
+    return json_response(page_data(order_data.many(orders), next_cursor))
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@require_permission('orders', 'create')
+async def create_order(request):
+    """
+    Создание нового заказа.
+
+    POST /api/orders/create/
+    Body: {product_ids, quantities, shipping_address}
+
+    Returns: JsonResponse: Созданный заказ или ошибка валидации/доступа
+    """
+    data = read_json(request)
+    if data is None:
+        return _bad_json()
+
+    order_id, errors = await sync_to_async(_create_order)(request.user, data)
+    if errors:
+        return json_response(errors, status=status.HTTP_400_BAD_REQUEST)
+    return json_response(
+        {'message': 'Заказ успешно создан', 'order_id': order_id},
+        status=status.HTTP_201_CREATED
+    )
+
+
+@require_http_methods(['GET'])
+@require_permission('users', 'read_all')
+async def users_list(request):
+    """
+    Получение списка пользователей (только для администраторов).
+
+    GET /api/users/?limit=&cursor=&is_active=&joined_after=&joined_before=&email_prefix=
+
+    Returns: JsonResponse: Страница пользователей или ошибка доступа
+    """
+    try:
+        users, next_cursor = await apaginate(filter_users(request.GET), *get_page_params(request))
+    except ValueError as e:
+        # PaginationError - подкласс ValueError
+        return _bad_request(e)
+    return json_response(page_data(users, next_cursor))
+
+
+@require_http_methods(['GET'])
+@require_permission('users', 'read_all')
+async def users_export(request):
+    """
+    Потоковая выгрузка всех пользователей, подходящих под фильтры users_list.
+
+    GET /api/users/export/?output=ndjson|json&is_active=&joined_after=&joined_before=&email_prefix=
+
+    Returns: StreamingHttpResponse: NDJSON (по умолчанию) или JSON массив
+    """
+    output = request.GET.get('output', 'ndjson')
+    if output not in STREAM_CONTENT_TYPES:
+        return _bad_request('output: ожидается ndjson или json')
+    try:
+        users = filter_users(request.GET)
+    except ValueError as e:
+        return _bad_request(e)
+    return StreamingHttpResponse(aexport_users(users, output), content_type=STREAM_CONTENT_TYPES[output])
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+@require_permission('products', any_of=['update', 'update_all'])
+async def update_product(request, product_id):
+    """
+    Обновление информации о продукте.
+    С правом update можно изменять только свои продукты, чужие не видны (404).
+
+    PUT /api/products/{product_id}/
+    Body: {name, price, category, description}
+
+    Args: product_id (int): ID продукта для обновления
+    Returns: JsonResponse: Обновленные данные продукта или ошибка доступа
+    """
+    data = read_json(request)
+    if data is None:
+        return _bad_json()
+
+    products = await ascope_queryset(request, Product.objects.all(), 'products', 'update')
+    try:
+        product = await products.aget(pk=product_id)
+    except Product.DoesNotExist:
+        return _not_found()
+
+    serializer = ProductSerializer(product, data=data, partial=True)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    await sync_to_async(serializer.save)()
+
+    return json_response({
+        'message': 'Продукт успешно обновлен',
+        'product_id': product_id,
+        'updated_data': serializer.data
+    })
+
+
+@csrf_exempt
+@require_http_methods(['DELETE'])
+@require_permission('products', any_of=['delete', 'delete_all'])
+async def delete_product(request, product_id):
+    """
+    Удаление продукта.
+    С правом delete можно удалять только свои продукты, чужие не видны (404).
+
+    DELETE /api/products/{product_id}/
+
+    Args: product_id (int): ID продукта для удаления
+    Returns: JsonResponse: Сообщение об успешном удалении или ошибка доступа
+    """
+    products = await ascope_queryset(request, Product.objects.filter(pk=product_id), 'products', 'delete')
+    deleted, _ = await products.adelete()
+    if not deleted:
+        return _not_found()
+
+    return json_response({
+        'message': 'Продукт успешно удален',
+        'product_id': product_id
+    })
+
+
+@require_http_methods(['GET'])
+@require_permission('dashboard', 'read')
+@condition(etag_func=dashboard_etag)
+async def dashboard(request):
+    """
+    Получение данных для dashboard (статистика, сводка).
+
+    GET /api/dashboard/
+    Headers: If-None-Match (необязательно) - 304, если данные не менялись
+
+    Returns: JsonResponse: Статистические данные или ошибка доступа
+    """
+    return json_response(DASHBOARD_DATA)
+
+
+@require_http_methods(['GET'])
+@require_permission('products', any_of=['read', 'read_all'])
+async def product_detail(request, product_id):
+    """
+    Получение детальной информации о продукте.
+
+    GET /api/products/{product_id}/
+
+    Args: product_id (int): ID продукта
+    Returns: JsonResponse: Детальная информация о продукте или ошибка доступа
+    """
+    products = await ascope_queryset(request, Product.objects.all(), 'products', 'read')
+    try:
+        product = await products.aget(pk=product_id)
+    except Product.DoesNotExist:
+        return _not_found()
+
+    return json_response(product_data(product))
+
+
+@csrf_exempt
+async def product(request, product_id):
+    """
+    Маршрутизация /api/products/{product_id}/ по HTTP методу.
+
+    Args: product_id (int): ID продукта
+    Returns: JsonResponse: Ответ соответствующего view
+    """
+    view = {'GET': product_detail, 'PUT': update_product, 'DELETE': delete_product}.get(request.method)
+    if view is None:
+        return HttpResponseNotAllowed(['GET', 'PUT', 'DELETE'])
+    return await view(request, product_id)
@@ -0,0 +1,33 @@
+"""
+Данные dashboard и их ETag.
+
+Пока данные статические (mock), ETag - хеш содержимого, вычисленный один раз на процесс.
+Когда dashboard начнет строиться из БД, ETag нужно получать из версии или времени
+последнего изменения источников, иначе для него придется строить весь ответ.
+"""
+from auth_system.conditional import content_etag
+
+# Mock данные для dashboard
+DASHBOARD_DATA = {
+    'total_products': 156,
+    'total_orders': 42,
+    'total_users': 23,
+    'revenue': 1250000,
+    'recent_activity': [
+        {'action': 'order_created', 'user': 'user1@example.com', 'time': '2024-01-15 10:30'},
+        {'action': 'product_updated', 'user': 'admin@example.com', 'time': '2024-01-15 09:15'},
+        {'action': 'user_registered', 'user': 'newuser@example.com', 'time': '2024-01-15 08:45'},
+    ]
+}
+
+_etag = None
+
+
+def dashboard_etag(request, *args, **kwargs):
+    """
+    Returns: str: ETag данных dashboard
+    """
+    global _etag
+    if _etag is None:
+        _etag = content_etag(DASHBOARD_DATA)
+    return _etag
@@ -0,0 +1,65 @@
+"""
+Каталог пользователей: фильтры списка и потоковая выгрузка.
+
+Выборки читают только нужные колонки через values(), фильтры опираются на индексы
+(is_active, id), (date_joined) и уникальный индекс email (поиск по префиксу - LIKE 'abc%').
+Выгрузка читает таблицу серверным курсором (iterator(chunk_size=...)) и отдает строки
+по мере чтения, поэтому память процесса не зависит от числа пользователей.
+"""
+from auth_system.http import astream_json, parse_moment, stream_json
+from auth_system.models import User
+
+# Поля пользователя в списке и выгрузке
+USER_FIELDS = ('id', 'email', 'first_name', 'last_name', 'middle_name', 'is_active', 'date_joined')
+
+# Количество строк, читаемых из курсора БД за раз и отправляемых клиенту одним куском
+EXPORT_CHUNK_SIZE = 2000
+
+_BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def filter_users(params):
+    """
+    Строит выборку пользователей по параметрам запроса:
+    is_active (true/false), joined_after (>=), joined_before (<), email_prefix.
+
+    Args: params (QueryDict): Параметры строки запроса
+    Returns: QuerySet: values() с полями USER_FIELDS
+    Raises: ValueError: Если значение параметра некорректно
+    """
+    users = User.objects.values(*USER_FIELDS)
+
+    is_active = params.get('is_active')
+    if is_active is not None:
+        if is_active.lower() not in _BOOLEANS:
+            raise ValueError('is_active: ожидается true или false')
+        users = users.filter(is_active=_BOOLEANS[is_active.lower()])
+    if params.get('joined_after'):
+        users = users.filter(date_joined__gte=parse_moment(params['joined_after'], 'joined_after'))
+    if params.get('joined_before'):
+        users = users.filter(date_joined__lt=parse_moment(params['joined_before'], 'joined_before'))
+    if params.get('email_prefix'):
+        # Регистрозависимый LIKE 'prefix%' использует индекс email, istartswith - нет
+        users = users.filter(email__startswith=params['email_prefix'])
+    return users
+
+
+def export_users(users, output='ndjson'):
+    """
+    Тело выгрузки: NDJSON (объект на строку) или JSON массив.
+
+    Args:
+        users (QuerySet): Выборка из filter_users()
+        output (str): ndjson или json
+    Returns: generator: Куски ответа
+    """
+    rows = users.order_by('id').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return stream_json(rows, output, EXPORT_CHUNK_SIZE)
+
+
+def aexport_users(users, output='ndjson'):
+    """
+    Асинхронная версия export_users() для StreamingHttpResponse под ASGI.
+    """
+    rows = users.order_by('id').aiterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return astream_json(rows, output, EXPORT_CHUNK_SIZE)
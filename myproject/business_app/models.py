@@ -1,3 +1,77 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class Product(models.Model):
+    """
+    Модель товара. Владелец определяет доступ по правам read/update/delete
+    (свои объекты) в отличие от read_all/update_all/delete_all (все объекты).
+    """
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='products',
+                              db_index=False, verbose_name='Владелец')
+    name = models.CharField(max_length=200, verbose_name='Название')
+    description = models.TextField(blank=True, verbose_name='Описание')
+    price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Цена')
+    category = models.CharField(max_length=100, blank=True, verbose_name='Категория')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        indexes = [
+            # Выборка своих объектов по владельцу в порядке id - один проход по индексу
+            models.Index(fields=['owner', 'id'], name='product_owner_id_idx'),
+        ]
+        verbose_name = 'Товар'
+        verbose_name_plural = 'Товары'
+
+    def __str__(self):
+        return self.name
+
+
+class Order(models.Model):
+    """
+    Модель заказа пользователя.
+    """
+
+    STATUS_CHOICES = [
+        ('processing', 'В обработке'),
+        ('completed', 'Выполнен'),
+        ('cancelled', 'Отменен'),
+    ]
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders',
+                              db_index=False, verbose_name='Владелец')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing', verbose_name='Статус')
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Сумма')
+    shipping_address = models.TextField(blank=True, verbose_name='Адрес доставки')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'id'], name='order_owner_id_idx'),
+        ]
+        verbose_name = 'Заказ'
+        verbose_name_plural = 'Заказы'
+
+    def __str__(self):
+        return f"Заказ {self.pk} ({self.owner_id})"
+
+
+class OrderItem(models.Model):
+    """
+    Позиция заказа. Цена фиксируется на момент оформления.
+    """
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', verbose_name='Заказ')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='order_items',
+                                verbose_name='Товар')
+    quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
+    price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Цена')
+
+    class Meta:
+        verbose_name = 'Позиция заказа'
+        verbose_name_plural = 'Позиции заказа'
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity}"
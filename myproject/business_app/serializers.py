@@ -0,0 +1,88 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from auth_system.representation import FastRepresentation
+
+from .models import Order, OrderItem, Product
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    """Сериализатор товара. Владелец назначается из запроса и не меняется."""
+
+    class Meta:
+        model = Product
+        fields = ['id', 'owner', 'name', 'description', 'price', 'category', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    """Сериализатор позиции заказа."""
+
+    class Meta:
+        model = OrderItem
+        fields = ['product', 'quantity', 'price']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    """Сериализатор заказа с позициями."""
+
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'owner', 'status', 'total_amount', 'shipping_address', 'created_at', 'items']
+        read_only_fields = fields
+
+
+class OrderCreateSerializer(serializers.Serializer):
+    """
+    Сериализатор оформления заказа.
+    Проверяет, что количества заданы для каждого товара и все товары существуют.
+    """
+
+    product_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    quantities = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    shipping_address = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, data):
+        """
+        Args: data (dict): Данные для валидации
+        """
+        quantities = data.setdefault('quantities', [1] * len(data['product_ids']))
+        if len(quantities) != len(data['product_ids']):
+            raise serializers.ValidationError('Количество значений quantities должно совпадать с product_ids')
+
+        products = Product.objects.in_bulk(data['product_ids'])
+        missing = sorted(set(data['product_ids']) - set(products))
+        if missing:
+            raise serializers.ValidationError({'product_ids': f'Товары не найдены: {missing}'})
+        data['products'] = products
+        return data
+
+    def create(self, validated_data):
+        """
+        Создает заказ и его позиции по текущим ценам товаров.
+
+        Args: validated_data (dict): Валидированные данные, owner передается через save()
+        Returns: Order: Созданный заказ
+        """
+        products = validated_data['products']
+        items = [
+            OrderItem(product=products[product_id], quantity=quantity, price=products[product_id].price)
+            for product_id, quantity in zip(validated_data['product_ids'], validated_data['quantities'])
+        ]
+        with transaction.atomic():
+            order = Order.objects.create(
+                owner=validated_data['owner'],
+                shipping_address=validated_data['shipping_address'],
+                total_amount=sum(item.price * item.quantity for item in items),
+            )
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+        return order
+
+
+# Быстрое отображение для списков (см. auth_system/representation.py)
+product_data = FastRepresentation(ProductSerializer)
+order_data = FastRepresentation(OrderSerializer)
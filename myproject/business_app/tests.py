@@ -1,3 +1,201 @@
-from django.test import TestCase
+import json
+from datetime import datetime
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+
+from auth_system import async_views as auth_async_views
+from auth_system.models import Role, User, UserRole
+from auth_system.tests import create_user, grant, login, reset_permission_caches
+
+from . import async_views, directory
+from .models import Product
+
+
+@override_settings(AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class ProductScopeTests(TestCase):
+    """Ограничение списка и изменения продуктов владельцем."""
+
+    def setUp(self):
+        reset_permission_caches()
+        self.addCleanup(reset_permission_caches)
+        self.user = create_user()
+        self.other = create_user(email='other@example.com')
+        self.role = Role.objects.create(name='manager')
+        UserRole.objects.create(user=self.user, role=self.role)
+        self.own = Product.objects.create(owner=self.user, name='Свой', price=10)
+        self.foreign = Product.objects.create(owner=self.other, name='Чужой', price=20)
+        self.auth = login(self.client)
+
+    def product_ids(self, **params):
+        response = self.client.get('/api/products/', params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.json()['results']]
+
+    def test_read_returns_own_products(self):
+        grant(self.role, 'products', 'read')
+        self.assertEqual(self.product_ids(), [self.own.pk])
+
+    def test_read_all_returns_all_products(self):
+        grant(self.role, 'products', 'read_all')
+        self.assertEqual(self.product_ids(), [self.own.pk, self.foreign.pk])
+
+    def test_update_limited_to_own_products(self):
+        grant(self.role, 'products', 'read', 'update')
+
+        response = self.client.put(f'/api/products/{self.foreign.pk}/', {'name': 'Новое'},
+                                   content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 404)
+        response = self.client.put(f'/api/products/{self.own.pk}/', {'name': 'Новое'},
+                                   content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.name, 'Чужой')
+
+    def test_pages_follow_cursor(self):
+        grant(self.role, 'products', 'read_all')
+        response = self.client.get('/api/products/', {'limit': 1}, **self.auth).json()
+        self.assertEqual([product['id'] for product in response['results']], [self.own.pk])
+        self.assertEqual(self.product_ids(limit=1, cursor=response['next']), [self.foreign.pk])
+
+    def test_invalid_cursor_rejected(self):
+        grant(self.role, 'products', 'read')
+        for cursor in ('x', 'eyJpZCI6ICJ4In0'):
+            response = self.client.get('/api/products/', {'cursor': cursor}, **self.auth)
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class DashboardTests(TestCase):
+    """ETag и ответ 304 для dashboard."""
+
+    def setUp(self):
+        reset_permission_caches()
+        self.addCleanup(reset_permission_caches)
+        self.user = create_user()
+        role = Role.objects.create(name='analyst')
+        grant(role, 'dashboard', 'read')
+        UserRole.objects.create(user=self.user, role=role)
+        self.auth = login(self.client)
+
+    def test_not_modified_with_current_etag(self):
+        response = self.client.get('/api/dashboard/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=response['ETag'], **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_not_given_without_permission(self):
+        UserRole.objects.filter(user=self.user).delete()
+        response = self.client.get('/api/dashboard/', **self.auth)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class UserDirectoryTests(TestCase):
+    """Фильтры списка пользователей и потоковая выгрузка."""
+
+    def setUp(self):
+        reset_permission_caches()
+        self.addCleanup(reset_permission_caches)
+        self.admin = create_user(email='admin@example.com')
+        role = Role.objects.create(name='admin')
+        grant(role, 'users', 'read_all')
+        UserRole.objects.create(user=self.admin, role=role)
+        self.auth = login(self.client, email='admin@example.com')
+
+        self.joined(create_user(email='anna@example.com'), 2024, 1, 10)
+        self.joined(create_user(email='andrey@example.com', is_active=False), 2024, 3, 5)
+        self.joined(create_user(email='boris@example.com', is_active=False), 2024, 3, 20)
+        self.joined(self.admin, 2023, 12, 1)
+
+    @staticmethod
+    def joined(user, *day):
+        User.objects.filter(pk=user.pk).update(date_joined=timezone.make_aware(datetime(*day)))
+
+    @staticmethod
+    def emails(users):
+        return sorted(user['email'] for user in users)
+
+    def test_filters_combined(self):
+        params = QueryDict('is_active=false&email_prefix=an&joined_after=2024-03-01&joined_before=2024-04-01')
+        self.assertEqual(self.emails(directory.filter_users(params)), ['andrey@example.com'])
+
+        params = QueryDict('is_active=true&joined_after=2024-01-01')
+        self.assertEqual(self.emails(directory.filter_users(params)), ['anna@example.com'])
+
+    def test_invalid_filter_rejected(self):
+        for query in ('is_active=maybe', 'joined_after=вчера'):
+            with self.assertRaises(ValueError):
+                directory.filter_users(QueryDict(query))
+
+    def test_export_streams_all_rows(self):
+        users = directory.filter_users(QueryDict('email_prefix=a'))
+        with mock.patch.object(directory, 'EXPORT_CHUNK_SIZE', 2):
+            chunks = list(directory.export_users(users))
+            rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+            self.assertEqual(len(chunks), 2)
+            self.assertEqual([row['email'] for row in rows],
+                             ['admin@example.com', 'anna@example.com', 'andrey@example.com'])
+            self.assertEqual(set(rows[0]), set(directory.USER_FIELDS))
+
+            rows = json.loads(''.join(directory.export_users(users, 'json')))
+            self.assertEqual(len(rows), 3)
+
+    def test_list_view_filters(self):
+        response = self.client.get('/api/users/', {'is_active': 'false', 'email_prefix': 'b'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.emails(response.json()['results']), ['boris@example.com'])
+
+        response = self.client.get('/api/users/', {'joined_before': 'x'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_view_row_count(self):
+        response = self.client.get('/api/users/export/', {'is_active': 'false'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 2)
+
+        response = self.client.get('/api/users/export/', {'output': 'csv'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncURLConf:
+    # myproject.urls выбирает модули view при импорте по AUTH_ASYNC_VIEWS, поэтому маршруты ASGI задаются здесь
+    urlpatterns = [
+        path('api/login/', auth_async_views.login),
+        path('api/products/', async_views.products_list),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf, AUTH_RATELIMIT_ENABLED=False, AUTH_AUDIT_ENABLED=False)
+class AsyncProductScopeTests(TestCase):
+    """Ограничение списка продуктов владельцем в асинхронном view."""
+
+    def setUp(self):
+        reset_permission_caches()
+        self.addCleanup(reset_permission_caches)
+        self.user = create_user()
+        self.role = Role.objects.create(name='manager')
+        UserRole.objects.create(user=self.user, role=self.role)
+        self.own = Product.objects.create(owner=self.user, name='Свой', price=10)
+        Product.objects.create(owner=create_user(email='other@example.com'), name='Чужой', price=20)
+        self.auth = {'Authorization': login(self.client)['HTTP_AUTHORIZATION']}
+
+    async def test_read_returns_own_products(self):
+        await sync_to_async(grant)(self.role, 'products', 'read')
+
+        response = await self.async_client.get('/api/products/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.own.pk])
+
+    async def test_invalid_cursor_rejected(self):
+        await sync_to_async(grant)(self.role, 'products', 'read')
+
+        response = await self.async_client.get('/api/products/', {'cursor': 'x'}, headers=self.auth)
+        self.assertEqual(response.status_code, 400)
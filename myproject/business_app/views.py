@@ -1,109 +1,88 @@
+from django.http import HttpResponseNotAllowed, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from auth_system.utils import check_permission
+
+from auth_system.decorators import require_permission, scope_queryset
+from auth_system.http import STREAM_CONTENT_TYPES
+from auth_system.pagination import PaginationError, get_page_params, page_data, paginate
+from .dashboard import DASHBOARD_DATA, dashboard_etag
+from .directory import export_users, filter_users
+from .models import Order, Product
+from .serializers import OrderCreateSerializer, ProductSerializer, order_data, product_data
+
+
+def _bad_request(error):
+    return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET'])
+@require_permission('products', any_of=['read', 'read_all'])
 def products_list(request):
     """
     Получение списка продуктов.
+    С правом read_all возвращаются все продукты, с правом read - только свои.
 
-    GET /api/products/
+    GET /api/products/?limit=&cursor=
 
-    Returns: Response: Список продуктов или ошибка доступа
+    Returns: Response: Страница продуктов или ошибка доступа
     """
-    print(f"Request user: {request.user}")
-    print(f"User authenticated: {request.user.is_authenticated}")
-    # Проверка аутентификации пользователя
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-
-    # Проверка прав доступа на чтение продуктов
-    if not check_permission(request.user, 'products', 'read'):
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # Mock данные продуктов (в реальной системе здесь был бы запрос к БД)
-    products = [
-        {'id': 1, 'name': 'Ноутбук Lenovo', 'price': 45000, 'category': 'Электроника'},
-        {'id': 2, 'name': 'Смартфон Samsung', 'price': 25000, 'category': 'Электроника'},
-        {'id': 3, 'name': 'Наушники Sony', 'price': 8000, 'category': 'Аксессуары'},
-    ]
 
-    return Response(products)
+    products = scope_queryset(request, Product.objects.all(), 'products', 'read')
+    try:
+        products, next_cursor = paginate(products, *get_page_params(request))
+    except PaginationError as e:
+        return _bad_request(e)
+    return Response(page_data(product_data.many(products), next_cursor))
 
 
 @api_view(['POST'])
+@require_permission('products', 'create')
 def create_product(request):
     """
-    Создание нового продукта.
+    Создание нового продукта. Владельцем становится текущий пользователь.
 
     POST /api/products/create/
     Body: {name, price, category, description}
 
-    Returns: Response: Сообщение об успешном создании или ошибка доступа
+    Returns: Response: Созданный продукт или ошибка валидации/доступа
     """
 
-    if not request.user or not request.user.is_authenticated:
+    serializer = ProductSerializer(data=request.data)
+    if serializer.is_valid():
+        serializer.save(owner=request.user)
         return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
+            {'message': 'Продукт успешно создан', 'data': serializer.data},
+            status=status.HTTP_201_CREATED
         )
-
-    # Проверка прав доступа на создание продуктов
-    if not check_permission(request.user, 'products', 'create'):
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # В реальной системе здесь была бы валидация и сохранение в БД
-    # Для примера просто возвращаем успешный ответ
-    return Response(
-        {'message': 'Продукт успешно создан', 'data': request.data},
-        status=status.HTTP_201_CREATED
-    )
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET'])
+@require_permission('orders', any_of=['read', 'read_all'])
 def orders_list(request):
     """
     Получение списка заказов.
+    С правом read_all возвращаются все заказы, с правом read - только свои.
 
-    GET /api/orders/
+    GET /api/orders/?limit=&cursor=
 
-    Returns: Response: Список заказов или ошибка доступа
+    Returns: Response: Страница заказов или ошибка доступа
     """
 
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-
-    # Проверка прав доступа на чтение заказов
-    if not check_permission(request.user, 'orders', 'read'):
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # Mock данные заказов
-    orders = [
-        {'id': 1, 'user_id': request.user.id, 'total_amount': 53000, 'status': 'completed'},
-        {'id': 2, 'user_id': request.user.id, 'total_amount': 12000, 'status': 'processing'},
-    ]
-
-    return Response(orders)
+    orders = scope_queryset(request, Order.objects.prefetch_related('items'), 'orders', 'read')
+    try:
+        orders, next_cursor = paginate(orders, *get_page_params(request))
+    except PaginationError as e:
+        return _bad_request(e)
+    return Response(page_data(order_data.many(orders), next_cursor))
 
 
 @api_view(['POST'])
+@require_permission('orders', 'create')
 def create_order(request):
     """
     Создание нового заказа.
@@ -111,66 +90,65 @@ def create_order(request):
     POST /api/orders/create/
     Body: {product_ids, quantities, shipping_address}
 
-    Returns: Response: Сообщение об успешном создании заказа или ошибка доступа
+    Returns: Response: Созданный заказ или ошибка валидации/доступа
     """
 
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-
-    # Проверка прав доступа на создание заказов
-    if not check_permission(request.user, 'orders', 'create'):
+    serializer = OrderCreateSerializer(data=request.data)
+    if serializer.is_valid():
+        order = serializer.save(owner=request.user)
         return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
+            {'message': 'Заказ успешно создан', 'order_id': order.id},
+            status=status.HTTP_201_CREATED
         )
-
-    # Mock создание заказа
-    return Response(
-        {'message': 'Заказ успешно создан', 'order_id': 123},
-        status=status.HTTP_201_CREATED
-    )
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET'])
+@require_permission('users', 'read_all')
 def users_list(request):
     """
     Получение списка пользователей (только для администраторов).
 
-    GET /api/users/
+    GET /api/users/?limit=&cursor=&is_active=&joined_after=&joined_before=&email_prefix=
 
-    Returns: Response: Список пользователей или ошибка доступа
+    Returns: Response: Страница пользователей или ошибка доступа
     """
 
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+    try:
+        users, next_cursor = paginate(filter_users(request.query_params), *get_page_params(request))
+    except ValueError as e:
+        # PaginationError - подкласс ValueError
+        return _bad_request(e)
+    return Response(page_data(users, next_cursor))
 
-    # Проверка прав доступа на чтение всех пользователей
-    if not check_permission(request.user, 'users', 'read_all'):
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
 
-    # Mock данные пользователей (в реальной системе - запрос к БД)
-    users = [
-        {'id': 1, 'email': 'admin@example.com', 'first_name': 'Админ', 'last_name': 'Системный'},
-        {'id': 2, 'email': 'user1@example.com', 'first_name': 'Иван', 'last_name': 'Петров'},
-        {'id': 3, 'email': 'user2@example.com', 'first_name': 'Мария', 'last_name': 'Сидорова'},
-    ]
+@api_view(['GET'])
+@require_permission('users', 'read_all')
+def users_export(request):
+    """
+    Потоковая выгрузка всех пользователей, подходящих под фильтры users_list.
+
+    GET /api/users/export/?output=ndjson|json&is_active=&joined_after=&joined_before=&email_prefix=
+
+    Returns: StreamingHttpResponse: NDJSON (по умолчанию) или JSON массив
+    """
 
-    return Response(users)
+    output = request.query_params.get('output', 'ndjson')
+    if output not in STREAM_CONTENT_TYPES:
+        return _bad_request('output: ожидается ndjson или json')
+    try:
+        users = filter_users(request.query_params)
+    except ValueError as e:
+        return _bad_request(e)
+    return StreamingHttpResponse(export_users(users, output), content_type=STREAM_CONTENT_TYPES[output])
 
 
 @api_view(['PUT'])
+@require_permission('products', any_of=['update', 'update_all'])
 def update_product(request, product_id):
     """
     Обновление информации о продукте.
+    С правом update можно изменять только свои продукты, чужие не видны (404).
 
     PUT /api/products/{product_id}/
     Body: {name, price, category, description}
@@ -179,35 +157,24 @@ def update_product(request, product_id):
     Returns: Response: Обновленные данные продукта или ошибка доступа
     """
 
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-
-    # Проверка прав доступа на обновление продуктов
-    has_update_all = check_permission(request.user, 'products', 'update_all')
-    has_update_own = check_permission(request.user, 'products', 'update')
-
-    if not has_update_all and not has_update_own:
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # В реальной системе здесь было бы обновление данных в БД
-
-    return Response({
-        'message': 'Продукт успешно обновлен',
-        'product_id': product_id,
-        'updated_data': request.data
-    })
+    product = get_object_or_404(scope_queryset(request, Product.objects.all(), 'products', 'update'), pk=product_id)
+    serializer = ProductSerializer(product, data=request.data, partial=True)
+    if serializer.is_valid():
+        serializer.save()
+        return Response({
+            'message': 'Продукт успешно обновлен',
+            'product_id': product_id,
+            'updated_data': serializer.data
+        })
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['DELETE'])
+@require_permission('products', any_of=['delete', 'delete_all'])
 def delete_product(request, product_id):
     """
     Удаление продукта.
+    С правом delete можно удалять только свои продукты, чужие не видны (404).
 
     DELETE /api/products/{product_id}/
 
@@ -215,23 +182,9 @@ def delete_product(request, product_id):
     Returns: Response: Сообщение об успешном удалении или ошибка доступа
     """
 
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-
-    # Проверка прав доступа на удаление продуктов
-    has_delete_all = check_permission(request.user, 'products', 'delete_all')
-    has_delete_own = check_permission(request.user, 'products', 'delete')
-
-    if not has_delete_all and not has_delete_own:
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # В реальной системе здесь было бы удаление из БД
+    deleted, _ = scope_queryset(request, Product.objects.filter(pk=product_id), 'products', 'delete').delete()
+    if not deleted:
+        return Response({'error': 'Продукт не найден'}, status=status.HTTP_404_NOT_FOUND)
 
     return Response({
         'message': 'Продукт успешно удален',
@@ -240,45 +193,22 @@ def delete_product(request, product_id):
 
 
 @api_view(['GET'])
+@require_permission('dashboard', 'read')
+@condition(etag_func=dashboard_etag)
 def dashboard(request):
     """
     Получение данных для dashboard (статистика, сводка).
 
     GET /api/dashboard/
+    Headers: If-None-Match (необязательно) - 304, если данные не менялись
 
     Returns: Response: Статистические данные или ошибка доступа
     """
-
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-
-    # Проверка прав доступа к dashboard
-    if not check_permission(request.user, 'dashboard', 'read'):
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # Mock данные для dashboard
-    dashboard_data = {
-        'total_products': 156,
-        'total_orders': 42,
-        'total_users': 23,
-        'revenue': 1250000,
-        'recent_activity': [
-            {'action': 'order_created', 'user': 'user1@example.com', 'time': '2024-01-15 10:30'},
-            {'action': 'product_updated', 'user': 'admin@example.com', 'time': '2024-01-15 09:15'},
-            {'action': 'user_registered', 'user': 'newuser@example.com', 'time': '2024-01-15 08:45'},
-        ]
-    }
-
-    return Response(dashboard_data)
+    return Response(DASHBOARD_DATA)
 
 
 @api_view(['GET'])
+@require_permission('products', any_of=['read', 'read_all'])
 def product_detail(request, product_id):
     """
     Получение детальной информации о продукте.
@@ -289,30 +219,19 @@ def product_detail(request, product_id):
     Returns: Response: Детальная информация о продукте или ошибка доступа
     """
 
-    if not request.user or not request.user.is_authenticated:
-        return Response(
-            {'error': 'Не авторизован'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+    product = get_object_or_404(scope_queryset(request, Product.objects.all(), 'products', 'read'), pk=product_id)
+    return Response(product_data(product))
 
-    # Проверка прав доступа на чтение продуктов
-    if not check_permission(request.user, 'products', 'read'):
-        return Response(
-            {'error': 'Доступ запрещен'},
-            status=status.HTTP_403_FORBIDDEN
-        )
 
-    # Mock данные продукта
-    product = {
-        'id': product_id,
-        'name': f'Продукт {product_id}',
-        'price': 1000 * product_id,
-        'category': 'Электроника',
-        'description': f'Это описание продукта {product_id}',
-        'created_at': '2024-01-01',
-        'updated_at': '2024-01-15',
-        'stock_quantity': 50,
-        'rating': 4.5
-    }
-
-    return Response(product)
\ No newline at end of file
+@csrf_exempt
+def product(request, product_id):
+    """
+    Маршрутизация /api/products/{product_id}/ по HTTP методу.
+
+    Args: product_id (int): ID продукта
+    Returns: Response: Ответ соответствующего view
+    """
+    view = {'GET': product_detail, 'PUT': update_product, 'DELETE': delete_product}.get(request.method)
+    if view is None:
+        return HttpResponseNotAllowed(['GET', 'PUT', 'DELETE'])
+    return view(request, product_id)
@@ -1,3 +1,4 @@
+import argparse
 import os
 import django
 import sys
@@ -8,6 +9,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 django.setup()
 
 from auth_system.models import User, Role, BusinessElement, AccessRule, UserRole
+from auth_system.synthetic import create_synthetic_data
+from business_app.models import Product
 from django.contrib.auth import get_user_model
 
 
@@ -110,10 +113,55 @@ def create_test_data():
     UserRole.objects.get_or_create(user=admin_user, role=admin_role)
     UserRole.objects.get_or_create(user=regular_user, role=user_role)
 
+    # Создаем товары: пользователь с правом read видит только свои, админ (read_all) - все
+    products_data = [
+        (admin_user, 'Ноутбук Lenovo', 45000, 'Электроника'),
+        (admin_user, 'Смартфон Samsung', 25000, 'Электроника'),
+        (regular_user, 'Наушники Sony', 8000, 'Аксессуары'),
+    ]
+    for owner, name, price, category in products_data:
+        Product.objects.get_or_create(owner=owner, name=name, defaults={'price': price, 'category': category})
+
     print("Тестовые данные созданы успешно!")
     print("Админ: admin@example.com / admin123")
     print("Пользователь: user@example.com / user123")
 
 
+def count(value):
+    """Разбирает количество, допуская запись вида 1e6."""
+    return int(float(value))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Создание тестовых данных. С параметрами масштаба дополнительно '
+                    'генерирует синтетический набор данных.'
+    )
+    parser.add_argument('--users', type=count, default=0, help='Количество синтетических пользователей')
+    parser.add_argument('--roles', type=count, default=10, help='Количество синтетических ролей')
+    parser.add_argument('--elements', type=count, default=20, help='Количество синтетических бизнес-элементов')
+    parser.add_argument('--roles-per-user', type=count, default=2, help='Ролей у каждого пользователя')
+    parser.add_argument('--sessions-per-user', type=count, default=1, help='Сессий у каждого пользователя')
+    parser.add_argument('--rules-per-role', type=count, default=None, help='Правил доступа у каждой роли')
+    parser.add_argument('--seed', type=int, default=0, help='Seed генератора случайных чисел')
+    parser.add_argument('--batch-size', type=count, default=5000, help='Размер пачки bulk_create')
+    parser.add_argument('--password', default='password', help='Пароль синтетических пользователей')
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    create_test_data()
\ No newline at end of file
+    args = parse_args()
+    create_test_data()
+    if args.users:
+        print("Создание синтетических данных...")
+        create_synthetic_data(
+            users=args.users,
+            roles=args.roles,
+            elements=args.elements,
+            roles_per_user=args.roles_per_user,
+            sessions_per_user=args.sessions_per_user,
+            rules_per_role=args.rules_per_role,
+            seed=args.seed,
+            batch_size=args.batch_size,
+            password=args.password,
+        )
\ No newline at end of file
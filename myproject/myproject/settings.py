@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
 
+    'auth_system.instrumentation.InstrumentationMiddleware',
     'auth_system.middleware.AuthenticationMiddleware',
 
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -135,7 +136,105 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'auth_system.User'
 
+# Максимальное количество пользователей в кеше скомпилированных прав
+AUTH_PERMISSION_CACHE_SIZE = 10000
+
+# Проверка JWT без обращения к таблице сессий: подпись и срок действия проверяются локально,
+# отозванные токены хранятся в памяти процесса
+AUTH_JWT_STATELESS = os.getenv('AUTH_JWT_STATELESS', 'False') == 'True'
+# Кеш пользователей для stateless-режима
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 60
+# Снимок прав (битовая маска element x action) и версия политики в JWT: в stateless-режиме
+# права проверяются по токену, пока версия политики не изменилась
+AUTH_JWT_PERMISSION_CLAIMS = os.getenv('AUTH_JWT_PERMISSION_CLAIMS', 'False') == 'True'
+# Сколько секунд процесс использует прочитанную версию политики
+AUTH_POLICY_VERSION_TTL = 1.0
+
+# Отложенная запись изменений сессий: деактивация и last_seen_at накапливаются в памяти
+# и записываются фоновым потоком пачками раз в INTERVAL секунд или после MAX_PENDING изменений
+AUTH_SESSION_WRITE_BEHIND = os.getenv('AUTH_SESSION_WRITE_BEHIND', 'False') == 'True'
+AUTH_SESSION_WRITE_BEHIND_INTERVAL = 1.0
+AUTH_SESSION_WRITE_BEHIND_MAX_PENDING = 1000
+# Отслеживание времени последней активности сессии (не чаще раза в LAST_SEEN_INTERVAL секунд)
+AUTH_SESSION_TRACK_LAST_SEEN = False
+AUTH_SESSION_LAST_SEEN_INTERVAL = 60
+
+# Пул потоков для bcrypt: число потоков (None - по числу CPU) и размер очереди ожидания.
+# Запросы, не поместившиеся в очередь, получают 503 с Retry-After
+AUTH_BCRYPT_WORKERS = None
+AUTH_BCRYPT_QUEUE_SIZE = 32
+# Стоимость bcrypt (log2 числа раундов). При входе хеши с другой стоимостью пересчитываются.
+# Подобрать значение помогает команда: python manage.py bcrypt_benchmark
+AUTH_BCRYPT_ROUNDS = 12
+
+# Ограничение частоты login и register: правила (ключ, лимит, окно в секундах) по IP и email.
+# LocalMemoryBackend считает запросы в памяти процесса; CacheBackend использует кеш
+# AUTH_RATELIMIT_CACHE (FileBasedCache или DatabaseCache - общий для всех воркеров на хосте)
+AUTH_RATELIMIT_ENABLED = True
+AUTH_RATELIMIT_BACKEND = 'auth_system.ratelimit.LocalMemoryBackend'
+AUTH_RATELIMIT_CACHE = 'default'
+# Заголовок с IP клиента за прокси, например 'HTTP_X_REAL_IP' или 'HTTP_X_FORWARDED_FOR'
+AUTH_RATELIMIT_IP_HEADER = None
+# Число доверенных прокси перед приложением: IP клиента - столько-я запись заголовка справа
+AUTH_RATELIMIT_TRUSTED_PROXIES = 1
+AUTH_RATELIMIT_RULES = {
+    'login': [('ip', 20, 60), ('email', 5, 60)],
+    'register': [('ip', 10, 3600)],
+}
+
+# Асинхронные версии login, profile и бизнес-view (имеет смысл только при запуске под ASGI)
+AUTH_ASYNC_VIEWS = os.getenv('AUTH_ASYNC_VIEWS', 'False') == 'True'
+
+# Инструментирование запросов: доля измеряемых запросов (0 - middleware отключен, 1 - все запросы).
+# Для измеренных запросов время SQL, аутентификации, проверок прав, bcrypt и view
+# отдается в заголовке Server-Timing (если INSTRUMENTATION_HEADERS) и в лог auth_system.instrumentation
+AUTH_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('AUTH_INSTRUMENTATION_SAMPLE_RATE', '0'))
+AUTH_INSTRUMENTATION_HEADERS = True
+
+# Метрики Prometheus на /metrics/ (при False значения не собираются). Если задан METRICS_DIR, каждый воркер сохраняет свои
+# значения в этот каталог раз в METRICS_FLUSH_INTERVAL секунд, а endpoint их суммирует
+AUTH_METRICS_ENABLED = os.getenv('AUTH_METRICS_ENABLED', 'True') == 'True'
+AUTH_METRICS_DIR = os.getenv('AUTH_METRICS_DIR') or None
+AUTH_METRICS_FLUSH_INTERVAL = 5.0
+# Сколько секунд используется подсчитанное число активных сессий (auth_active_sessions)
+AUTH_METRICS_ACTIVE_SESSIONS_TTL = 30
+# Адреса, которым доступен /metrics/ (None - всем)
+AUTH_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'auth_system.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Журнал аудита: события копятся в кольцевом буфере процесса и записываются пачками
+# по BATCH_SIZE раз в FLUSH_INTERVAL секунд. При переполнении буфера политика OVERFLOW:
+# 'drop' - вытеснять самые старые события, 'block' - ждать места до BLOCK_TIMEOUT секунд
+AUTH_AUDIT_ENABLED = os.getenv('AUTH_AUDIT_ENABLED', 'True') == 'True'
+AUTH_AUDIT_BUFFER_SIZE = 10000
+AUTH_AUDIT_BATCH_SIZE = 500
+AUTH_AUDIT_FLUSH_INTERVAL = 1.0
+AUTH_AUDIT_OVERFLOW = 'drop'
+AUTH_AUDIT_BLOCK_TIMEOUT = 0.5
+
+# Keyset-пагинация списков: размер страницы по умолчанию и максимальный limit
+AUTH_PAGE_SIZE = 100
+AUTH_MAX_PAGE_SIZE = 1000
+
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'auth_system.authentication.MiddlewareAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [],
+    # JSON через orjson (если установлен), иначе стандартный JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'auth_system.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
@@ -0,0 +1,22 @@
+"""
+Профиль настроек для бенчмарков.
+
+По умолчанию используется SQLite во временном каталоге (не в дереве проекта),
+PostgreSQL из основных настроек включается переменной окружения BENCH_DATABASE=postgresql:
+
+    python manage.py benchmark_auth --settings=myproject.settings_bench
+"""
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import os
+
+DEBUG = False
+
+if os.getenv('BENCH_DATABASE', 'sqlite') != 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(tempfile.gettempdir(), 'auth_system_bench.sqlite3'),
+        }
+    }
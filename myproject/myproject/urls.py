@@ -1,7 +1,16 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from auth_system import views as auth_views
-from business_app import views as business_views
+
+from auth_system.views import metrics
+
+# Под ASGI горячие view можно заменить асинхронными версиями
+if settings.AUTH_ASYNC_VIEWS:
+    from auth_system import async_views as auth_views
+    from business_app import async_views as business_views
+else:
+    from auth_system import views as auth_views
+    from business_app import views as business_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,8 +24,18 @@ urlpatterns = [
 
     # Администрирование (только для админов)
     path('api/admin/roles/', auth_views.role_list),
+    path('api/admin/audit/', auth_views.audit_log),
 
     # Бизнес-объекты
     path('api/products/', business_views.products_list),
     path('api/products/create/', business_views.create_product),
+    path('api/products/<int:product_id>/', business_views.product),
+    path('api/orders/', business_views.orders_list),
+    path('api/orders/create/', business_views.create_order),
+    path('api/users/', business_views.users_list),
+    path('api/users/export/', business_views.users_export),
+    path('api/dashboard/', business_views.dashboard),
 ]
+
+if settings.AUTH_METRICS_ENABLED:
+    urlpatterns.append(path('metrics/', metrics))